@@ -1,11 +1,50 @@
-"""Core package for the Protocol Vision IV4 system."""
+"""Core package for the Protocol Vision IV4 system.
+
+Public names are imported lazily (PEP 562) so that ``import ProtocolVisionIV4``
+does not load OpenCV, requests or the AI stack until they are used.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .camera_manager import CameraError, CameraManager, SingleCamera
+    from .config_manager import ConfigError, ConfigManager, get_config
+    from .image_saver import inspect_image, queue_captured_image, save_captured_image
+    from .logger import Logger
+    from .model_selector import ModelSelector
+    from .workflow import send_to_workflow
+
+_EXPORTS = {
+    "CameraManager": ".camera_manager",
+    "CameraError": ".camera_manager",
+    "SingleCamera": ".camera_manager",
+    "ConfigManager": ".config_manager",
+    "ConfigError": ".config_manager",
+    "get_config": ".config_manager",
+    "save_captured_image": ".image_saver",
+    "queue_captured_image": ".image_saver",
+    "inspect_image": ".image_saver",
+    "ModelSelector": ".model_selector",
+    "Logger": ".logger",
+    "send_to_workflow": ".workflow",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
 
-from .camera_manager import CameraManager, CameraError, SingleCamera
-from .config_manager import ConfigManager, ConfigError
-from .image_saver import save_captured_image
-from .model_selector import ModelSelector
-from .logger import Logger
-from .workflow import send_to_workflow
 
 __all__ = [
     "CameraManager",
@@ -13,7 +52,10 @@ __all__ = [
     "SingleCamera",
     "ConfigManager",
     "ConfigError",
+    "get_config",
     "save_captured_image",
+    "queue_captured_image",
+    "inspect_image",
     "ModelSelector",
     "Logger",
     "send_to_workflow",
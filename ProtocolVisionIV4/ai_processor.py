@@ -1,31 +1,75 @@
-"""Optional AI/ML image processing module using ultralytics YOLOv5."""
+"""Optional AI/ML image processing with ultralytics YOLO or ONNX Runtime."""
 
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Any
 
-try:
-    from ultralytics import YOLO
-except Exception:  # pragma: no cover - optional dependency
-    YOLO = None  # type: ignore
+from .utils import optional_import
+
+BACKENDS = {"ultralytics", "onnx"}
 
 
 class AIProcessor:
-    """Run lightweight object detection and return OK/NG."""
+    """Run lightweight object detection and return OK/NG.
+
+    The backend is chosen by ``backend`` or, if omitted, by the model file
+    extension: ``.onnx`` models run on the ONNX Runtime CPU backend (see
+    :class:`~ProtocolVisionIV4.onnx_backend.OnnxDetector`), everything else is
+    loaded through ultralytics ``YOLO``. ``backend_options`` are passed to the
+    ONNX detector (thread counts, thresholds, ``warmup``).
+    """
 
-    def __init__(self, model_path: str | None = None) -> None:
-        if YOLO is None:
-            raise ImportError("ultralytics package is required for AI processing")
+    def __init__(
+        self,
+        model_path: str | None = None,
+        backend: str | None = None,
+        **backend_options: Any,
+    ) -> None:
         self.model_path = model_path or "yolov5n.pt"
-        self.model = YOLO(self.model_path)
-
-    def process_image(self, path: str | Path) -> bool:
-        """Return ``True`` if no detections were found, else ``False``."""
-        results = self.model.predict(str(path), verbose=False)
-        for r in results:
-            if len(getattr(r, "boxes", [])) > 0:
-                return False
-        return True
+        self.backend = backend or (
+            "onnx" if Path(self.model_path).suffix.lower() == ".onnx" else "ultralytics"
+        )
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unsupported AI backend: {self.backend}")
+        if self.backend == "onnx":
+            from .onnx_backend import OnnxDetector
+
+            self.model = OnnxDetector(self.model_path, **backend_options)
+        else:
+            try:
+                from ultralytics import YOLO
+            except Exception as exc:  # pragma: no cover - optional dependency
+                raise ImportError("ultralytics package is required for AI processing") from exc
+            self.model = YOLO(self.model_path)
+
+    def process_image(self, image: str | Path | Any) -> bool:
+        """Return ``True`` if no detections were found, else ``False``.
+
+        ``image`` is either a path to an image file or a BGR NumPy frame as
+        returned by OpenCV; frames are inspected in memory without touching
+        the disk.
+        """
+        return self.process_batch([image])[0]
+
+    def process_batch(self, images: list[str | Path | Any]) -> list[bool]:
+        """Run a single ``predict`` over ``images`` and return one verdict each."""
+        if self.backend == "onnx":
+            frames = [self._load(i) if isinstance(i, (str, Path)) else i for i in images]
+            return [len(d) == 0 for d in self.model.predict(frames)]
+        sources = [str(i) if isinstance(i, (str, Path)) else i for i in images]
+        results = self.model.predict(sources, verbose=False)
+        return [len(getattr(r, "boxes", [])) == 0 for r in results]
+
+    @staticmethod
+    def _load(path: str | Path) -> Any:
+        cv2 = optional_import("cv2")
+        if cv2 is None:
+            raise ImportError("OpenCV is required to read image files")
+        frame = cv2.imread(str(path))
+        if frame is None:
+            raise ValueError(f"Could not read image: {path}")
+        return frame
 
 
 __all__ = ["AIProcessor"]
@@ -0,0 +1,128 @@
+"""Micro-batching front end for batch-capable inference functions."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Sequence
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+_STOP = object()
+
+
+class BatchScheduler:
+    """Collect submitted items into batches and run one call per batch.
+
+    A worker thread waits for the first item, then keeps collecting until
+    ``max_batch_size`` items are queued or ``max_wait_ms`` has elapsed since
+    that first item arrived. ``predict_batch`` receives the list of items and
+    must return one result per item; each result is routed back through the
+    :class:`~concurrent.futures.Future` returned by :meth:`submit`.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[list[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 0,
+        name: str = "ai-batch",
+    ) -> None:
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[Any] = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batch_sizes: Counter[int] = Counter()
+        self.queue_depths: Counter[int] = Counter()
+        self.items = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue ``item`` and return a future for its result."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            self.queue_depths[self._queue.qsize()] += 1
+            self._queue.put((item, future))
+        return future
+
+    def close(self, timeout: float | None = None) -> None:
+        """Stop accepting work, finish queued items and stop the worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self, first: Any) -> tuple[list[Any], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+            items = [item for item, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = list(self.predict_batch(items))
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"predict_batch returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as exc:
+                self.errors += 1
+                LOGGER.error("Batch inference failed: %s", exc)
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self.busy_time += time.perf_counter() - start
+            self.batch_sizes[len(batch)] += 1
+            self.items += len(batch)
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and batch-size histograms for tuning."""
+        batches = sum(self.batch_sizes.values())
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_depth_histogram": dict(sorted(self.queue_depths.items())),
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "batches": batches,
+            "items": self.items,
+            "errors": self.errors,
+            "mean_batch_size": round(self.items / batches, 2) if batches else 0.0,
+            "busy_seconds": round(self.busy_time, 3),
+        }
+
+
+__all__ = ["BatchScheduler"]
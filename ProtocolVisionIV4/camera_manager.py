@@ -4,12 +4,15 @@ from __future__ import annotations
 
 import logging
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from typing import Any
 
-try:
-    import cv2  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    cv2 = None
+from .frame_grabber import FrameGrabber
+from .iv_protocol import STATUS_OK, TRIGGER, encode_frame, read_frame
+from .utils import optional_import
 
 
 class CameraError(Exception):
@@ -24,17 +27,39 @@ class SingleCamera:
         self.config = config
         self.camera_type = config.get("camera_type")
         self.connection: Any | None = None
+        self.grabber: FrameGrabber | None = None
         self.logger = logger
+        # Held while a capture is running so a capture that outlived its
+        # timeout is never overlapped by the next cycle.
+        self.lock = threading.Lock()
+        # Session bookkeeping maintained by :class:`CameraManager`.
+        self.state = "disconnected"
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        self.backoff = 0.0
+        self.next_attempt = 0.0
 
     def connect(self) -> None:
         """Initialize the camera connection based on ``camera_type``."""
         try:
             if self.camera_type == "USB":
+                cv2 = optional_import("cv2")
                 if cv2 is None:
                     raise CameraError("OpenCV is required for USB camera support")
                 self.connection = cv2.VideoCapture(0)
                 if not self.connection.isOpened():
                     raise CameraError("Failed to open USB camera")
+                if self.config.get("grab_mode"):
+                    self.grabber = FrameGrabber(
+                        self.connection,
+                        self.name,
+                        buffer_size=int(self.config.get("grab_buffer", 4)),
+                        logger=self.logger,
+                        max_failures=int(self.config.get("grab_max_failures", 100)),
+                        owns_capture=True,
+                    ).start()
                 self.logger.info("%s: USB camera connected", self.name)
             elif self.camera_type in {"IV2", "IV3", "IV4"}:
                 ip = self.config.get("ip_address", "127.0.0.1")
@@ -59,10 +84,38 @@ class SingleCamera:
             self.logger.error("%s: camera connection failed: %s", self.name, exc)
             raise
 
+    def is_alive(self) -> bool:
+        """Return ``True`` if the open session still looks usable."""
+        if self.connection is None:
+            return False
+        if self.camera_type == "USB":
+            if self.grabber is not None and not self.grabber.alive:
+                return False
+            return bool(self.connection.isOpened())  # type: ignore[union-attr]
+        if self.camera_type in {"IV2", "IV3", "IV4"}:
+            sock = self.connection
+            timeout = sock.gettimeout()
+            try:
+                sock.setblocking(False)
+                data = sock.recv(1, socket.MSG_PEEK)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            finally:
+                try:
+                    sock.settimeout(timeout)
+                except OSError:
+                    pass
+            # An empty read means the peer closed the connection.
+            return bool(data)
+        return True
+
     def capture_image(self) -> Any:
         """Capture an image or return a mocked result."""
         if self.camera_type == "USB":
-            assert cv2 is not None
+            if self.grabber is not None:
+                return self._capture_grabbed()
             ret, frame = self.connection.read()  # type: ignore[call-arg]
             if not ret:
                 self.logger.error("%s: failed USB capture", self.name)
@@ -70,6 +123,8 @@ class SingleCamera:
             self.logger.info("%s: image captured from USB", self.name)
             return frame
         if self.camera_type in {"IV2", "IV3", "IV4"}:
+            if self.config.get("protocol") == "framed":
+                return self._capture_framed()
             try:
                 self.connection.sendall(b"TRIGGER")  # type: ignore[call-arg]
                 response = self.connection.recv(1024)  # type: ignore[call-arg]
@@ -86,10 +141,50 @@ class SingleCamera:
             return "VS_IMAGE_MOCK"
         raise CameraError("No camera initialized")
 
+    def _capture_grabbed(self) -> Any:
+        """Return a frame from the background grabber.
+
+        With ``grab_fresh`` set, wait for the first frame exposed after the
+        trigger; otherwise return the newest buffered frame right away.
+        """
+        assert self.grabber is not None
+        timeout = float(self.config.get("grab_timeout", 1.0))
+        try:
+            if self.config.get("grab_fresh"):
+                _, frame = self.grabber.wait_after(time.monotonic(), timeout)
+            else:
+                _, frame = self.grabber.latest(timeout)
+        except TimeoutError as exc:
+            self.logger.error("%s: %s", self.name, exc)
+            raise CameraError("USB capture failed") from exc
+        self.logger.info("%s: image taken from grab buffer", self.name)
+        return frame
+
+    def _capture_framed(self) -> bytearray:
+        """Trigger an IV head speaking the framed protocol and return the image."""
+        try:
+            self.connection.sendall(encode_frame(TRIGGER))  # type: ignore[union-attr]
+            status, payload = read_frame(self.connection)  # type: ignore[arg-type]
+        except Exception as exc:  # pragma: no cover - network errors
+            self.logger.error("%s: capture failed: %s", self.name, exc)
+            raise CameraError(f"{self.camera_type} capture failed") from exc
+        if status != STATUS_OK:
+            message = payload.decode("utf-8", errors="replace")
+            self.logger.error("%s: camera reported error: %s", self.name, message)
+            raise CameraError(f"{self.camera_type} capture failed: {message}")
+        self.logger.info("%s: received %d byte image", self.name, len(payload))
+        return payload
+
     def release(self) -> None:
         """Release or close the camera connection."""
+        grabber, self.grabber = self.grabber, None
+        if grabber is not None:
+            # The grabber thread releases the capture itself once grab()
+            # returns, which may be after stop() has given up waiting.
+            grabber.stop()
         if self.camera_type == "USB" and self.connection is not None:
-            self.connection.release()  # type: ignore[call-arg]
+            if grabber is None:
+                self.connection.release()  # type: ignore[call-arg]
             self.logger.info("%s: USB camera released", self.name)
         elif self.camera_type in {"IV2", "IV3", "IV4"} and self.connection is not None:
             try:
@@ -102,9 +197,20 @@ class SingleCamera:
 
 
 class CameraManager:
-    """Manage a collection of cameras."""
+    """Manage a collection of cameras.
+
+    Sessions stay open across captures. :meth:`ensure_connected` probes a
+    session before use and reconnects lazily when it has dropped, backing off
+    exponentially between failed attempts. :meth:`start_keepalive` probes idle
+    sessions in the background so a dropped head is noticed between cycles.
+    """
 
-    def __init__(self, configs: list[dict[str, Any]]) -> None:
+    def __init__(
+        self,
+        configs: list[dict[str, Any]],
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+    ) -> None:
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(
             level=logging.INFO,
@@ -114,20 +220,230 @@ class CameraManager:
         self.cameras = {
             cfg["name"]: SingleCamera(cfg["name"], cfg, self.logger) for cfg in configs
         }
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread: threading.Thread | None = None
 
     def connect(self, name: str) -> None:
-        self.cameras[name].connect()
+        cam = self.cameras[name]
+        if cam.connection is not None:
+            cam.release()
+        try:
+            cam.connect()
+        except Exception as exc:
+            self._mark_failed(cam, exc)
+            raise
+        if cam.connects:
+            cam.reconnects += 1
+        cam.connects += 1
+        cam.state = "connected"
+        cam.backoff = 0.0
+        cam.next_attempt = 0.0
+
+    def ensure_connected(self, name: str) -> None:
+        """Return once ``name`` has a healthy session, reconnecting if needed.
+
+        Raises :class:`CameraError` without touching the device while the
+        camera is still inside its reconnect backoff window.
+        """
+        cam = self.cameras[name]
+        with cam.lock:
+            self._ensure_connected(cam)
 
     def capture_image(self, name: str) -> Any:
-        return self.cameras[name].capture_image()
+        cam = self.cameras[name]
+        with cam.lock:
+            return self._capture_locked(cam)
+
+    def check_health(self) -> dict[str, str]:
+        """Probe every open session and drop the ones that have died."""
+        for cam in self.cameras.values():
+            if cam.connection is None or not cam.lock.acquire(blocking=False):
+                continue
+            try:
+                if not cam.is_alive():
+                    self.logger.warning("%s: keepalive probe failed", cam.name)
+                    self._drop(cam, "keepalive probe failed")
+            finally:
+                cam.lock.release()
+        return {name: cam.state for name, cam in self.cameras.items()}
+
+    def start_keepalive(self, interval: float = 5.0) -> None:
+        """Probe sessions every ``interval`` seconds on a daemon thread."""
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop.clear()
+
+        def _run() -> None:
+            while not self._keepalive_stop.wait(interval):
+                self.check_health()
+
+        self._keepalive_thread = threading.Thread(
+            target=_run, name="camera-keepalive", daemon=True
+        )
+        self._keepalive_thread.start()
 
-    def release(self, name: str) -> None:
+    def stop_keepalive(self) -> None:
+        self._keepalive_stop.set()
+        if self._keepalive_thread is not None:
+            self._keepalive_thread.join()
+            self._keepalive_thread = None
+
+    def status(self) -> dict[str, dict[str, Any]]:
+        """Return connection state and counters for every camera."""
+        status: dict[str, dict[str, Any]] = {}
+        for name, cam in self.cameras.items():
+            status[name] = {
+                "state": cam.state,
+                "connects": cam.connects,
+                "reconnects": cam.reconnects,
+                "failures": cam.failures,
+                "last_error": cam.last_error,
+            }
+            if cam.grabber is not None:
+                status[name]["grabber"] = cam.grabber.stats()
+        return status
+
+    def _ensure_connected(self, cam: SingleCamera) -> None:
+        if cam.connection is not None:
+            if cam.is_alive():
+                return
+            self.logger.warning("%s: session dropped, reconnecting", cam.name)
+            self._drop(cam, "session dropped")
+        wait = cam.next_attempt - time.monotonic()
+        if wait > 0:
+            raise CameraError(
+                f"{cam.name}: reconnect backoff, next attempt in {wait:.1f}s"
+            )
+        self.connect(cam.name)
+
+    def _capture_locked(self, cam: SingleCamera) -> Any:
+        self._ensure_connected(cam)
+        try:
+            return cam.capture_image()
+        except (CameraError, OSError) as exc:
+            self._drop(cam, str(exc))
+            raise
+
+    def _drop(self, cam: SingleCamera, reason: str) -> None:
+        try:
+            cam.release()
+        except Exception:  # pragma: no cover - best effort cleanup
+            cam.connection = None
+        cam.state = "disconnected"
+        cam.last_error = reason
+
+    def _mark_failed(self, cam: SingleCamera, exc: Exception) -> None:
+        cam.failures += 1
+        cam.last_error = str(exc)
+        cam.backoff = min(
+            self.backoff_max, cam.backoff * 2 if cam.backoff else self.backoff_initial
+        )
+        cam.next_attempt = time.monotonic() + cam.backoff
+        cam.state = "backoff"
+
+    def capture_all(
+        self, timeout: float = 10.0, names: list[str] | None = None
+    ) -> dict[str, dict[str, Any]]:
+        """Trigger cameras concurrently and gather per-camera results.
+
+        Each camera is connected (if needed) and triggered on its own worker
+        thread. A camera that has not returned within ``timeout`` seconds of
+        the start of the cycle is reported with an error. The call returns
+        only once every camera has finished or timed out.
+
+        Returns a mapping of camera name to a dict with ``image``, ``error``
+        (``None`` on success) and ``elapsed`` seconds.
+        """
+        names = self.names() if names is None else names
+        results: dict[str, dict[str, Any]] = {}
+        if not names:
+            return results
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(
+            max_workers=len(names), thread_name_prefix="capture"
+        )
+        try:
+            futures = {name: executor.submit(self._timed_capture, name) for name in names}
+            for name, future in futures.items():
+                remaining = max(0.0, start + timeout - time.perf_counter())
+                try:
+                    results[name] = future.result(timeout=remaining)
+                except FutureTimeout:
+                    self.logger.error("%s: capture timed out after %.1fs", name, timeout)
+                    results[name] = {
+                        "image": None,
+                        "error": f"timed out after {timeout}s",
+                        "elapsed": time.perf_counter() - start,
+                    }
+        finally:
+            # Do not wait for timed-out workers; they finish in the background
+            # and keep holding the camera lock until they do.
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def _timed_capture(self, name: str) -> dict[str, Any]:
+        cam = self.cameras[name]
+        start = time.perf_counter()
+        image: Any = None
+        error: str | None = None
+        if not cam.lock.acquire(blocking=False):
+            error = "previous capture still in progress"
+        else:
+            try:
+                image = self._capture_locked(cam)
+            except Exception as exc:
+                error = str(exc)
+            finally:
+                cam.lock.release()
+        return {"image": image, "error": error, "elapsed": time.perf_counter() - start}
+
+    def _release(self, cam: SingleCamera, timeout: float) -> None:
+        # A capture that timed out in capture_all() may still be using the
+        # session; closing it underneath that thread is not safe.
+        if not cam.lock.acquire(timeout=timeout):
+            self.logger.warning(
+                "%s: still busy after %.1fs, leaving the session open", cam.name, timeout
+            )
+            return
+        try:
+            cam.release()
+            cam.state = "disconnected"
+        finally:
+            cam.lock.release()
+
+    def release(self, name: str, timeout: float = 5.0) -> None:
+        """Close the session of ``name`` once any running capture has finished."""
         if name in self.cameras:
-            self.cameras[name].release()
+            self._release(self.cameras[name], timeout)
 
-    def release_all(self) -> None:
+    def release_all(self, timeout: float = 5.0) -> None:
+        """Close every session, waiting up to ``timeout`` seconds per busy camera."""
+        self.stop_keepalive()
         for cam in self.cameras.values():
-            cam.release()
+            self._release(cam, timeout)
+
+    def reconfigure(self, configs: list[dict[str, Any]]) -> None:
+        """Apply a new camera list, keeping sessions whose config is unchanged.
+
+        Removed or changed cameras are released (after any running capture)
+        and changed or new ones reconnect lazily on their next use.
+        """
+        current = self.cameras
+        cameras: dict[str, SingleCamera] = {}
+        for cfg in configs:
+            cam = current.get(cfg["name"])
+            if cam is None or cam.config != cfg:
+                cam = SingleCamera(cfg["name"], cfg, self.logger)
+                self.logger.info("Camera %s configured", cfg["name"])
+            cameras[cfg["name"]] = cam
+        self.cameras = cameras
+        for name, cam in current.items():
+            if cameras.get(name) is not cam:
+                with cam.lock:
+                    cam.release()
+                    cam.state = "disconnected"
 
     def names(self) -> list[str]:
         return list(self.cameras.keys())
@@ -2,22 +2,65 @@
 
 from __future__ import annotations
 
+import copy
 import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping
 
 from .utils import select_model_by_serial
 
 
+LOGGER = logging.getLogger("ProtocolVision")
+
+_DEFAULT_CONFIG = Path(__file__).resolve().parent / "config" / "config.json"
+
+
 class ConfigError(Exception):
     """Custom exception for configuration issues."""
 
 
+def _freeze(value: Any) -> Any:
+    """Return a read-only deep copy of ``value``."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _type_name(field_type: Any) -> str:
+    """Return a readable name for a type or tuple of types."""
+    if isinstance(field_type, tuple):
+        return " or ".join(t.__name__ for t in field_type)
+    return field_type.__name__
+
+
 class ConfigManager:
-    """Load and validate configuration settings."""
+    """Load and validate configuration settings.
+
+    :meth:`snapshot` returns a read-only view of the current settings.
+    :meth:`reload` (run by the watcher from :meth:`start_watching`) validates
+    the file again and swaps the new settings in with a single assignment,
+    then calls every subscribed callback (see :meth:`subscribe`) with the
+    old snapshot, the new snapshot and the set of changed top-level keys.
+    Invalid edits are logged and the current settings stay in effect. Use
+    :func:`get_config` for the process-wide instance.
+    """
 
     ALLOWED_CAMERA_TYPES = {"USB", "IV2", "IV3", "IV4", "VS"}
 
+    ALLOWED_AI_BACKENDS = {"ultralytics", "onnx"}
+
+    ALLOWED_WRITER_POLICIES = {"block", "drop"}
+
+    ALLOWED_IMAGE_LAYOUTS = {"sharded", "flat"}
+
+    ALLOWED_FSYNC_POLICIES = {"none", "batch", "record"}
+
     REQUIRED_FIELDS = {
         "model_name": str,
         "serial_number": str,
@@ -35,49 +78,188 @@ class ConfigManager:
         "cameras": list,
     }
 
+    OPTIONAL_FIELDS: Dict[str, Any] = {
+        "parallel_capture": bool,
+        "camera_timeout": (int, float),
+        "camera_keepalive_interval": (int, float),
+        "camera_backoff_max": (int, float),
+        "ai_batch_size": int,
+        "ai_batch_wait_ms": (int, float),
+        "ai_backend": str,
+        "ai_intra_op_threads": int,
+        "ai_inter_op_threads": int,
+        "ai_conf_threshold": (int, float),
+        "ai_iou_threshold": (int, float),
+        "ai_warmup": bool,
+        "ai_models": dict,
+        "ai_cache_size": int,
+        "ai_cache_max_mb": (int, float),
+        "ai_preload": list,
+        "ai_workers": int,
+        "ai_worker_slots": int,
+        "ai_worker_slot_mb": (int, float),
+        "image_writer_workers": int,
+        "image_writer_queue": int,
+        "image_writer_policy": str,
+        "image_layout": str,
+        "image_index_path": str,
+        "log_buffered": bool,
+        "log_batch_size": int,
+        "log_flush_interval": (int, float),
+        "log_fsync": str,
+        "log_queue_size": int,
+        "log_rotate_max_mb": (int, float),
+        "log_rotate_daily": bool,
+        "log_retention": int,
+        "log_compress": bool,
+        "webhook_batch_size": int,
+        "webhook_batch_wait_ms": (int, float),
+        "webhook_retries": int,
+        "webhook_backoff_max": (int, float),
+        "webhook_queue_size": int,
+        "mqtt_qos": int,
+        "mqtt_max_inflight": int,
+        "mqtt_queue_size": int,
+        "mqtt_keepalive": int,
+        "outbox_path": str,
+        "outbox_batch_size": int,
+        "outbox_keep": int,
+        "model_registry_batch_size": int,
+        "model_rules_path": str,
+        "model_rules_cache_size": int,
+        "config_watch_interval": (int, float),
+        "scanner_debounce": (int, float),
+        "scanner_line_timeout": (int, float),
+        "daemon_cycle_rate": (int, float),
+        "daemon_queue_size": int,
+        "daemon_trigger_host": str,
+        "daemon_trigger_port": int,
+        "daemon_stats_interval": (int, float),
+        "pipeline": bool,
+        "pipeline_stages": dict,
+    }
+
     CAMERA_REQUIRED_FIELDS = {
         "name": str,
         "camera_type": str,
         "port": int,
     }
 
-    CAMERA_OPTIONAL_FIELDS = {
+    CAMERA_OPTIONAL_FIELDS: Dict[str, Any] = {
         "ip_address": str,
+        "protocol": str,
+        "grab_mode": bool,
+        "grab_buffer": int,
+        "grab_fresh": bool,
+        "grab_timeout": (int, float),
+        "grab_max_failures": int,
+        "preprocess": dict,
+    }
+
+    PREPROCESS_FIELDS: Dict[str, Any] = {
+        "rois": list,
+        "size": list,
+        "grayscale": bool,
+        "normalize": bool,
+        "save_full_frame": bool,
     }
 
+    ALLOWED_PROTOCOLS = {"legacy", "framed"}
+
     def __init__(self, path: str | Path) -> None:
         self.path = Path(path)
-        self.data: Dict[str, Any] = {}
-        self._load()
-        self._validate()
-        self.data["model_name"] = select_model_by_serial(
-            self.data.get("serial_number", "")
-        )
+        self.data: Dict[str, Any] = self._prepare(self._load())
+        self._overrides: Dict[str, Any] = {}
+        self._snapshot: Mapping[str, Any] | None = None
+        self._subscribers: list[Callable[[Mapping[str, Any], Mapping[str, Any], set[str]], None]] = []
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._watch_stop = threading.Event()
+        self._watch_thread: threading.Thread | None = None
 
-    def _load(self) -> None:
+    def _load(self) -> Dict[str, Any]:
         try:
             with self.path.open("r", encoding="utf-8") as f:
-                self.data = json.load(f)
+                return json.load(f)
         except FileNotFoundError as exc:
             raise ConfigError(f"Configuration file not found: {self.path}") from exc
         except json.JSONDecodeError as exc:
             raise ConfigError(f"Invalid JSON in configuration file: {self.path}") from exc
 
-    def _validate(self) -> None:
+    def _prepare(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._validate(data)
+        data["model_name"] = select_model_by_serial(
+            data.get("serial_number", ""),
+            data.get("model_rules_path"),
+            data.get("model_rules_cache_size", 4096),
+        )
+        return data
+
+    def _stat(self) -> tuple[float, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _validate(self, data: Dict[str, Any]) -> None:
         for field, field_type in self.REQUIRED_FIELDS.items():
-            if field not in self.data:
+            if field not in data:
                 raise ConfigError(f"Missing required config field: {field}")
-            if not isinstance(self.data[field], field_type):
+            if not isinstance(data[field], field_type):
                 raise ConfigError(
                     f"Field '{field}' must be of type {field_type.__name__}"
                 )
 
-        if self.data.get("scanner_baud", 0) <= 0:
+        for field, field_type in self.OPTIONAL_FIELDS.items():
+            if field in data and not isinstance(data[field], field_type):
+                raise ConfigError(
+                    f"Field '{field}' must be of type {_type_name(field_type)}"
+                )
+
+        backend = data.get("ai_backend")
+        if backend is not None and backend not in self.ALLOWED_AI_BACKENDS:
+            raise ConfigError(
+                f"Invalid ai_backend '{backend}'. Allowed backends: {sorted(self.ALLOWED_AI_BACKENDS)}"
+            )
+
+        policy = data.get("image_writer_policy", "block")
+        if policy not in self.ALLOWED_WRITER_POLICIES:
+            raise ConfigError(
+                f"Invalid image_writer_policy '{policy}'. Allowed policies: {sorted(self.ALLOWED_WRITER_POLICIES)}"
+            )
+
+        layout = data.get("image_layout", "sharded")
+        if layout not in self.ALLOWED_IMAGE_LAYOUTS:
+            raise ConfigError(
+                f"Invalid image_layout '{layout}'. Allowed layouts: {sorted(self.ALLOWED_IMAGE_LAYOUTS)}"
+            )
+
+        fsync = data.get("log_fsync", "none")
+        if fsync not in self.ALLOWED_FSYNC_POLICIES:
+            raise ConfigError(
+                f"Invalid log_fsync '{fsync}'. Allowed policies: {sorted(self.ALLOWED_FSYNC_POLICIES)}"
+            )
+
+        if data.get("scanner_baud", 0) <= 0:
             raise ConfigError("'scanner_baud' must be a positive integer")
-        if self.data.get("mqtt_port", 0) <= 0:
+        if data.get("mqtt_port", 0) <= 0:
             raise ConfigError("'mqtt_port' must be a positive integer")
 
-        cameras = self.data.get("cameras", [])
+        if data.get("mqtt_qos", 1) not in (0, 1, 2):
+            raise ConfigError("'mqtt_qos' must be 0, 1 or 2")
+
+        for stage, options in data.get("pipeline_stages", {}).items():
+            if not isinstance(options, dict):
+                raise ConfigError(f"Pipeline stage '{stage}' must be an object")
+            for key in ("workers", "queue"):
+                value = options.get(key, 1)
+                if not isinstance(value, int) or value < 1:
+                    raise ConfigError(
+                        f"Pipeline stage '{stage}': '{key}' must be a positive integer"
+                    )
+
+        cameras = data.get("cameras", [])
         if not isinstance(cameras, list):
             raise ConfigError("Field 'cameras' must be a list")
 
@@ -94,12 +276,156 @@ class ConfigManager:
                 raise ConfigError(
                     f"Invalid camera_type '{cam_type}'. Allowed types: {sorted(self.ALLOWED_CAMERA_TYPES)}"
                 )
-            if "ip_address" in cam and not isinstance(cam["ip_address"], str):
-                raise ConfigError("Camera field 'ip_address' must be of type str")
+            for field, field_type in self.CAMERA_OPTIONAL_FIELDS.items():
+                if field in cam and not isinstance(cam[field], field_type):
+                    raise ConfigError(
+                        f"Camera field '{field}' must be of type {_type_name(field_type)}"
+                    )
+            protocol = cam.get("protocol", "legacy")
+            if protocol not in self.ALLOWED_PROTOCOLS:
+                raise ConfigError(
+                    f"Invalid protocol '{protocol}'. Allowed protocols: {sorted(self.ALLOWED_PROTOCOLS)}"
+                )
+            if "preprocess" in cam:
+                self._validate_preprocess(cam["name"], cam["preprocess"])
+                workers = data.get("ai_workers", 0)
+                slots = data.get("ai_worker_slots") or 2 * workers
+                rois = len(cam["preprocess"].get("rois", []))
+                if workers > 0 and rois > slots:
+                    raise ConfigError(
+                        f"Camera '{cam['name']}' has {rois} ROIs but only {slots} ai_worker_slots"
+                    )
+
+    def _validate_preprocess(self, camera: str, options: Dict[str, Any]) -> None:
+        for field, field_type in self.PREPROCESS_FIELDS.items():
+            if field in options and not isinstance(options[field], field_type):
+                raise ConfigError(
+                    f"Camera '{camera}': preprocess field '{field}' must be of type {_type_name(field_type)}"
+                )
+
+        def _ints(value: Any, count: int) -> bool:
+            return (
+                isinstance(value, list)
+                and len(value) == count
+                and all(isinstance(v, int) and not isinstance(v, bool) and v >= 0 for v in value)
+            )
+
+        for roi in options.get("rois", []):
+            if not _ints(roi, 4) or roi[2] == 0 or roi[3] == 0:
+                raise ConfigError(
+                    f"Camera '{camera}': each ROI must be [x, y, width, height] with a positive size"
+                )
+        size = options.get("size")
+        if size is not None and (not _ints(size, 2) or 0 in size):
+            raise ConfigError(
+                f"Camera '{camera}': preprocess 'size' must be [width, height] of positive integers"
+            )
 
     def get(self, key: str, default: Any | None = None) -> Any:
         """Convenience accessor for configuration values."""
         return self.data.get(key, default)
 
+    def set(self, key: str, value: Any) -> None:
+        """Override ``key`` in memory; the override outlasts every later reload."""
+        with self._lock:
+            self._overrides[key] = value
+            data = dict(self.data)
+            data[key] = value
+            self.data = data
+            self._snapshot = None
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """Return a read-only copy of the current settings."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = _freeze(copy.deepcopy(self.data))
+        return snapshot
+
+    def subscribe(
+        self, callback: Callable[[Mapping[str, Any], Mapping[str, Any], set[str]], None]
+    ) -> None:
+        """Call ``callback(old, new, changed_keys)`` after every reload that changes something."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[..., None]) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def reload(self) -> set[str]:
+        """Re-read and validate the file; return the top-level keys that changed.
+
+        Values set with :meth:`set` (such as the scanned serial and the model
+        chosen for it) are applied on top of the file again. A missing,
+        unparsable or invalid file raises :class:`ConfigError` and leaves the
+        current settings untouched.
+        """
+        with self._lock:
+            self._signature = self._stat()
+            data = self._prepare(self._load())
+            data.update(self._overrides)
+            old = self.snapshot()
+            changed = {
+                key
+                for key in set(data) | set(self.data)
+                if data.get(key) != self.data.get(key)
+            }
+            if not changed:
+                return changed
+            self.data = data
+            self._snapshot = None
+            new = self.snapshot()
+            subscribers = list(self._subscribers)
+        LOGGER.info("Configuration reloaded from %s: %s changed", self.path, sorted(changed))
+        for callback in subscribers:
+            try:
+                callback(old, new, changed)
+            except Exception as exc:  # pragma: no cover - subscriber bugs
+                LOGGER.error("Config subscriber %r failed: %s", callback, exc)
+        return changed
+
+    def start_watching(self, interval: float = 1.0) -> None:
+        """Poll the file every ``interval`` seconds and reload it when it changes."""
+        if self._watch_thread is not None:
+            return
+        self._watch_stop.clear()
+
+        def _run() -> None:
+            while not self._watch_stop.wait(interval):
+                if self._stat() == self._signature:
+                    continue
+                try:
+                    self.reload()
+                except ConfigError as exc:
+                    LOGGER.error("Ignoring invalid configuration change: %s", exc)
+
+        self._watch_thread = threading.Thread(target=_run, name="config-watch", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+
+_SHARED: dict[Path, ConfigManager] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_config(path: str | Path | None = None) -> ConfigManager:
+    """Return the process-wide :class:`ConfigManager` for ``path``.
+
+    ``path`` defaults to ``$CONFIG_PATH`` or the bundled ``config.json``. The
+    file is loaded and validated once; later calls return the same object.
+    """
+    path = Path(path or os.environ.get("CONFIG_PATH", _DEFAULT_CONFIG)).resolve()
+    with _SHARED_LOCK:
+        config = _SHARED.get(path)
+        if config is None:
+            config = _SHARED[path] = ConfigManager(path)
+        return config
+
 
-__all__ = ["ConfigManager", "ConfigError"]
+__all__ = ["ConfigManager", "ConfigError", "get_config"]
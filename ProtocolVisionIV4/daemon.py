@@ -0,0 +1,250 @@
+"""Headless service loop running one inspection cycle per trigger."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import signal
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+# How often the loop looks at pending signals while idle or pacing.
+_POLL = 0.1
+
+
+class _TriggerHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon: InspectionDaemon = self.server.inspection  # type: ignore[attr-defined]
+        for line in self.rfile:
+            serial = line.decode("utf-8", errors="replace").strip() or None
+            self.wfile.write(b"OK\n" if daemon.trigger(serial) else b"BUSY\n")
+
+
+class _TriggerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class InspectionDaemon:
+    """Wait for triggers and run ``run_cycle(serial)`` for each, until stopped.
+
+    Triggers come from :meth:`trigger`, so a
+    :class:`~ProtocolVisionIV4.serial_input.ScannerReader` can be subscribed
+    directly. Other sources are ``SIGUSR1`` and, with ``trigger_port``, a TCP
+    listener on ``trigger_host`` that takes one serial per line (an empty
+    line means the configured one) and answers ``OK`` or ``BUSY``. A trigger
+    without a serial uses ``default_serial()``. Up to ``max_queue`` triggers
+    wait while a cycle runs; further ones are rejected and counted in
+    ``dropped``.
+
+    With ``cycle_rate`` above 0 each cycle has a budget of ``1 / cycle_rate``
+    seconds. A cycle that takes longer counts as an overrun and is logged.
+    A faster one is followed by a pause for the rest of its budget, so
+    downstream systems never see more than ``cycle_rate`` cycles per
+    second. A failing cycle is logged and the loop carries on. ``SIGTERM``
+    and ``SIGINT`` (or :meth:`stop`) let the running cycle finish and end
+    :meth:`run`. Statistics are logged every ``stats_interval`` seconds.
+
+    ``run_cycle`` may instead hand the part to a pipeline and return a
+    :class:`~concurrent.futures.Future` for it. Cycle times and failures
+    are then recorded when the future completes, while pacing and overruns
+    apply to the hand-over. An overrun then means the pipeline could not
+    take the part within its budget, so it falls behind ``cycle_rate``.
+    """
+
+    def __init__(
+        self,
+        run_cycle: Callable[[str], Future | None],
+        default_serial: Callable[[], str],
+        *,
+        cycle_rate: float = 0.0,
+        max_queue: int = 10,
+        trigger_host: str = "127.0.0.1",
+        trigger_port: int | None = None,
+        stats_interval: float = 60.0,
+    ) -> None:
+        self.run_cycle = run_cycle
+        self.default_serial = default_serial
+        self.cycle_rate = max(0.0, cycle_rate)
+        self.trigger_host = trigger_host
+        self.trigger_port = trigger_port
+        self.stats_interval = stats_interval
+        self._queue: queue.Queue[str | None] = queue.Queue(max(1, max_queue))
+        self._stop = threading.Event()
+        self._server: _TriggerServer | None = None
+        self._durations: deque[float] = deque(maxlen=1000)
+        # Filled by signal handlers, drained by the loop (see _on_signal).
+        self._signals: deque[int] = deque()
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self.triggers = 0
+        self.cycles = 0
+        self.failures = 0
+        self.overruns = 0
+        self.dropped = 0
+
+    @property
+    def budget(self) -> float:
+        """Seconds allowed per cycle, or 0 when the rate is not limited."""
+        return 1.0 / self.cycle_rate if self.cycle_rate else 0.0
+
+    def trigger(self, serial: str | None = None) -> bool:
+        """Queue a cycle for ``serial``; return ``False`` if the queue is full."""
+        try:
+            self._queue.put_nowait(serial)
+        except queue.Full:
+            self.dropped += 1
+            LOGGER.error("Inspection busy, dropped trigger for %s", serial or "default serial")
+            return False
+        self.triggers += 1
+        return True
+
+    def stop(self) -> None:
+        """Finish the running cycle, then leave :meth:`run`."""
+        self._stop.set()
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        # The handler interrupts the main thread, which may hold the locks of
+        # the trigger queue, the stop event or a log handler at that moment.
+        # A deque append takes none of them, so the loop does the real work.
+        self._signals.append(signum)
+
+    def _handle_signals(self) -> None:
+        while self._signals:
+            signum = self._signals.popleft()
+            if signum == getattr(signal, "SIGUSR1", None):
+                self.trigger()
+                continue
+            LOGGER.info("Received signal %d, shutting down", signum)
+            self.stop()
+
+    def _pause(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            self._handle_signals()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._stop.wait(min(remaining, _POLL))
+
+    def _install_signals(self) -> dict[int, Any]:
+        previous = {}
+        if threading.current_thread() is not threading.main_thread():
+            return previous
+        for name in ("SIGTERM", "SIGINT", "SIGUSR1"):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                previous[signum] = signal.signal(signum, self._on_signal)
+        return previous
+
+    def _start_server(self) -> None:
+        if not self.trigger_port:
+            return
+        self._server = _TriggerServer((self.trigger_host, self.trigger_port), _TriggerHandler)
+        self._server.inspection = self  # type: ignore[attr-defined]
+        self.trigger_port = self._server.server_address[1]
+        threading.Thread(
+            target=self._server.serve_forever, name="daemon-trigger", daemon=True
+        ).start()
+        LOGGER.info("Listening for triggers on %s:%d", self.trigger_host, self.trigger_port)
+
+    def run(self) -> None:
+        """Serve triggers until :meth:`stop` or a termination signal."""
+        previous = self._install_signals()
+        self._start_server()
+        self._started = time.monotonic()
+        next_stats = self._started + self.stats_interval
+        LOGGER.info(
+            "Inspection daemon running (%s)",
+            f"{self.cycle_rate:g} cycles/s" if self.cycle_rate else "unpaced",
+        )
+        try:
+            while True:
+                self._handle_signals()
+                if self._stop.is_set():
+                    break
+                if time.monotonic() >= next_stats:
+                    LOGGER.info("Inspection daemon stats: %s", self.stats())
+                    next_stats = time.monotonic() + self.stats_interval
+                try:
+                    serial = self._queue.get(timeout=_POLL)
+                except queue.Empty:
+                    continue
+                self._cycle(serial or self.default_serial())
+        finally:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            LOGGER.info("Inspection daemon stopped: %s", self.stats())
+
+    def _record(self, serial: str, start: float, error: BaseException | None) -> None:
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.cycles += 1
+            self._durations.append(elapsed)
+            if error is not None:
+                self.failures += 1
+
+    def _completed(self, serial: str, start: float, done: Future) -> None:
+        error = done.exception()
+        if error is not None:
+            LOGGER.error("Inspection cycle for %s failed: %s", serial, error)
+        self._record(serial, start, error)
+
+    def _cycle(self, serial: str) -> None:
+        start = time.monotonic()
+        try:
+            outcome = self.run_cycle(serial)
+        except Exception as exc:
+            LOGGER.exception("Inspection cycle for %s failed: %s", serial, exc)
+            self._record(serial, start, exc)
+        else:
+            if isinstance(outcome, Future):
+                outcome.add_done_callback(
+                    lambda done: self._completed(serial, start, done)
+                )
+            else:
+                self._record(serial, start, None)
+        elapsed = time.monotonic() - start
+        budget = self.budget
+        if not budget:
+            return
+        if elapsed > budget:
+            self.overruns += 1
+            LOGGER.warning(
+                "Cycle for %s overran its budget: %.3fs > %.3fs", serial, elapsed, budget
+            )
+        else:
+            self._pause(budget - elapsed)
+
+    def stats(self) -> dict[str, Any]:
+        """Return trigger and cycle counters plus cycle times in seconds."""
+        with self._lock:
+            durations = sorted(self._durations)
+        uptime = time.monotonic() - self._started if self._started else 0.0
+        stats: dict[str, Any] = {
+            "triggers": self.triggers,
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "rate": round(self.cycles / uptime, 3) if uptime else 0.0,
+        }
+        if durations:
+            stats["cycle_mean"] = round(sum(durations) / len(durations), 4)
+            stats["cycle_p95"] = round(durations[int(0.95 * (len(durations) - 1))], 4)
+            stats["cycle_max"] = round(durations[-1], 4)
+        return stats
+
+
+__all__ = ["InspectionDaemon"]
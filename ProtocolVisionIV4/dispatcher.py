@@ -0,0 +1,250 @@
+"""Background webhook dispatcher with connection reuse, batching and retries."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WebhookError(Exception):
+    """Raised when the endpoint answers a POST with an HTTP error status."""
+
+    def __init__(self, url: str, status_code: int) -> None:
+        super().__init__(f"POST to {url} returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+class WebhookDispatcher:
+    """POST JSON payloads to ``url`` from a background thread.
+
+    :meth:`submit` only enqueues, so an unreachable endpoint never stalls the
+    caller. A single worker sends payloads in order over one pooled
+    :class:`requests.Session`, keeping the connection alive between posts.
+
+    With ``batch_size`` above 1, up to that many payloads queued within
+    ``batch_wait`` seconds are sent together as one JSON array. Failed posts
+    (connection errors, 429 and 5xx responses) are retried up to
+    ``max_retries`` times with exponential backoff from ``backoff_initial``
+    to ``backoff_max`` seconds; other 4xx responses are not retried. When
+    ``max_queue`` payloads are already waiting, new ones are dropped and
+    counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        batch_size: int = 1,
+        batch_wait: float = 0.05,
+        max_retries: int = 3,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 5.0,
+        max_queue: int = 1000,
+    ) -> None:
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = max(0.0, batch_wait)
+        self.max_retries = max(0, max_retries)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        # Imported here so that importing the package does not load requests.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._queue: queue.Queue[Any] = queue.Queue(max(1, max_queue))
+        self._abort = threading.Event()
+        self._closed = False
+        self.sent = 0
+        self.posts = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="webhook-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """Queue ``payload``; return ``False`` if it had to be dropped."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self.dropped += 1
+            LOGGER.error("Webhook queue full, dropped payload for %s", self.url)
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every payload queued so far has been sent or given up."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Send what is still queued, then stop the worker.
+
+        After ``timeout`` seconds, retries are abandoned, nothing further is
+        posted and the remaining payloads are counted as failed; only a POST
+        already in progress is waited for.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._abort.set()
+            # Give up on the backlog now instead of letting the worker try
+            # each queued batch; at most the post in progress still runs.
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    item[1].set()
+                elif item is not _STOP:
+                    self.failed += 1
+            self._queue.put(_STOP)
+            self._thread.join()
+        self.session.close()
+
+    def send(self, batch: list[Dict[str, Any]]) -> None:
+        """POST ``batch`` once on the calling thread, raising on failure.
+
+        Payloads are sent in groups of ``batch_size``. Used by the outbox,
+        which does its own retrying; :meth:`submit` is the non-blocking path.
+        """
+        for i in range(0, len(batch), self.batch_size):
+            chunk = batch[i : i + self.batch_size]
+            body: Any = chunk if self.batch_size > 1 else chunk[0]
+            response = self.session.post(self.url, json=body, timeout=self.timeout)
+            self.posts += 1
+            if response.status_code >= 400:
+                raise WebhookError(self.url, response.status_code)
+            self.sent += len(chunk)
+
+    def _post(self, batch: list[Dict[str, Any]]) -> None:
+        delay = self.backoff_initial
+        for attempt in range(self.max_retries + 1):
+            if self._abort.is_set():
+                break
+            if attempt:
+                if self._abort.wait(delay):
+                    break
+                delay = min(delay * 2, self.backoff_max)
+                self.retries += 1
+            try:
+                self.send(batch)
+                return
+            except WebhookError as exc:
+                LOGGER.error("Webhook %s", exc)
+                if exc.status_code != 429 and exc.status_code < 500:
+                    break
+            except Exception as exc:  # pragma: no cover - network issues
+                LOGGER.error("Webhook POST to %s failed: %s", self.url, exc)
+        self.failed += len(batch)
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                item[1].set()
+                continue
+            batch = [item]
+            flush_event = None
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    flush_event = item[1]
+                    break
+                batch.append(item)
+            self._post(batch)
+            if flush_event is not None:
+                flush_event.set()
+        # Anything queued after the stop marker is no longer sent.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                item[1].set()
+            elif item is not _STOP:
+                self.dropped += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "posts": self.posts,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+_DISPATCHERS: dict[str, WebhookDispatcher] = {}
+_DISPATCHERS_LOCK = threading.Lock()
+
+
+def get_dispatcher(url: str, **options: Any) -> WebhookDispatcher:
+    """Return the shared dispatcher for ``url``, creating it on first use.
+
+    ``options`` are passed to :class:`WebhookDispatcher` and only take effect
+    when the dispatcher is created.
+    """
+    with _DISPATCHERS_LOCK:
+        dispatcher = _DISPATCHERS.get(url)
+        if dispatcher is None:
+            if not _DISPATCHERS:
+                atexit.register(close_dispatchers)
+            dispatcher = WebhookDispatcher(url, **options)
+            _DISPATCHERS[url] = dispatcher
+        return dispatcher
+
+
+def close_dispatchers(timeout: float | None = 5.0) -> None:
+    """Flush and close every shared dispatcher."""
+    with _DISPATCHERS_LOCK:
+        dispatchers = list(_DISPATCHERS.values())
+        _DISPATCHERS.clear()
+    for dispatcher in dispatchers:
+        dispatcher.close(timeout)
+        stats = dispatcher.stats()
+        if stats["failed"] or stats["dropped"]:
+            LOGGER.warning("Webhook dispatcher finished with %s", stats)
+
+
+__all__ = ["WebhookDispatcher", "WebhookError", "close_dispatchers", "get_dispatcher"]
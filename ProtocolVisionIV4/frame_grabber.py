@@ -0,0 +1,179 @@
+"""Background frame grabbing for OpenCV cameras."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from .utils import optional_import
+
+
+class FrameGrabber:
+    """Keep a small ring buffer of the newest timestamped frames.
+
+    A daemon thread calls ``grab()``/``retrieve()`` on an OpenCV capture in a
+    loop so the driver's internal queue never goes stale. Consumers either take
+    the newest frame immediately (:meth:`latest`) or wait for the first frame
+    exposed after a trigger timestamp (:meth:`wait_after`). Timestamps come from
+    :func:`time.monotonic`.
+
+    ``dropped`` counts frames the camera skipped, estimated from gaps longer
+    than 1.5 frame periods at the camera's nominal frame rate; ``errors``
+    counts failed grabs. After ``max_failures`` failed grabs in a row the
+    camera is taken to be gone and the thread exits, so :attr:`alive` turns
+    false and the owner can reconnect.
+
+    With ``owns_capture`` the thread releases the capture when it exits.
+    The capture is then never released while ``grab()`` is still running on
+    it, even if :meth:`stop` gave up waiting.
+    """
+
+    def __init__(
+        self,
+        capture: Any,
+        name: str,
+        buffer_size: int = 4,
+        logger: logging.Logger | None = None,
+        *,
+        max_failures: int = 100,
+        owns_capture: bool = False,
+    ) -> None:
+        self.capture = capture
+        self.name = name
+        self.max_failures = max(1, max_failures)
+        self.owns_capture = owns_capture
+        self.logger = logger or logging.getLogger("ProtocolVision")
+        self._frames: deque[tuple[float, Any]] = deque(maxlen=max(1, buffer_size))
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.frames = 0
+        self.dropped = 0
+        self.errors = 0
+        self._interval = 0.0
+        self._last_ts = 0.0
+        nominal = 0.0
+        cv2 = optional_import("cv2")
+        if cv2 is not None:
+            try:
+                nominal = float(capture.get(cv2.CAP_PROP_FPS) or 0.0)
+            except Exception:  # pragma: no cover - driver quirks
+                pass
+        self._period = 1.0 / nominal if nominal > 0 else 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "FrameGrabber":
+        if not self.alive:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"grab-{self.name}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> bool:
+        """Stop the thread; return ``False`` if it is still running after ``timeout``."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                self.logger.warning(
+                    "%s: frame grabber still busy after %.1fs", self.name, timeout
+                )
+                return False
+            self._thread = None
+        with self._cond:
+            self._cond.notify_all()
+        return True
+
+    def _run(self) -> None:
+        try:
+            self._grab_loop()
+        finally:
+            if self.owns_capture:
+                try:
+                    self.capture.release()
+                except Exception as exc:  # pragma: no cover - driver quirks
+                    self.logger.error("%s: releasing capture failed: %s", self.name, exc)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _grab_loop(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            if failures >= self.max_failures:
+                self.logger.error(
+                    "%s: %d grabs failed in a row, stopping frame grabber",
+                    self.name,
+                    failures,
+                )
+                return
+            if not self.capture.grab():
+                self.errors += 1
+                failures += 1
+                time.sleep(0.01)
+                continue
+            ts = time.monotonic()
+            ok, frame = self.capture.retrieve()
+            if not ok:
+                self.errors += 1
+                failures += 1
+                continue
+            failures = 0
+            with self._cond:
+                if self._last_ts:
+                    gap = ts - self._last_ts
+                    if self._period and gap > 1.5 * self._period:
+                        self.dropped += int(round(gap / self._period)) - 1
+                    self._interval = (
+                        gap if not self._interval else 0.9 * self._interval + 0.1 * gap
+                    )
+                self._last_ts = ts
+                self._frames.append((ts, frame))
+                self.frames += 1
+                self._cond.notify_all()
+        self.logger.info("%s: frame grabber stopped", self.name)
+
+    def latest(self, timeout: float = 1.0) -> tuple[float, Any]:
+        """Return the newest ``(timestamp, frame)``, waiting for the first one."""
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._frames or not self.alive, timeout
+            ) or not self._frames:
+                raise TimeoutError(f"{self.name}: no frame within {timeout}s")
+            return self._frames[-1]
+
+    def wait_after(self, trigger_ts: float, timeout: float = 1.0) -> tuple[float, Any]:
+        """Return the first frame grabbed at or after ``trigger_ts``."""
+
+        def _find() -> tuple[float, Any] | None:
+            for entry in self._frames:
+                if entry[0] >= trigger_ts:
+                    return entry
+            return None
+
+        with self._cond:
+            found = self._cond.wait_for(lambda: _find() or not self.alive, timeout)
+            entry = _find() if found else None
+            if entry is None:
+                raise TimeoutError(f"{self.name}: no fresh frame within {timeout}s")
+            return entry
+
+    def stats(self) -> dict[str, Any]:
+        """Return frame, drop and error counters plus the measured FPS."""
+        with self._cond:
+            return {
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "fps": round(1.0 / self._interval, 2) if self._interval else 0.0,
+            }
+
+
+__all__ = ["FrameGrabber"]
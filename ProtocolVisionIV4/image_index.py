@@ -0,0 +1,72 @@
+"""SQLite index mapping serial numbers to saved image paths."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class ImageIndex:
+    """Record where each capture was stored so lookups never scan directories.
+
+    One connection is shared between threads and guarded by a lock; the
+    database runs in WAL mode so readers are not blocked by the writer.
+    """
+
+    def __init__(self, db_path: str | Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " serial TEXT NOT NULL,"
+                " camera TEXT,"
+                " status TEXT,"
+                " path TEXT NOT NULL,"
+                " captured_at TEXT NOT NULL"
+                ")"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_serial"
+                " ON images (serial, captured_at)"
+            )
+
+    def add(
+        self, serial: str, camera: str | None, status: str, path: str, captured_at: str
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO images (serial, camera, status, path, captured_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (serial, camera, status, path, captured_at),
+            )
+
+    def find(self, serial: str, camera: str | None = None) -> list[dict[str, Any]]:
+        """Return the images stored for ``serial``, oldest first."""
+        query = (
+            "SELECT serial, camera, status, path, captured_at FROM images"
+            " WHERE serial = ?"
+        )
+        params: list[Any] = [serial]
+        if camera is not None:
+            query += " AND camera = ?"
+            params.append(camera)
+        query += " ORDER BY captured_at"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        keys = ("serial", "camera", "status", "path", "captured_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+__all__ = ["ImageIndex"]
@@ -2,39 +2,38 @@
 
 from __future__ import annotations
 
+import atexit
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import Any
-import json
+from typing import TYPE_CHECKING, Any
 import configparser
 
-try:
-    import cv2  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    cv2 = None
-
 import os
+import threading
+
+from .config_manager import ConfigManager, get_config
+from .batch_scheduler import BatchScheduler
+from .image_index import ImageIndex
+from .image_writer import ImageWriter, WriteHandle, write_file
+from .model_cache import ModelCache
+from .utils import optional_import
 
-from .config_manager import ConfigManager
-from .ai_processor import AIProcessor
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .ai_processor import AIProcessor
+    from .preprocess import Preprocessor
+    from .shm_inference import ShmInferencePool
 
-# Load configuration once for default serial number and camera type. These
-# values can be overridden when calling :func:`save_captured_image`.
 _DEFAULT_CONFIG = Path(__file__).resolve().parent / "config" / "config.json"
-_CONFIG_PATH = Path(os.environ.get("CONFIG_PATH", _DEFAULT_CONFIG))
-_config: Any = ConfigManager(_CONFIG_PATH)
+# Loaded by :func:`_get_config` on first use rather than at import time.
+_config: Any = None
 
 
 def _safe_get(cfg: Any, key: str, default: Any | None = None) -> Any:
     """Return a config value after validating the config object."""
     if isinstance(cfg, Path):
-        with cfg.open("r", encoding="utf-8") as fh:
-            data = json.load(fh)
-        return data.get(key, default)
+        return get_config(cfg).get(key, default)
     if isinstance(cfg, configparser.ConfigParser):
-        path = getattr(cfg, "filename", None) or getattr(cfg, "_config_path", None)
-        if path:
-            cfg.read(path)
         return cfg.get(cfg.default_section or "DEFAULT", key, fallback=default)
     if isinstance(cfg, ConfigManager):
         return cfg.get(key, default)
@@ -43,9 +42,428 @@ def _safe_get(cfg: Any, key: str, default: Any | None = None) -> Any:
     raise TypeError("_CONFIG must be Path, ConfigParser, dict, or ConfigManager")
 
 
-_SERIAL = _safe_get(_config, "serial_number", "UNKNOWN")
+def _get_config() -> Any:
+    """Return the configuration, loading the shared one on first use.
+
+    The default serial number, AI and storage settings are read from it;
+    ``$CONFIG_PATH`` is consulted at that point, not at import.
+    """
+    global _config
+    if _config is None:
+        _config = get_config(os.environ.get("CONFIG_PATH", _DEFAULT_CONFIG))
+        _config.subscribe(_on_config_change)
+    return _config
+
+
+# Overrides the configured serial number when set (the UI does this).
+_SERIAL: str | None = None
 _CAMERA_TYPE = "USB"
-_AI_PROCESSOR: AIProcessor | None = None
+_MODEL_CACHE: ModelCache | None = None
+_BATCH_SCHEDULER: BatchScheduler | None = None
+_INFERENCE_POOL: ShmInferencePool | None = None
+_PREPROCESSORS: dict[str, Preprocessor | None] = {}
+_IMAGE_WRITER: ImageWriter | None = None
+_IMAGE_INDEX: ImageIndex | None = None
+_KNOWN_DIRS: set[Path] = set()
+
+
+def _load_ai_processor(model_path: str) -> AIProcessor:
+    from .ai_processor import AIProcessor
+
+    config = _get_config()
+    backend = _safe_get(config, "ai_backend")
+    options: dict[str, Any] = {}
+    if backend == "onnx" or (backend is None and str(model_path).endswith(".onnx")):
+        options = {
+            "intra_op_threads": _safe_get(config, "ai_intra_op_threads", 0),
+            "inter_op_threads": _safe_get(config, "ai_inter_op_threads", 0),
+            "conf_threshold": _safe_get(config, "ai_conf_threshold", 0.25),
+            "iou_threshold": _safe_get(config, "ai_iou_threshold", 0.45),
+            "warmup": _safe_get(config, "ai_warmup", True),
+        }
+    return AIProcessor(model_path, backend, **options)
+
+
+def _get_model_cache() -> ModelCache:
+    global _MODEL_CACHE
+    if _MODEL_CACHE is None:
+        config = _get_config()
+        _MODEL_CACHE = ModelCache(
+            _load_ai_processor,
+            model_paths=_safe_get(config, "ai_models", {}),
+            default_path=_safe_get(config, "ai_model_path"),
+            max_models=_safe_get(config, "ai_cache_size", 2),
+            max_bytes=int(_safe_get(config, "ai_cache_max_mb", 0) * 1024 * 1024),
+        )
+    return _MODEL_CACHE
+
+
+def _on_config_change(old: Any, new: Any, changed: set[str]) -> None:
+    """Follow model and camera changes in a reloaded configuration."""
+    if "cameras" in changed:
+        _PREPROCESSORS.clear()
+    if _MODEL_CACHE is None:
+        return
+    if changed & {"ai_models", "ai_model_path"}:
+        _MODEL_CACHE.update_paths(new.get("ai_models", {}), new.get("ai_model_path"))
+    if "model_name" in changed and new.get("use_ai", False):
+        _MODEL_CACHE.switch(new.get("model_name"))
+
+
+def _get_ai_processor() -> AIProcessor:
+    cache = _get_model_cache()
+    if cache.requested_name is None:
+        # Nothing selected yet: start with the configured model.
+        cache.switch(_safe_get(_get_config(), "model_name"), wait=True)
+    return cache.active()
+
+
+def _get_inference_pool() -> ShmInferencePool | None:
+    """Return the worker-process pool when ``ai_workers`` is above 0."""
+    global _INFERENCE_POOL
+    config = _get_config()
+    workers = _safe_get(config, "ai_workers", 0)
+    if workers <= 0:
+        return None
+    if _INFERENCE_POOL is None:
+        from .shm_inference import ShmInferencePool
+
+        _INFERENCE_POOL = ShmInferencePool(
+            _load_ai_processor,
+            model_paths=_safe_get(config, "ai_models", {}),
+            default_path=_safe_get(config, "ai_model_path"),
+            workers=workers,
+            slots=_safe_get(config, "ai_worker_slots"),
+            slot_bytes=int(_safe_get(config, "ai_worker_slot_mb", 8) * 1024 * 1024),
+            max_models=_safe_get(config, "ai_cache_size", 2),
+        )
+        atexit.register(shutdown_inspection)
+    return _INFERENCE_POOL
+
+
+def select_inspection_model(model_name: str, wait: bool = False) -> None:
+    """Switch inspection to ``model_name`` after a product changeover.
+
+    The new model loads in the background while the current one keeps
+    serving, unless ``wait`` is set or no model has been loaded yet. Worker
+    processes (``ai_workers``) pick the model per frame instead, so they
+    are only asked to preload it.
+    """
+    if _safe_get(_get_config(), "use_ai", False):
+        pool = _get_inference_pool()
+        if pool is not None:
+            pool.preload([model_name])
+            return
+        _get_model_cache().switch(model_name, wait=wait)
+
+
+def preload_inspection_models(model_names: list[str]) -> None:
+    """Load models expected next in the background."""
+    if _safe_get(_get_config(), "use_ai", False):
+        pool = _get_inference_pool()
+        if pool is not None:
+            pool.preload(model_names)
+            return
+        _get_model_cache().preload(model_names)
+
+
+def warm_up_inspection() -> None:
+    """Load (and warm up) the AI model now instead of on the first part."""
+    if _safe_get(_get_config(), "use_ai", False):
+        if _get_inference_pool() is None:
+            _get_ai_processor()
+        preload_inspection_models(_safe_get(_get_config(), "ai_preload", []))
+
+
+def shutdown_inspection() -> None:
+    """Finish queued batches and stop the inference worker processes, if started."""
+    global _BATCH_SCHEDULER, _INFERENCE_POOL
+    if _BATCH_SCHEDULER is not None:
+        _BATCH_SCHEDULER.close()
+        _BATCH_SCHEDULER = None
+    if _INFERENCE_POOL is not None:
+        _INFERENCE_POOL.close()
+        _INFERENCE_POOL = None
+
+
+def _processor_for(model: str | None) -> AIProcessor:
+    return _get_model_cache().get(model) if model else _get_ai_processor()
+
+
+def _predict_batch(items: list[tuple[Any, str | None]]) -> list[bool]:
+    """Run one ``process_batch`` per model among ``(frame, model)`` items."""
+    verdicts: list[Any] = [None] * len(items)
+    groups: dict[str | None, list[int]] = {}
+    for index, (_, model) in enumerate(items):
+        groups.setdefault(model, []).append(index)
+    for model, indices in groups.items():
+        results = _processor_for(model).process_batch([items[i][0] for i in indices])
+        for index, verdict in zip(indices, results):
+            verdicts[index] = verdict
+    return verdicts
+
+
+def _get_batch_scheduler() -> BatchScheduler | None:
+    global _BATCH_SCHEDULER
+    batch_size = _safe_get(_get_config(), "ai_batch_size", 1)
+    if batch_size <= 1:
+        return None
+    if _BATCH_SCHEDULER is None:
+        _BATCH_SCHEDULER = BatchScheduler(
+            _predict_batch,
+            max_batch_size=batch_size,
+            max_wait_ms=_safe_get(_get_config(), "ai_batch_wait_ms", 5.0),
+        )
+        atexit.register(shutdown_inspection)
+    return _BATCH_SCHEDULER
+
+
+def _get_preprocessor(camera: str | None) -> Preprocessor | None:
+    """Return the preprocessing set up in the ``preprocess`` entry of ``camera``."""
+    if not camera:
+        return None
+    if camera not in _PREPROCESSORS:
+        options = next(
+            (
+                cam.get("preprocess")
+                for cam in _safe_get(_get_config(), "cameras", [])
+                if cam.get("name") == camera
+            ),
+            None,
+        )
+        if options:
+            from .preprocess import Preprocessor
+
+            _PREPROCESSORS[camera] = Preprocessor.from_config(options)
+        else:
+            _PREPROCESSORS[camera] = None
+    return _PREPROCESSORS[camera]
+
+
+def _combine(futures: list[Future]) -> Future:
+    """Return a future that is NG if any region is NG and OK once all are OK."""
+    if len(futures) == 1:
+        return futures[0]
+    combined: Future = Future()
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def _done(_: Future) -> None:
+        with lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        try:
+            verdicts = [future.result() for future in futures]
+        except Exception as exc:
+            combined.set_exception(exc)
+            return
+        if all(verdict is None for verdict in verdicts):
+            combined.set_result(None)
+        else:
+            combined.set_result(all(verdict is not False for verdict in verdicts))
+
+    for future in futures:
+        future.add_done_callback(_done)
+    return combined
+
+
+def _inspect_frame(frame: Any, model: str | None = None) -> Future:
+    scheduler = _get_batch_scheduler()
+    if scheduler is not None:
+        return scheduler.submit((frame, model))
+    future: Future = Future()
+    try:
+        future.set_result(_processor_for(model).process_image(frame))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def _submit_to_pool(
+    pool: ShmInferencePool,
+    image: Any,
+    preprocessor: Preprocessor | None,
+    labels: dict[str, str],
+) -> Future:
+    if preprocessor is None:
+        return pool.submit(image, **labels)
+    dtype = preprocessor.output_dtype(image)
+    futures = []
+    # Each region is preprocessed straight into its shared-memory slot and
+    # submitted before the next slot is taken, so a part never holds more
+    # than one slot while waiting for another.
+    for index, region in enumerate(preprocessor.regions(image)):
+        shape = preprocessor.output_shape(image, region)
+        slot, array = pool.reserve(shape, dtype)
+        try:
+            preprocessor.apply_region(image, index, region, array)
+        except Exception:
+            pool.cancel(slot)
+            raise
+        futures.append(pool.submit_slot(slot, shape, dtype, **labels))
+    return _combine(futures)
+
+
+def submit_inspection(
+    image: Any,
+    *,
+    camera: str | None = None,
+    serial: str | None = None,
+    model: str | None = None,
+) -> Future:
+    """Queue an in-memory frame for AI inspection and return a future verdict.
+
+    A camera with a ``preprocess`` entry has its frame cropped to the
+    configured regions, resized and converted first (see
+    :class:`~ProtocolVisionIV4.preprocess.Preprocessor`); the part is NG if
+    any region is. The frame is inspected with ``model``, or the active
+    model when it is omitted, so parts of different models can be inspected
+    at the same time. With ``ai_workers`` above 0 the frame is handed to
+    worker processes through shared memory (there the default is the
+    configured model); ``camera`` and ``serial`` label it. Otherwise, with
+    ``ai_batch_size`` above 1, frames from all cameras are grouped into
+    micro-batches, one inference call per model, or the frame is inspected
+    immediately. The future resolves to the same value
+    :func:`inspect_image` returns.
+    """
+    if (
+        image is None
+        or not hasattr(image, "shape")
+        or not _safe_get(_get_config(), "use_ai", False)
+    ):
+        future: Future = Future()
+        future.set_result(None)
+        return future
+    preprocessor = _get_preprocessor(camera)
+    pool = _get_inference_pool()
+    if pool is not None:
+        labels = {
+            "camera": camera or "",
+            "serial": serial or "",
+            "model": model or _safe_get(_get_config(), "model_name", ""),
+        }
+        return _submit_to_pool(pool, image, preprocessor, labels)
+    if preprocessor is None:
+        return _inspect_frame(image, model)
+    frames = preprocessor.apply(image)
+    future = _combine([_inspect_frame(frame, model) for frame in frames])
+    future.add_done_callback(lambda _: preprocessor.release(frames))
+    return future
+
+
+def inspect_image(image: Any, camera: str | None = None) -> bool | None:
+    """Return the AI verdict for an in-memory frame.
+
+    Returns ``True`` for OK and ``False`` for NG, or ``None`` when AI
+    inspection is disabled or ``image`` is not a decoded frame (for example the
+    placeholder results of mock cameras). ``camera`` selects its
+    preprocessing.
+    """
+    return submit_inspection(image, camera=camera).result()
+
+
+def _prepare_save(
+    image: Any,
+    output_path: str,
+    serial: str | None,
+    camera_type: str | None,
+    ok: bool | None,
+    camera: str | None,
+) -> tuple[Path, Any, dict[str, Any]]:
+    """Return the final file path, the data to write and its index record.
+
+    With the default ``sharded`` layout files are named
+    ``SERIAL_CAMERA_STATUS_YYYYMMDD_HHMMSS_mmm`` and stored under
+    ``YYYYMMDD/HH`` sub-directories. The ``flat`` layout keeps the original
+    ``SERIAL_STATUS_YYYYMMDD_HHMM`` names in a single directory.
+    """
+    now = datetime.now()
+    serial = serial or _SERIAL or _safe_get(_get_config(), "serial_number", "UNKNOWN")
+    camera_type = camera_type or _CAMERA_TYPE
+    out_dir = Path(output_path)
+
+    if ok is None:
+        verdict = inspect_image(image, camera)
+        ok = True if verdict is None else verdict
+    status = "OK" if ok else "NG"
+    preprocessor = _get_preprocessor(camera)
+    if preprocessor is not None and hasattr(image, "shape"):
+        image = preprocessor.crop_for_save(image)
+
+    if _safe_get(_get_config(), "image_layout", "sharded") == "flat":
+        timestamp = now.strftime("%Y%m%d_%H%M")
+        stem = f"{serial}_{status}_{timestamp}"
+    else:
+        timestamp = f"{now:%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}"
+        out_dir = out_dir / now.strftime("%Y%m%d") / now.strftime("%H")
+        stem = f"{serial}_{camera or camera_type}_{status}_{timestamp}"
+
+    record = {
+        "serial": serial,
+        "camera": camera,
+        "status": status,
+        "captured_at": now.isoformat(timespec="milliseconds"),
+    }
+    if camera_type == "USB" and optional_import("cv2") is not None:
+        return out_dir / f"{stem}.jpg", image, record
+    if isinstance(image, (bytes, bytearray)) and image:
+        # Encoded image received over the framed IV protocol
+        return out_dir / f"{stem}.jpg", image, record
+    # For mocked systems create a dummy text file for now
+    return (
+        out_dir / f"{stem}.txt",
+        f"Mock image captured from {camera_type} at {timestamp}\n",
+        record,
+    )
+
+
+def _get_image_index() -> ImageIndex | None:
+    global _IMAGE_INDEX
+    if _IMAGE_INDEX is None:
+        index_path = _safe_get(_get_config(), "image_index_path")
+        if not index_path:
+            return None
+        _IMAGE_INDEX = ImageIndex(index_path)
+    return _IMAGE_INDEX
+
+
+def _index(record: dict[str, Any], path: Path) -> None:
+    index = _get_image_index()
+    if index is not None:
+        index.add(
+            record["serial"],
+            record["camera"],
+            record["status"],
+            str(path),
+            record["captured_at"],
+        )
+
+
+def find_images(serial: str, camera: str | None = None) -> list[dict[str, Any]]:
+    """Return the indexed images of ``serial`` without scanning directories."""
+    index = _get_image_index()
+    return [] if index is None else index.find(serial, camera)
+
+
+def _ensure_dir(directory: Path) -> None:
+    if directory not in _KNOWN_DIRS:
+        directory.mkdir(parents=True, exist_ok=True)
+        _KNOWN_DIRS.add(directory)
+
+
+def _get_image_writer() -> ImageWriter | None:
+    global _IMAGE_WRITER
+    workers = _safe_get(_get_config(), "image_writer_workers", 0)
+    if workers <= 0:
+        return None
+    if _IMAGE_WRITER is None:
+        _IMAGE_WRITER = ImageWriter(
+            workers=workers,
+            queue_size=_safe_get(_get_config(), "image_writer_queue", 32),
+            policy=_safe_get(_get_config(), "image_writer_policy", "block"),
+        )
+    return _IMAGE_WRITER
 
 
 def save_captured_image(
@@ -54,14 +472,22 @@ def save_captured_image(
     *,
     serial: str | None = None,
     camera_type: str | None = None,
-    ok: bool = True,
+    ok: bool | None = None,
+    camera: str | None = None,
 ) -> str:
     """Save a captured image or placeholder file.
 
-    The file name uses the configured serial number and the current timestamp in
-    the format ``YYYYMMDD_HHMM``. For a real USB camera, the image is written to
-    disk using ``cv2.imwrite``. For mock cameras (``IV2``, ``IV4``, ``VS``), a
-    text file is created instead with basic log information.
+    The file name uses the serial number, camera name, status and a
+    millisecond timestamp, and files are sharded into date/hour directories
+    (see :func:`_prepare_save`). Every save is recorded in the image index
+    when ``image_index_path`` is configured. For a real USB camera, the image is written to
+    disk using ``cv2.imwrite``; encoded images from framed IV heads are written
+    as-is. For mock cameras (``IV2``, ``IV4``, ``VS``), a text file is created
+    instead with basic log information.
+
+    The image is written once, already carrying its final OK/NG name. Pass the
+    verdict from :func:`inspect_image` as ``ok``; when ``ok`` is ``None`` the
+    frame is inspected here (if AI is enabled) and treated as OK otherwise.
 
     Parameters
     ----------
@@ -74,44 +500,84 @@ def save_captured_image(
     camera_type:
         Override the camera type used when saving.
     ok:
-        ``True`` if the result was OK, ``False`` for NG.
+        ``True`` if the result was OK, ``False`` for NG, ``None`` to inspect.
+    camera:
+        Name of the camera that took the image.
 
     Returns
     -------
     str
         Path to the saved file.
     """
+    file_path, data, record = _prepare_save(
+        image, output_path, serial, camera_type, ok, camera
+    )
+    _ensure_dir(file_path.parent)
+    write_file(file_path, data)
+    _index(record, file_path)
+    return str(file_path)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    serial = serial or _SERIAL
-    camera_type = camera_type or _CAMERA_TYPE
-    out_dir = Path(output_path)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    if camera_type == "USB" and cv2 is not None:
-        use_ai = _safe_get(_config, "use_ai", False)
-        if use_ai:
-            global _AI_PROCESSOR
-            if _AI_PROCESSOR is None:
-                _AI_PROCESSOR = AIProcessor(_safe_get(_config, "ai_model_path"))
-            temp_path = out_dir / f"{serial}_TMP_{timestamp}.jpg"
-            cv2.imwrite(str(temp_path), image)
-            ok = _AI_PROCESSOR.process_image(str(temp_path))
-            status = "OK" if ok else "NG"
-            file_path = out_dir / f"{serial}_{status}_{timestamp}.jpg"
-            temp_path.rename(file_path)
-        else:
-            status = "OK" if ok else "NG"
-            file_path = out_dir / f"{serial}_{status}_{timestamp}.jpg"
-            cv2.imwrite(str(file_path), image)
+
+def queue_captured_image(
+    image: Any,
+    output_path: str,
+    *,
+    serial: str | None = None,
+    camera_type: str | None = None,
+    ok: bool | None = None,
+    camera: str | None = None,
+) -> WriteHandle:
+    """Like :func:`save_captured_image` but write on the background pool.
+
+    The returned handle carries the final ``path`` immediately; call
+    ``result()`` to wait until the file is on disk. With
+    ``image_writer_workers`` set to 0 the file is written before returning.
+    """
+    file_path, data, record = _prepare_save(
+        image, output_path, serial, camera_type, ok, camera
+    )
+    writer = _get_image_writer()
+    if writer is not None:
+        handle = writer.submit(file_path, data)
+
+        def _on_written(future: Future) -> None:
+            if future.exception() is None:
+                _index(record, file_path)
+
+        handle.future.add_done_callback(_on_written)
+        return handle
+    future: Future = Future()
+    try:
+        _ensure_dir(file_path.parent)
+        write_file(file_path, data)
+        _index(record, file_path)
+    except Exception as exc:
+        future.set_exception(exc)
     else:
-        status = "OK" if ok else "NG"
-        # For mocked systems create a dummy text file for now
-        file_path = out_dir / f"{serial}_{status}_{timestamp}.txt"
-        with file_path.open("w", encoding="utf-8") as f:
-            f.write(f"Mock image captured from {camera_type} at {timestamp}\n")
+        future.set_result(str(file_path))
+    return WriteHandle(file_path, future)
 
-    return str(file_path)
+
+def shutdown_image_writer() -> None:
+    """Drain and stop the background writer pool and close the image index."""
+    global _IMAGE_WRITER, _IMAGE_INDEX
+    if _IMAGE_WRITER is not None:
+        _IMAGE_WRITER.shutdown()
+        _IMAGE_WRITER = None
+    if _IMAGE_INDEX is not None:
+        _IMAGE_INDEX.close()
+        _IMAGE_INDEX = None
 
 
-__all__ = ["save_captured_image"]
+__all__ = [
+    "save_captured_image",
+    "queue_captured_image",
+    "shutdown_image_writer",
+    "shutdown_inspection",
+    "find_images",
+    "inspect_image",
+    "submit_inspection",
+    "warm_up_inspection",
+    "select_inspection_model",
+    "preload_inspection_models",
+]
@@ -0,0 +1,180 @@
+"""Background image writer pool with a bounded queue."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from .utils import optional_import
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+POLICIES = {"block", "drop"}
+
+_STOP = object()
+
+
+class WriterQueueFull(Exception):
+    """Raised for a save that was dropped because the writer queue was full."""
+
+
+class WriteHandle:
+    """Pending write of one file.
+
+    ``path`` is known immediately; :meth:`result` waits until the file is on
+    disk and returns the path, re-raising any write error.
+    """
+
+    def __init__(self, path: Path, future: Future) -> None:
+        self.path = path
+        self.future = future
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float | None = None) -> str:
+        return self.future.result(timeout)
+
+
+def write_file(path: Path, data: Any) -> None:
+    """Write ``data`` to ``path``.
+
+    Text is written as UTF-8, ``bytes`` (an already encoded image) verbatim,
+    and anything else is treated as a frame and encoded with ``cv2.imwrite``.
+    """
+    if isinstance(data, str):
+        with path.open("w", encoding="utf-8") as fh:
+            fh.write(data)
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        with path.open("wb") as fh:
+            fh.write(data)
+    else:
+        cv2 = optional_import("cv2")
+        if cv2 is None:
+            raise ImportError("OpenCV is required to write image frames")
+        if not cv2.imwrite(str(path), data):
+            raise OSError(f"cv2.imwrite failed for {path}")
+
+
+class ImageWriter:
+    """Write images on ``workers`` background threads.
+
+    Saves are queued in a queue of at most ``queue_size`` entries. When it is
+    full, the ``block`` policy makes :meth:`submit` wait for space while the
+    ``drop`` policy fails the save immediately with :class:`WriterQueueFull`.
+    Parent directories are created once and remembered.
+    """
+
+    def __init__(
+        self, workers: int = 2, queue_size: int = 32, policy: str = "block"
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unsupported writer policy: {policy}")
+        self.policy = policy
+        self._queue: queue.Queue[Any] = queue.Queue(max(1, queue_size))
+        self._dirs: set[Path] = set()
+        self._lock = threading.Lock()
+        # Held while a save is queued, so shutdown() cannot slip its stop
+        # markers in between the closed check and the put.
+        self._submit_lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"image-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def ensure_dir(self, directory: Path) -> None:
+        if directory in self._dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._dirs.add(directory)
+
+    def submit(self, path: str | Path, data: Any) -> WriteHandle:
+        """Queue ``data`` to be written to ``path``."""
+        path = Path(path)
+        future: Future = Future()
+        handle = WriteHandle(path, future)
+        entry = (path, data, future, time.perf_counter())
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("ImageWriter is shut down")
+            if self.policy == "drop":
+                try:
+                    self._queue.put_nowait(entry)
+                except queue.Full:
+                    with self._lock:
+                        self.dropped += 1
+                    LOGGER.error("Image writer queue full, dropped %s", path)
+                    future.set_exception(WriterQueueFull(f"writer queue full, dropped {path}"))
+                    return handle
+            else:
+                self._queue.put(entry)
+        depth = self._queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+        return handle
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            path, data, future, queued_at = entry
+            try:
+                self.ensure_dir(path.parent)
+                write_file(path, data)
+            except Exception as exc:
+                with self._lock:
+                    self.failed += 1
+                LOGGER.error("Writing %s failed: %s", path, exc)
+                future.set_exception(exc)
+            else:
+                with self._lock:
+                    self.written += 1
+                    self._latencies.append(time.perf_counter() - queued_at)
+                future.set_result(str(path))
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        """Stop accepting saves and wait until every queued save is written."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth, counters and queue-to-disk latency in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+        if latencies:
+            stats["latency_mean"] = round(sum(latencies) / len(latencies), 4)
+            stats["latency_p95"] = round(latencies[int(0.95 * (len(latencies) - 1))], 4)
+            stats["latency_max"] = round(latencies[-1], 4)
+        return stats
+
+
+__all__ = ["ImageWriter", "WriteHandle", "WriterQueueFull", "write_file"]
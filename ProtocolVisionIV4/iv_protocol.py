@@ -0,0 +1,326 @@
+"""Framed IV2/IV3/IV4 protocol: asyncio client, blocking helpers and a mock head.
+
+Every message on the wire is a frame made of a 5 byte header followed by the
+payload::
+
+    +--------+----------------+=================+
+    | status | length (u32be) | payload bytes   |
+    +--------+----------------+=================+
+
+Requests use status ``0`` and carry the command (``b"TRIGGER"``). Responses
+carry the encoded image on success, or a UTF-8 error message with a non-zero
+status. Payloads are received straight into a buffer allocated once per frame,
+so large images are reassembled without repeated ``bytes`` concatenation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import socket
+import struct
+from collections import deque
+from typing import Any, Iterable
+
+HEADER = struct.Struct(">BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+TRIGGER = b"TRIGGER"
+MAX_FRAME = 64 * 1024 * 1024
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+
+class IVProtocolError(Exception):
+    """Raised for malformed frames or error responses from a head."""
+
+
+def encode_frame(payload: bytes, status: int = STATUS_OK) -> bytes:
+    """Return ``payload`` prefixed with the frame header."""
+    return HEADER.pack(status, len(payload)) + payload
+
+
+def _recv_exactly(sock: socket.socket, view: memoryview) -> None:
+    pos = 0
+    while pos < len(view):
+        n = sock.recv_into(view[pos:])
+        if n == 0:
+            raise ConnectionError("connection closed mid-frame")
+        pos += n
+
+
+def read_frame(sock: socket.socket, max_frame: int = MAX_FRAME) -> tuple[int, bytearray]:
+    """Read one frame from a blocking socket and return ``(status, payload)``."""
+    header = bytearray(HEADER.size)
+    _recv_exactly(sock, memoryview(header))
+    status, length = HEADER.unpack(header)
+    if length > max_frame:
+        raise IVProtocolError(f"frame of {length} bytes exceeds limit of {max_frame}")
+    payload = bytearray(length)
+    _recv_exactly(sock, memoryview(payload))
+    return status, payload
+
+
+class _FrameProtocol(asyncio.BufferedProtocol):
+    """Parse response frames and resolve pending requests in FIFO order."""
+
+    def __init__(self, max_frame: int) -> None:
+        self.max_frame = max_frame
+        self.transport: asyncio.Transport | None = None
+        self.waiters: deque[asyncio.Future[bytearray]] = deque()
+        self.closed: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._header = bytearray(HEADER.size)
+        self._header_pos = 0
+        self._status = STATUS_OK
+        self._payload: bytearray | None = None
+        self._view: memoryview | None = None
+        self._payload_pos = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._view is None:
+            return memoryview(self._header)[self._header_pos:]
+        return self._view[self._payload_pos:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self._view is None:
+            self._header_pos += nbytes
+            if self._header_pos < HEADER.size:
+                return
+            self._header_pos = 0
+            self._status, length = HEADER.unpack(self._header)
+            if length > self.max_frame:
+                assert self.transport is not None
+                self.transport.close()
+                self._fail(IVProtocolError(f"frame of {length} bytes exceeds limit"))
+                return
+            self._payload = bytearray(length)
+            self._view = memoryview(self._payload)
+            self._payload_pos = 0
+            if length == 0:
+                self._complete()
+            return
+        self._payload_pos += nbytes
+        if self._payload_pos == len(self._view):
+            self._complete()
+
+    def _complete(self) -> None:
+        payload = self._payload
+        assert payload is not None
+        self._payload = None
+        self._view = None
+        if not self.waiters:
+            LOGGER.warning("Discarding unsolicited IV frame of %d bytes", len(payload))
+            return
+        waiter = self.waiters.popleft()
+        if waiter.done():  # the caller gave up waiting
+            return
+        if self._status == STATUS_OK:
+            waiter.set_result(payload)
+        else:
+            message = payload.decode("utf-8", errors="replace")
+            waiter.set_exception(IVProtocolError(f"head reported error: {message}"))
+
+    def _fail(self, exc: Exception) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._fail(exc or ConnectionError("connection closed"))
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class AsyncIVClient:
+    """Asyncio client for a single IV head.
+
+    Several :meth:`trigger` calls may be outstanding on one connection; the
+    responses are matched to requests in order.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        name: str | None = None,
+        timeout: float = 5.0,
+        max_frame: int = MAX_FRAME,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.name = name or f"{host}:{port}"
+        self.timeout = timeout
+        self.max_frame = max_frame
+        self._protocol: _FrameProtocol | None = None
+        self._connect_lock: asyncio.Lock | None = None
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self._protocol is not None
+            and self._protocol.transport is not None
+            and not self._protocol.transport.is_closing()
+        )
+
+    async def connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        _, protocol = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: _FrameProtocol(self.max_frame), self.host, self.port
+            ),
+            self.timeout,
+        )
+        self._protocol = protocol
+        LOGGER.info("%s: framed IV session opened", self.name)
+
+    async def request(
+        self, command: bytes, timeout: float | None = None
+    ) -> bytearray:
+        """Send ``command`` and return the payload of its response frame."""
+        if not self.connected:
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:
+                if not self.connected:
+                    await self.connect()
+        protocol = self._protocol
+        assert protocol is not None and protocol.transport is not None
+        waiter: asyncio.Future[bytearray] = asyncio.get_running_loop().create_future()
+        protocol.waiters.append(waiter)
+        protocol.transport.write(encode_frame(command))
+        return await asyncio.wait_for(
+            waiter, self.timeout if timeout is None else timeout
+        )
+
+    async def trigger(self, timeout: float | None = None) -> bytearray:
+        """Trigger the head and return the encoded image it sends back."""
+        return await self.request(TRIGGER, timeout)
+
+    async def close(self) -> None:
+        protocol = self._protocol
+        self._protocol = None
+        if protocol is not None and protocol.transport is not None:
+            protocol.transport.close()
+            await protocol.closed
+
+
+async def trigger_all(
+    clients: Iterable[AsyncIVClient], timeout: float | None = None
+) -> dict[str, Any]:
+    """Trigger every client concurrently.
+
+    Returns a mapping of client name to the image payload, or to the exception
+    raised for that head, so one failing head never hides the others.
+    """
+    clients = list(clients)
+    results = await asyncio.gather(
+        *(client.trigger(timeout) for client in clients), return_exceptions=True
+    )
+    return {client.name: result for client, result in zip(clients, results)}
+
+
+class MockIVServer:
+    """Local stand-in for an IV head speaking the framed protocol.
+
+    Every ``TRIGGER`` is answered after ``delay`` seconds with a payload of
+    ``image_size`` bytes; any other command gets an error frame.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        image_size: int = 1024 * 1024,
+        delay: float = 0.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.image = bytes(range(256)) * (image_size // 256) + bytes(image_size % 256)
+        self.triggers = 0
+        self._server: Any | None = None
+
+    async def start(self) -> int:
+        """Start listening and return the bound port."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                _, length = HEADER.unpack(header)
+                command = await reader.readexactly(length)
+                if command == TRIGGER:
+                    self.triggers += 1
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    writer.write(encode_frame(self.image))
+                else:
+                    writer.write(encode_frame(b"unknown command", STATUS_ERROR))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def main() -> None:
+    """Run a mock IV head until interrupted."""
+    parser = argparse.ArgumentParser(description="Mock IV head (framed protocol)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--image-size", type=int, default=1024 * 1024)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    server = MockIVServer(
+        args.host, args.port, image_size=args.image_size, delay=args.delay
+    )
+
+    async def _run() -> None:
+        port = await server.start()
+        LOGGER.info("Mock IV head listening on %s:%s", args.host, port)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+__all__ = [
+    "AsyncIVClient",
+    "IVProtocolError",
+    "MockIVServer",
+    "encode_frame",
+    "read_frame",
+    "trigger_all",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Time-range queries over the Logger JSONL export and its rotated segments."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, TextIO
+
+from .log_rotation import SegmentManifest, line_timestamp
+
+EXPORT_FORMATS = {"csv", "jsonl", "json"}
+
+# Below this many bytes a bisection step is not worth another seek.
+_SCAN_WINDOW = 64 * 1024
+
+
+def _next_timestamp(fh: BinaryIO, offset: int) -> tuple[int, str | None]:
+    """Return the offset and timestamp of the first full line at or after ``offset``."""
+    fh.seek(offset)
+    if offset:
+        fh.readline()
+    while True:
+        pos = fh.tell()
+        raw = fh.readline()
+        if not raw:
+            return pos, None
+        ts = line_timestamp(raw.decode("utf-8", errors="replace"))
+        if ts:
+            return pos, ts
+
+
+def seek_time(fh: BinaryIO, start: str) -> int:
+    """Return a byte offset at or before the first line stamped ``start`` or later.
+
+    Records are appended in time order, so the file is bisected on the
+    timestamp of the first full line after each probe; this touches
+    O(log n) lines instead of reading everything before ``start``.
+    """
+    fh.seek(0, 2)
+    lo, hi = 0, fh.tell()
+    while hi - lo > _SCAN_WINDOW:
+        mid = (lo + hi) // 2
+        pos, ts = _next_timestamp(fh, mid)
+        if ts is None or ts >= start:
+            hi = mid
+        else:
+            lo = pos
+    return lo
+
+
+def _segment_files(
+    log_dir: Path, source: str, start: str | None, end: str | None
+) -> list[Path]:
+    """Return the segments of ``source`` overlapping the window, oldest first."""
+    files = []
+    for entry in SegmentManifest(log_dir).for_source(source):
+        if start and entry.get("end") and entry["end"] < start:
+            continue
+        if end and entry.get("start") and entry["start"] > end:
+            continue
+        files.append(log_dir / entry["file"])
+    live = log_dir / source
+    if live.exists():
+        files.append(live)
+    return files
+
+
+def _read_lines(path: Path, start: str | None) -> Iterator[bytes]:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as fh:
+            yield from fh
+        return
+    with path.open("rb") as fh:
+        fh.seek(seek_time(fh, start) if start else 0)
+        if fh.tell():
+            fh.readline()
+        yield from fh
+
+
+def query_logs(
+    log_dir: str | Path,
+    start: str | None = None,
+    end: str | None = None,
+    level: str | None = None,
+    serial: str | None = None,
+    source: str = "log.jsonl",
+) -> Iterator[dict[str, Any]]:
+    """Yield the log records matching the filters, oldest first.
+
+    ``start`` and ``end`` are inclusive ISO timestamps (a prefix such as
+    ``2024-05-01`` works). Segments whose manifest time range lies outside
+    the window are skipped entirely, and uncompressed files are bisected to
+    the start of the window, so only the relevant region is read. Records are
+    streamed one at a time and never collected in memory. ``serial`` matches
+    the record's ``serial`` field, or the message text for older records
+    written without one.
+    """
+    log_dir = Path(log_dir)
+    level = level.upper() if level else None
+    # A bare date as ``end`` should include the whole day.
+    end_key = end + "\uffff" if end else None
+    for path in _segment_files(log_dir, source, start, end_key):
+        for raw in _read_lines(path, start):
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            ts = record.get("timestamp", "")
+            if start and ts < start:
+                continue
+            if end_key and ts > end_key:
+                break
+            if level and record.get("level") != level:
+                continue
+            if serial and record.get("serial", "") != serial:
+                if "serial" in record or serial not in record.get("message", ""):
+                    continue
+            yield record
+
+
+def export_logs(
+    records: Iterable[dict[str, Any]], out: TextIO, fmt: str = "jsonl"
+) -> int:
+    """Stream ``records`` to ``out`` as CSV, JSON lines or a JSON array.
+
+    Returns the number of records written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(
+            out,
+            fieldnames=["timestamp", "level", "serial", "message"],
+            extrasaction="ignore",
+        )
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    elif fmt == "json":
+        out.write("[")
+        for record in records:
+            out.write(("," if count else "") + "\n" + json.dumps(record, ensure_ascii=False))
+            count += 1
+        out.write("\n]\n")
+    else:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+__all__ = ["EXPORT_FORMATS", "export_logs", "query_logs", "seek_time"]
@@ -0,0 +1,245 @@
+"""Size- and day-based rotation for the CSV/JSONL log exports."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TextIO
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def line_timestamp(line: str) -> str | None:
+    """Return the ISO timestamp at the start of a CSV or JSONL log line."""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            return json.loads(line).get("timestamp")
+        except ValueError:
+            return None
+    ts = line.split(",", 1)[0]
+    return ts if ts[:4].isdigit() else None
+
+
+class SegmentManifest:
+    """Track rotated segments and the time range each one covers.
+
+    The manifest lives next to the exports as ``manifest.json`` and is
+    rewritten atomically whenever a segment is added, compressed or deleted.
+    """
+
+    def __init__(self, log_dir: str | Path) -> None:
+        self.path = Path(log_dir) / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self.segments: list[dict[str, Any]] = []
+        if self.path.exists():
+            try:
+                with self.path.open("r", encoding="utf-8") as fh:
+                    self.segments = json.load(fh).get("segments", [])
+            except (OSError, ValueError) as exc:
+                LOGGER.error("Ignoring unreadable log manifest %s: %s", self.path, exc)
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            json.dump({"segments": self.segments}, fh, indent=2)
+        os.replace(tmp, self.path)
+
+    def add(self, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self.segments.append(entry)
+            self._save()
+
+    def rename(self, old: str, new: str, size: int) -> None:
+        with self._lock:
+            for entry in self.segments:
+                if entry["file"] == old:
+                    entry["file"] = new
+                    entry["bytes"] = size
+            self._save()
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self.segments = [e for e in self.segments if e["file"] != name]
+            self._save()
+
+    def for_source(self, source: str) -> list[dict[str, Any]]:
+        with self._lock:
+            return [dict(e) for e in self.segments if e["source"] == source]
+
+
+class ExportFile:
+    """Append-only export file that rotates by size and/or calendar day.
+
+    The file stays open between writes. Before a write that would push the
+    file past ``max_bytes``, or whose first record falls on a later day than
+    the segment started, the current file is renamed to
+    ``<stem>.<start>.<suffix>`` and recorded in the manifest. Rotated segments
+    are gzip-compressed on ``compressor`` when ``compress`` is set, and only
+    the newest ``retention`` segments (0 keeps all) are kept.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        header: str = "",
+        *,
+        max_bytes: int = 0,
+        daily: bool = False,
+        retention: int = 0,
+        compress: bool = True,
+        manifest: SegmentManifest | None = None,
+        compressor: ThreadPoolExecutor | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.header = header
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.retention = retention
+        self.compress = compress
+        self.manifest = manifest
+        self.compressor = compressor
+        self._fh: TextIO | None = None
+        self._size = 0
+        self.first_ts: str | None = None
+        self.last_ts: str | None = None
+        self.records = 0
+
+    @property
+    def rotating(self) -> bool:
+        return bool(self.max_bytes or self.daily)
+
+    def _open(self) -> TextIO:
+        if self._fh is None:
+            exists = self.path.exists() and self.path.stat().st_size > 0
+            self._fh = self.path.open("a", newline="", encoding="utf-8")
+            if exists:
+                self._size = self.path.stat().st_size
+                if self.rotating and self.first_ts is None:
+                    self._scan_existing()
+            else:
+                self._size = 0
+                if self.header:
+                    self._fh.write(self.header)
+                    self._size = len(self.header.encode("utf-8"))
+        return self._fh
+
+    def _scan_existing(self) -> None:
+        """Recover the time range of a segment left over from a previous run."""
+        with self.path.open("rb") as fh:
+            for raw in fh:
+                ts = line_timestamp(raw.decode("utf-8", errors="replace"))
+                if ts:
+                    self.first_ts = ts
+                    break
+            fh.seek(max(0, self._size - 4096))
+            for raw in fh.read().splitlines():
+                ts = line_timestamp(raw.decode("utf-8", errors="replace"))
+                if ts:
+                    self.last_ts = ts
+
+    def write(self, text: str, first_ts: str, last_ts: str, records: int = 1) -> None:
+        """Append ``text`` holding ``records`` records spanning the two timestamps."""
+        fh = self._open()
+        nbytes = len(text.encode("utf-8"))
+        if self.rotating and self._has_data() and (
+            (self.max_bytes and self._size + nbytes > self.max_bytes)
+            or (self.daily and self.first_ts and first_ts[:10] != self.first_ts[:10])
+        ):
+            self.rotate()
+            fh = self._open()
+        fh.write(text)
+        self._size += nbytes
+        self.records += records
+        if self.first_ts is None:
+            self.first_ts = first_ts
+        self.last_ts = last_ts
+
+    def _has_data(self) -> bool:
+        return self._size > len(self.header.encode("utf-8"))
+
+    def flush(self, fsync: bool = False) -> None:
+        if self._fh is not None:
+            self._fh.flush()
+            if fsync:
+                os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def rotate(self) -> Path | None:
+        """Close the current file and move it aside as a finished segment."""
+        self.close()
+        if not self.path.exists():
+            return None
+        stamp = (self.first_ts or "unknown").replace("-", "").replace(":", "")[:15]
+        target = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        n = 1
+        while target.exists() or target.with_name(target.name + ".gz").exists():
+            target = self.path.with_name(f"{self.path.stem}.{stamp}-{n}{self.path.suffix}")
+            n += 1
+        os.replace(self.path, target)
+        LOGGER.info("Rotated %s to %s", self.path.name, target.name)
+        if self.manifest is not None:
+            self.manifest.add(
+                {
+                    "file": target.name,
+                    "source": self.path.name,
+                    "start": self.first_ts,
+                    "end": self.last_ts,
+                    "records": self.records,
+                    "bytes": target.stat().st_size,
+                    "header": bool(self.header),
+                }
+            )
+        self.first_ts = None
+        self.last_ts = None
+        self.records = 0
+        self._size = 0
+        if self.compress:
+            if self.compressor is not None:
+                self.compressor.submit(self._finish_segment, target)
+            else:
+                self._finish_segment(target)
+        else:
+            self._apply_retention()
+        return target
+
+    def _finish_segment(self, segment: Path) -> None:
+        try:
+            gz_path = segment.with_name(segment.name + ".gz")
+            with segment.open("rb") as src, gzip.open(gz_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            segment.unlink()
+            if self.manifest is not None:
+                self.manifest.rename(segment.name, gz_path.name, gz_path.stat().st_size)
+        except Exception as exc:  # pragma: no cover - disk errors
+            LOGGER.error("Compressing %s failed: %s", segment, exc)
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        if not self.retention or self.manifest is None:
+            return
+        segments = self.manifest.for_source(self.path.name)
+        for entry in segments[: max(0, len(segments) - self.retention)]:
+            try:
+                (self.path.parent / entry["file"]).unlink()
+            except FileNotFoundError:
+                pass
+            self.manifest.remove(entry["file"])
+            LOGGER.info("Deleted expired log segment %s", entry["file"])
+
+
+__all__ = ["ExportFile", "SegmentManifest", "line_timestamp"]
@@ -0,0 +1,163 @@
+"""Buffered background sink for the Logger CSV/JSONL exports."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict
+
+from .log_rotation import ExportFile
+
+FSYNC_POLICIES = {"none", "batch", "record"}
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+_FLUSH = object()
+_STOP = object()
+
+
+class BufferedLogSink:
+    """Append log records to ``log.csv`` and ``log.jsonl`` from a worker thread.
+
+    :meth:`write` only enqueues. The worker writes through two
+    :class:`~ProtocolVisionIV4.log_rotation.ExportFile` objects, which keep
+    the files open (and rotate them if configured), and writes
+    a batch once ``batch_size`` records are pending or ``flush_interval``
+    seconds have passed since the first pending record. ``fsync`` controls
+    durability: ``none`` leaves flushing to the OS, ``batch`` fsyncs after each
+    batch and ``record`` after every record. When the queue already holds
+    ``max_queue`` records, new records are dropped and counted in
+    ``dropped`` rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        csv_file: ExportFile,
+        json_file: ExportFile,
+        fieldnames: list[str],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        fsync: str = "none",
+        max_queue: int = 10000,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        self.csv_file = csv_file
+        self.json_file = json_file
+        self.fieldnames = fieldnames
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.fsync = fsync
+        self._queue: queue.Queue[Any] = queue.Queue(max(1, max_queue))
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Queue ``record``; return ``False`` if it had to be dropped."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every record queued so far is written."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Write everything still queued, close the files and stop the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _close_files(self) -> None:
+        self.csv_file.close()
+        self.json_file.close()
+
+    def _sync(self) -> None:
+        self.csv_file.flush(self.fsync != "none")
+        self.json_file.flush(self.fsync != "none")
+
+    def _write_batch(self, batch: list[Dict[str, Any]]) -> None:
+        chunks = [batch] if self.fsync != "record" else [[r] for r in batch]
+        for chunk in chunks:
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=self.fieldnames, extrasaction="ignore")
+            writer.writerows(chunk)
+            first, last = chunk[0]["timestamp"], chunk[-1]["timestamp"]
+            self.csv_file.write(buf.getvalue(), first, last, len(chunk))
+            self.json_file.write(
+                "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk),
+                first,
+                last,
+                len(chunk),
+            )
+            self._sync()
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self) -> None:
+        batch: list[Dict[str, Any]] = []
+        deadline = 0.0
+        running = True
+        while running:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            flush_event = None
+            if item is _STOP:
+                running = False
+            elif isinstance(item, tuple) and item and item[0] is _FLUSH:
+                flush_event = item[1]
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+            if batch and (
+                not running
+                or flush_event is not None
+                or len(batch) >= self.batch_size
+                or time.monotonic() >= deadline
+            ):
+                try:
+                    self._write_batch(batch)
+                except Exception as exc:  # pragma: no cover - disk errors
+                    self.dropped += len(batch)
+                    LOGGER.error("Writing log batch failed: %s", exc)
+                    self._close_files()
+                batch = []
+            if flush_event is not None:
+                flush_event.set()
+        self._close_files()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
+__all__ = ["BufferedLogSink", "FSYNC_POLICIES"]
@@ -2,19 +2,36 @@
 
 from __future__ import annotations
 
+import atexit
 import csv
+import io
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Mapping
 
-import requests
-import paho.mqtt.publish as mqtt_publish
+from .log_rotation import ExportFile, SegmentManifest
+from .log_sink import BufferedLogSink
+
+FIELDNAMES = ["timestamp", "level", "message"]
 
 
 class Logger:
-    """Log messages to console, files, and optional integrations."""
+    """Log messages to console, files, and optional integrations.
+
+    With ``buffered=True`` the CSV/JSONL exports are written by a
+    :class:`~ProtocolVisionIV4.log_sink.BufferedLogSink` on a background
+    thread instead of opening both files on every :meth:`log` call. Call
+    :meth:`close` (also registered with :mod:`atexit`) to flush on shutdown.
+
+    ``rotate_max_bytes`` and ``rotate_daily`` rotate both exports by size and
+    by calendar day. Rotated segments are gzip-compressed in the background
+    (``compress``), at most ``retention`` segments per export are kept
+    (0 keeps all), and ``manifest.json`` records the time range of each one.
+    """
 
     def __init__(
         self,
@@ -23,6 +40,15 @@ class Logger:
         mqtt_broker: str = "",
         mqtt_port: int = 1883,
         mqtt_topic: str = "",
+        buffered: bool = False,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        fsync: str = "none",
+        max_queue: int = 10000,
+        rotate_max_bytes: int = 0,
+        rotate_daily: bool = False,
+        retention: int = 0,
+        compress: bool = True,
     ) -> None:
         self.log_dir = Path(log_path).parent
         self.log_dir.mkdir(parents=True, exist_ok=True)
@@ -44,51 +70,159 @@ class Logger:
 
         self.csv_path = self.log_dir / "log.csv"
         self.json_path = self.log_dir / "log.jsonl"
-        if not self.csv_path.exists():
-            with self.csv_path.open("w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(
-                    f, fieldnames=["timestamp", "level", "message"]
-                )
-                writer.writeheader()
+        self.manifest = SegmentManifest(self.log_dir)
+        self._compressor: ThreadPoolExecutor | None = None
+        if rotate_max_bytes or rotate_daily:
+            self._compressor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="log-compress"
+            )
+        rotation = {
+            "max_bytes": rotate_max_bytes,
+            "daily": rotate_daily,
+            "retention": retention,
+            "compress": compress,
+            "manifest": self.manifest,
+            "compressor": self._compressor,
+        }
+        header = io.StringIO()
+        csv.DictWriter(header, fieldnames=FIELDNAMES).writeheader()
+        self.csv_file = ExportFile(self.csv_path, header.getvalue(), **rotation)
+        self.json_file = ExportFile(self.json_path, **rotation)
+        self._write_lock = threading.Lock()
+
+        self.sink: BufferedLogSink | None = None
+        if buffered:
+            self.sink = BufferedLogSink(
+                self.csv_file,
+                self.json_file,
+                FIELDNAMES,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                fsync=fsync,
+                max_queue=max_queue,
+            )
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, config: Any) -> "Logger":
+        """Build a logger from the ``log_*``, webhook and MQTT settings."""
+        return cls(
+            config.get("log_path"),
+            webhook_url=config.get("webhook_url"),
+            mqtt_broker=config.get("mqtt_broker"),
+            mqtt_port=config.get("mqtt_port"),
+            mqtt_topic=config.get("mqtt_topic"),
+            buffered=config.get("log_buffered", False),
+            batch_size=config.get("log_batch_size", 100),
+            flush_interval=config.get("log_flush_interval", 1.0),
+            fsync=config.get("log_fsync", "none"),
+            max_queue=config.get("log_queue_size", 10000),
+            rotate_max_bytes=int(config.get("log_rotate_max_mb", 0) * 1024 * 1024),
+            rotate_daily=config.get("log_rotate_daily", False),
+            retention=config.get("log_retention", 0),
+            compress=config.get("log_compress", True),
+        )
+
+    def apply_config(self, config: Mapping[str, Any]) -> None:
+        """Adopt changed settings from a reloaded configuration snapshot.
+
+        Integration targets, sink batching/fsync and rotation limits take
+        effect immediately; ``log_path``, ``log_buffered`` and
+        ``log_queue_size`` still need a restart.
+        """
+        self.webhook_url = config.get("webhook_url", self.webhook_url)
+        self.mqtt_broker = config.get("mqtt_broker", self.mqtt_broker)
+        self.mqtt_port = config.get("mqtt_port", self.mqtt_port)
+        self.mqtt_topic = config.get("mqtt_topic", self.mqtt_topic)
+        if self.sink is not None:
+            self.sink.batch_size = max(1, config.get("log_batch_size", self.sink.batch_size))
+            self.sink.flush_interval = config.get("log_flush_interval", self.sink.flush_interval)
+            self.sink.fsync = config.get("log_fsync", self.sink.fsync)
+        for export in (self.csv_file, self.json_file):
+            export.max_bytes = int(config.get("log_rotate_max_mb", 0) * 1024 * 1024)
+            export.daily = config.get("log_rotate_daily", False)
+            export.retention = config.get("log_retention", 0)
+            export.compress = config.get("log_compress", True)
 
     def _write_csv(self, data: Dict[str, Any]) -> None:
-        with self.csv_path.open("a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["timestamp", "level", "message"])
-            writer.writerow(data)
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=FIELDNAMES, extrasaction="ignore").writerow(data)
+        self.csv_file.write(buf.getvalue(), data["timestamp"], data["timestamp"])
+        self.csv_file.flush()
 
     def _write_json(self, data: Dict[str, Any]) -> None:
-        with self.json_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self.json_file.write(
+            json.dumps(data, ensure_ascii=False) + "\n",
+            data["timestamp"],
+            data["timestamp"],
+        )
+        self.json_file.flush()
 
-    def log(self, level: str, message: str) -> None:
-        """Log a message at the specified level."""
+    def log(self, level: str, message: str, serial: str | None = None) -> None:
+        """Log a message at the specified level.
+
+        ``serial`` is stored with the JSONL record so queries can filter on it.
+        """
         ts = datetime.now().isoformat(timespec="seconds")
         log_data = {"timestamp": ts, "level": level.upper(), "message": message}
+        if serial is not None:
+            log_data["serial"] = serial
         getattr(self.logger, level.lower())(message)
-        self._write_csv(log_data)
-        self._write_json(log_data)
+        if self.sink is not None:
+            self.sink.write(log_data)
+        else:
+            with self._write_lock:
+                self._write_csv(log_data)
+                self._write_json(log_data)
+
+    @property
+    def dropped(self) -> int:
+        """Number of records the buffered sink had to drop."""
+        return self.sink.dropped if self.sink is not None else 0
+
+    def flush(self) -> None:
+        """Wait until every logged record has reached the export files."""
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self) -> None:
+        """Flush pending records, close the exports and finish compression."""
+        if self.sink is not None:
+            self.sink.close()
+        with self._write_lock:
+            self.csv_file.close()
+            self.json_file.close()
+        if self._compressor is not None:
+            self._compressor.shutdown(wait=True)
 
     def send_webhook(self, payload: Dict[str, Any]) -> None:
-        """Send payload via HTTP POST if a webhook URL is configured."""
+        """Queue payload for HTTP POST if a webhook URL is configured.
+
+        Delivery, batching and retries are handled by the shared
+        :class:`~ProtocolVisionIV4.dispatcher.WebhookDispatcher` for the URL.
+        """
         if not self.webhook_url:
             return
-        try:
-            requests.post(self.webhook_url, json=payload, timeout=5)
-        except Exception as exc:  # pragma: no cover - network issues
-            self.logger.error("Webhook POST failed: %s", exc)
+        from .dispatcher import get_dispatcher
+
+        get_dispatcher(self.webhook_url).submit(payload)
 
     def publish_mqtt(self, payload: Dict[str, Any]) -> None:
-        """Publish payload to the configured MQTT topic."""
+        """Queue payload for the configured MQTT topic.
+
+        Messages go through the shared
+        :class:`~ProtocolVisionIV4.mqtt_client.MqttPublisher` for the broker,
+        which keeps one connection open and queues messages while it is down.
+        """
         if not (self.mqtt_broker and self.mqtt_topic):
             return
+        from .mqtt_client import get_publisher
+
         try:
-            mqtt_publish.single(
-                self.mqtt_topic,
-                json.dumps(payload),
-                hostname=self.mqtt_broker,
-                port=self.mqtt_port,
+            get_publisher(self.mqtt_broker, self.mqtt_port).publish(
+                self.mqtt_topic, json.dumps(payload)
             )
-        except Exception as exc:  # pragma: no cover - network issues
+        except Exception as exc:  # pragma: no cover - paho missing
             self.logger.error("MQTT publish failed: %s", exc)
 
 
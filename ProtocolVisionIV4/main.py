@@ -10,9 +10,11 @@ if __package__ in {None, ""}:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import argparse
+import logging
 import os
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
@@ -20,14 +22,22 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog
 
 from ProtocolVisionIV4.camera_manager import CameraManager, CameraError
-from ProtocolVisionIV4.config_manager import ConfigManager
-from ProtocolVisionIV4.image_saver import save_captured_image
+from ProtocolVisionIV4.config_manager import get_config
+from ProtocolVisionIV4.image_saver import (
+    inspect_image,
+    save_captured_image,
+    select_inspection_model,
+    warm_up_inspection,
+)
 from ProtocolVisionIV4.model_selector import ModelSelector
+from ProtocolVisionIV4.serial_input import ScannerReader
 
 
 DEFAULT_CONFIG = Path(__file__).resolve().parent / "config" / "config.json"
 CONFIG_PATH = Path(os.environ.get("CONFIG_PATH", DEFAULT_CONFIG))
 
+LOGGER = logging.getLogger("ProtocolVision")
+
 
 class App:
     """Simple Tkinter UI for Protocol Vision IV4."""
@@ -37,9 +47,19 @@ class App:
         self.root.title("Protocol Vision IV4")
 
         # load configuration
-        self.config = ConfigManager(CONFIG_PATH)
-        self.camera_mgr = CameraManager(self.config.get("cameras"))
+        self.config = get_config(CONFIG_PATH)
+        self.camera_mgr = CameraManager(
+            self.config.get("cameras"),
+            backoff_max=self.config.get("camera_backoff_max", 30.0),
+        )
+        self.camera_mgr.start_keepalive(
+            self.config.get("camera_keepalive_interval", 5.0)
+        )
+        self.config.subscribe(self.on_config_change)
+        self.config.start_watching(self.config.get("config_watch_interval", 1.0))
         self.status_vars: dict[str, tk.StringVar] = {}
+        self.selector = ModelSelector(CONFIG_PATH)
+        warm_up_inspection()
 
         # labels displaying current state
         self.serial_var = tk.StringVar(value=self.config.get("serial_number"))
@@ -73,6 +93,25 @@ class App:
             row=row, column=0, columnspan=4, padx=5, pady=5, sticky="ew"
         )
 
+        # Every scan selects the model and captures all cameras. That runs on
+        # one worker thread, in scan order, so the UI stays responsive.
+        self.cycles = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ui-cycle")
+        self.scanner: ScannerReader | None = None
+        if self.config.get("scanner_port"):
+            self.scanner = ScannerReader(
+                self.config.get("scanner_port"),
+                self.config.get("scanner_baud"),
+                debounce=self.config.get("scanner_debounce", 1.0),
+                line_timeout=self.config.get("scanner_line_timeout", 0.5),
+                max_queue=0,
+            )
+            self.scanner.subscribe(lambda code: self.cycles.submit(self.on_scan, code))
+            try:
+                self.scanner.start()
+            except ImportError as exc:
+                LOGGER.warning("Scanner disabled: %s", exc)
+                self.scanner = None
+
         root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ------------------------------------------------------------------
@@ -87,48 +126,101 @@ class App:
         except (CameraError, Exception) as exc:  # pragma: no cover - UI feedback
             messagebox.showerror("Connection failed", str(exc))
 
-    def capture_image(self, name: str) -> None:
+    def capture_image(self, name: str, notify: bool = True) -> None:
         """Capture an image using the specified camera."""
         try:
-            img = self.camera_mgr.capture_image(name)
-            ok = img is not None
-            path = save_captured_image(
-                img,
-                self.config.get("image_output_path"),
-                serial=self.config.get("serial_number"),
-                camera_type=self.camera_mgr.cameras[name].camera_type,
-                ok=ok,
-            )
+            path = self.capture(name)
             self.image_var.set(path)
-            messagebox.showinfo("Capture", f"{name} image saved to {path}")
+            if notify:
+                messagebox.showinfo("Capture", f"{name} image saved to {path}")
         except Exception as exc:  # pragma: no cover - UI feedback
             messagebox.showerror("Capture failed", str(exc))
 
+    def capture(self, name: str) -> str:
+        """Capture, inspect and save one image; return its path. Touches no widgets."""
+        img = self.camera_mgr.capture_image(name)
+        ok = img is not None
+        if ok:
+            verdict = inspect_image(img, camera=name)
+            if verdict is not None:
+                ok = verdict
+        return save_captured_image(
+            img,
+            self.config.get("image_output_path"),
+            serial=self.config.get("serial_number"),
+            camera_type=self.camera_mgr.cameras[name].camera_type,
+            ok=ok,
+            camera=name,
+        )
+
     def select_model(self) -> None:
         """Prompt for a serial number and update the selected model."""
         serial = simpledialog.askstring(
             "Serial", "Enter serial number:", parent=self.root
         )
         if serial:
-            selector = ModelSelector()
-            model = selector.select_model(serial)
-            selector.register_model(serial, model)
-            self.config.data["serial_number"] = serial
-            self.config.data["model_name"] = model
-            self.serial_var.set(serial)
-            self.model_var.set(model)
-
-            # persist changes back to configuration file
-            with open(CONFIG_PATH, "w", encoding="utf-8") as fh:
-                json.dump(self.config.data, fh, indent=2)
-
-            import ProtocolVisionIV4.image_saver as image_saver
-
-            image_saver._SERIAL = serial
+            model = self.apply_serial(serial)
             messagebox.showinfo("Model", f"Selected model: {model}")
 
+    def on_scan(self, serial: str) -> None:
+        """Run an inspection cycle for a scanned serial number (worker thread)."""
+        self.apply_serial(serial)
+        for name in self.camera_mgr.names():
+            try:
+                path = self.capture(name)
+            except Exception as exc:  # pragma: no cover - UI feedback
+                LOGGER.error("Capture from %s failed: %s", name, exc)
+                self.root.after(0, messagebox.showerror, "Capture failed", f"{name}: {exc}")
+                continue
+            self.root.after(0, self.image_var.set, path)
+
+    def apply_serial(self, serial: str) -> str:
+        """Make ``serial`` current, switch to its model and return the model.
+
+        Safe to call from any thread; the labels are updated on the UI thread.
+        """
+        model = self.selector.select_model(serial)
+        self.selector.register_model(serial, model)
+        self.config.set("serial_number", serial)
+        self.config.set("model_name", model)
+        self.root.after(0, self.serial_var.set, serial)
+        self.root.after(0, self.model_var.set, model)
+        select_inspection_model(model)
+        self.persist_config()
+
+        import ProtocolVisionIV4.image_saver as image_saver
+
+        image_saver._SERIAL = serial
+        return model
+
+    def persist_config(self) -> None:
+        """Write the current settings back to the configuration file.
+
+        The file is replaced atomically, so the config watcher and a crash
+        mid-write never see a half-written file.
+        """
+        tmp = CONFIG_PATH.with_name(CONFIG_PATH.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.config.data, fh, indent=2)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, CONFIG_PATH)
+
+    def on_config_change(self, old: Any, new: Any, changed: set[str]) -> None:
+        """Apply an edited configuration file without restarting."""
+        if "cameras" in changed:
+            self.camera_mgr.reconfigure([dict(cam) for cam in new["cameras"]])
+        # Tk widgets may only be touched from the UI thread.
+        self.root.after(0, self.serial_var.set, new.get("serial_number"))
+        self.root.after(0, self.model_var.set, new.get("model_name"))
+
     def on_close(self) -> None:
+        if self.scanner is not None:
+            self.scanner.stop()
+        self.cycles.shutdown(wait=False, cancel_futures=True)
+        self.config.stop_watching()
         self.camera_mgr.release_all()
+        self.selector.close()
         self.root.destroy()
 
 
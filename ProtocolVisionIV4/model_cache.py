@@ -0,0 +1,208 @@
+"""LRU cache of loaded AI models keyed by model name."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+
+class ModelCache:
+    """Keep recently used inspection models loaded.
+
+    ``model_paths`` maps model names (as chosen by ``select_model_by_serial``)
+    to model files; names without an entry use ``default_path``. ``loader``
+    turns a file path into a ready-to-use processor.
+
+    The cache holds at most ``max_models`` models and, if ``max_bytes`` is set,
+    at most that many bytes of model files, evicting the least recently used
+    model first. Loads run on a single background thread. :meth:`switch`
+    requests a changeover and returns immediately; the previously active model
+    keeps serving :meth:`active` until the new one has finished loading.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        model_paths: dict[str, str] | None = None,
+        default_path: str | None = None,
+        max_models: int = 2,
+        max_bytes: int = 0,
+    ) -> None:
+        self.loader = loader
+        self.model_paths = dict(model_paths or {})
+        self.default_path = default_path
+        self.max_models = max(1, max_models)
+        self.max_bytes = max_bytes
+        self._models: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._loading: dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+        self._active: str | None = None
+        self._requested: str | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, name: str) -> str:
+        path = self.model_paths.get(name, self.default_path)
+        if not path:
+            raise KeyError(f"No model file configured for '{name}'")
+        return path
+
+    def update_paths(
+        self, model_paths: dict[str, str] | None, default_path: str | None
+    ) -> None:
+        """Point model names at new files after a configuration change.
+
+        Cached models whose file changed are dropped, except the active one,
+        which keeps serving while its replacement loads in the background.
+        """
+        with self._lock:
+            old = {name: self.model_paths.get(name, self.default_path) for name in self._models}
+            self.model_paths = dict(model_paths or {})
+            self.default_path = default_path
+            stale = [
+                name
+                for name, path in old.items()
+                if self.model_paths.get(name, self.default_path) != path
+            ]
+            for name in stale:
+                if name != self._active:
+                    del self._models[name]
+        if self._active in stale:
+            self._submit(self._active)
+
+    def _load(self, name: str) -> Any:
+        path = self.path_for(name)
+        LOGGER.info("Loading model %s from %s", name, path)
+        try:
+            model = self.loader(path)
+        except Exception as exc:
+            LOGGER.error("Loading model %s failed: %s", name, exc)
+            with self._lock:
+                self._loading.pop(name, None)
+            raise
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            self._models[name] = (model, size)
+            self._models.move_to_end(name)
+            self._loading.pop(name, None)
+            if self._requested == name:
+                if self._active != name:
+                    LOGGER.info("Switched inspection model to %s", name)
+                self._active = name
+            self._evict()
+        return model
+
+    def _evict(self) -> None:
+        def over_limit() -> bool:
+            total = sum(size for _, size in self._models.values())
+            return len(self._models) > self.max_models or bool(
+                self.max_bytes and total > self.max_bytes
+            )
+
+        for name in list(self._models):
+            if not over_limit():
+                break
+            if name in (self._active, self._requested):
+                continue
+            del self._models[name]
+            self.evictions += 1
+            LOGGER.info("Evicted model %s from cache", name)
+
+    def _submit(self, name: str) -> Future:
+        with self._lock:
+            future = self._loading.get(name)
+            if future is None:
+                future = self._executor.submit(self._load, name)
+                self._loading[name] = future
+            return future
+
+    def get(self, name: str) -> Any:
+        """Return the model for ``name``, loading it synchronously if needed."""
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return self._submit(name).result()
+
+    def preload(self, names: Iterable[str]) -> None:
+        """Load ``names`` in the background so a later switch is instant."""
+        for name in names:
+            with self._lock:
+                if name in self._models:
+                    continue
+            self._submit(name)
+
+    def switch(self, name: str, wait: bool = False) -> None:
+        """Make ``name`` the active model.
+
+        If it is not loaded yet, loading starts in the background and the
+        current model keeps serving. With no active model, or ``wait=True``,
+        the call blocks until the load completes.
+        """
+        with self._lock:
+            self._requested = name
+            if name in self._models:
+                self._models.move_to_end(name)
+                self._active = name
+                self.hits += 1
+                return
+            self.misses += 1
+            block = wait or self._active is None
+        future = self._submit(name)
+        if block:
+            future.result()
+
+    def active(self) -> Any:
+        """Return the active model, loading the requested one if none is active."""
+        with self._lock:
+            name = self._active
+            entry = self._models.get(name) if name is not None else None
+        if entry is not None:
+            return entry[0]
+        if self._requested is None:
+            raise RuntimeError("No inspection model selected")
+        self.switch(self._requested, wait=True)
+        return self.active()
+
+    @property
+    def active_name(self) -> str | None:
+        return self._active
+
+    @property
+    def requested_name(self) -> str | None:
+        return self._requested
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "requested": self._requested,
+                "loaded": list(self._models),
+                "loading": list(self._loading),
+                "bytes": sum(size for _, size in self._models.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._models.clear()
+
+
+__all__ = ["ModelCache"]
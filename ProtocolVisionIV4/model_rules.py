@@ -0,0 +1,232 @@
+"""Rule engine mapping serial numbers to inspection models."""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+RULE_TYPES = {"exact", "prefix", "regex"}
+
+# Backreferences are numbered per pattern, so such rules cannot be merged
+# into the combined alternation.
+_BACKREF = re.compile(r"\\[1-9]|\(\?P=")
+
+# When priorities tie, the more specific kind of rule wins.
+_KIND_RANK = {"exact": 2, "prefix": 1, "regex": 0}
+
+
+class RuleError(Exception):
+    """Raised for a malformed rules file."""
+
+
+class _TrieNode:
+    __slots__ = ("children", "rank")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.rank: tuple[Any, ...] | None = None
+
+
+class CompiledRules:
+    """Immutable, pre-compiled form of a rule list.
+
+    Every rule is ``{"type", "pattern", "model", "priority"}``. A serial is
+    matched against all rules and the one with the highest ``priority`` wins;
+    ties go to exact rules, then the longest prefix, then regex rules, and
+    finally to the rule listed first. Exact rules are a dict lookup and
+    prefix rules live in a trie walked once along the serial. Regex rules
+    are merged, in rank order, into one alternation of named groups, so a
+    single ``match`` call finds the best regex rule.
+    """
+
+    def __init__(self, rules: Iterable[dict[str, Any]], default: str) -> None:
+        self.default = default
+        self._exact: dict[str, tuple[Any, ...]] = {}
+        self._trie = _TrieNode()
+        self._regex: list[tuple[tuple[Any, ...], re.Pattern[str]]] = []
+        self.count = 0
+        for order, rule in enumerate(rules):
+            kind = rule.get("type", "exact")
+            pattern = rule.get("pattern")
+            model = rule.get("model")
+            priority = rule.get("priority", 0)
+            if kind not in RULE_TYPES:
+                raise RuleError(f"Rule {order}: unknown type '{kind}'")
+            if not isinstance(pattern, str) or not isinstance(model, str):
+                raise RuleError(f"Rule {order}: 'pattern' and 'model' must be strings")
+            if not isinstance(priority, (int, float)):
+                raise RuleError(f"Rule {order}: 'priority' must be a number")
+            specificity = len(pattern) if kind == "prefix" else 0
+            rank = (priority, _KIND_RANK[kind], specificity, -order, model)
+            if kind == "exact":
+                if pattern not in self._exact or rank > self._exact[pattern]:
+                    self._exact[pattern] = rank
+            elif kind == "prefix":
+                node = self._trie
+                for char in pattern:
+                    node = node.children.setdefault(char, _TrieNode())
+                if node.rank is None or rank > node.rank:
+                    node.rank = rank
+            else:
+                try:
+                    compiled = re.compile(pattern)
+                except re.error as exc:
+                    raise RuleError(f"Rule {order}: invalid regex {pattern!r}: {exc}") from exc
+                self._regex.append((rank, compiled))
+            self.count += 1
+        self._regex.sort(key=lambda item: item[0], reverse=True)
+        self._combined: re.Pattern[str] | None = None
+        self._regex_ranks: dict[str, tuple[Any, ...]] = {}
+        if self._regex and not any(_BACKREF.search(p.pattern) for _, p in self._regex):
+            parts = []
+            for i, (rank, pattern) in enumerate(self._regex):
+                name = f"_rule_{i}"
+                parts.append(f"(?P<{name}>{pattern.pattern})")
+                self._regex_ranks[name] = rank
+            try:
+                self._combined = re.compile("|".join(parts))
+            except re.error:
+                # Rules that compile alone can clash once joined, e.g. inline
+                # flags such as ``(?i)`` or a group name used twice.
+                self._combined = None
+
+    def match(self, serial: str) -> str:
+        """Return the model for ``serial``, or the default if no rule matches."""
+        best = self._exact.get(serial)
+        node = self._trie
+        if node.rank is not None and (best is None or node.rank > best):
+            best = node.rank
+        for char in serial:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.rank is not None and (best is None or node.rank > best):
+                best = node.rank
+        if self._combined is not None:
+            if best is None or self._regex[0][0] > best:
+                found = self._combined.match(serial)
+                if found is not None:
+                    rank = self._regex_ranks[found.lastgroup]
+                    if best is None or rank > best:
+                        best = rank
+        else:
+            for rank, pattern in self._regex:
+                if best is not None and rank < best:
+                    break
+                if pattern.match(serial):
+                    best = rank
+                    break
+        return best[-1] if best is not None else self.default
+
+
+def load_rules(path: str | Path, default: str) -> CompiledRules:
+    """Read and compile the rules file at ``path``.
+
+    The file is JSON: ``{"default": "...", "rules": [...]}`` or a bare list of
+    rules. Raises :class:`RuleError` if it is malformed.
+    """
+    try:
+        with Path(path).open("r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except ValueError as exc:
+        raise RuleError(f"Invalid JSON in rules file {path}: {exc}") from exc
+    if isinstance(data, list):
+        data = {"rules": data}
+    if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+        raise RuleError(f"Rules file {path} must contain a 'rules' list")
+    return CompiledRules(data.get("rules", []), data.get("default", default))
+
+
+class RuleEngine:
+    """Serve model lookups from a rules file, reloading it when it changes.
+
+    At most every ``check_interval`` seconds, a lookup checks the file's
+    modification time and size. If either changed, the file is compiled
+    again and swapped in as a whole, so concurrent lookups see either the old
+    or the new rule set, never a mix. A rules file that fails to load is
+    logged and the previous rules stay active. Results are memoised in an
+    LRU cache of ``cache_size`` serials that is replaced along with the rules.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        default: str,
+        cache_size: int = 4096,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        self.default = default
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._signature: tuple[float, int] | None = None
+        self._next_check = 0.0
+        self.rules = CompiledRules([], default)
+        self._lookup: Callable[[str], str] = lru_cache(cache_size)(self.rules.match)
+        self.reloads = 0
+        self.reload()
+
+    def _stat(self) -> tuple[float, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile the rules if the file changed; return ``True`` if swapped."""
+        with self._reload_lock:
+            signature = self._stat()
+            self._next_check = time.monotonic() + self.check_interval
+            if signature == self._signature and not force:
+                return False
+            if signature is None:
+                rules = CompiledRules([], self.default)
+            else:
+                try:
+                    rules = load_rules(self.path, self.default)
+                except (OSError, RuleError) as exc:
+                    LOGGER.error("Keeping previous model rules: %s", exc)
+                    self._signature = signature
+                    return False
+            self._signature = signature
+            # Swapping the bound lookup replaces rules and memo in one step.
+            self.rules = rules
+            self._lookup = lru_cache(self.cache_size)(rules.match)
+            self.reloads += 1
+            LOGGER.info("Loaded %d model rules from %s", rules.count, self.path)
+            return True
+
+    def select(self, serial: str) -> str:
+        """Return the model for ``serial``."""
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._lookup(serial)
+
+    def stats(self) -> dict[str, Any]:
+        info = self._lookup.cache_info()  # type: ignore[attr-defined]
+        return {
+            "rules": self.rules.count,
+            "reloads": self.reloads,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+        }
+
+
+__all__ = [
+    "CompiledRules",
+    "RULE_TYPES",
+    "RuleEngine",
+    "RuleError",
+    "load_rules",
+]
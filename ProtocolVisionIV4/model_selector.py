@@ -4,27 +4,76 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 from .utils import select_model_by_serial
 
 _DEFAULT_CONFIG = Path(__file__).resolve().parent / "config" / "config.json"
 
+# Schema migrations, applied in order; ``PRAGMA user_version`` records how
+# many have run. Append new steps, never edit existing ones.
+MIGRATIONS: list[tuple[str, ...]] = [
+    (
+        "CREATE TABLE IF NOT EXISTS selections ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " serial TEXT,"
+        " model TEXT,"
+        " timestamp TEXT"
+        ")",
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS idx_selections_serial"
+        " ON selections (serial, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_selections_timestamp ON selections (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_selections_model ON selections (model)",
+    ),
+]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply any pending :data:`MIGRATIONS` to ``conn``; return the schema version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+    return max(version, len(MIGRATIONS))
+
 
 class ModelSelector:
-    """Select and register models based on serial codes."""
+    """Select and register models based on serial codes.
+
+    Models are chosen by :func:`~ProtocolVisionIV4.utils.select_model_by_serial`
+    with the configured ``model_rules_path``, the same lookup that sets the
+    configuration's ``model_name``. Selections are stored in the SQLite
+    registry at ``model_registry_path``. Each thread gets its own long-lived
+    connection in WAL mode and the schema is migrated once per selector. With ``batch_size`` above 1,
+    :meth:`register_model` buffers selections and writes them in a single
+    transaction once the batch is full. The query methods and :meth:`close`
+    flush the buffer first, so they always see every registered selection.
+    """
 
-    def __init__(self, config_path: str | Path | None = None) -> None:
+    def __init__(
+        self, config_path: str | Path | None = None, batch_size: int | None = None
+    ) -> None:
         self.config_path = Path(config_path or os.environ.get("CONFIG_PATH", _DEFAULT_CONFIG))
         self._config: Any | None = None
         self._db_path: Path | None = None
+        self._batch_size = batch_size
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._migrated = False
+        self._pending: list[tuple[str, str, str]] = []
 
     def _load_config(self) -> Any:
         if self._config is None:
-            from .config_manager import ConfigManager
-            self._config = ConfigManager(self.config_path)
+            from .config_manager import get_config
+            self._config = get_config(self.config_path)
         return self._config
 
     def _get_db_path(self) -> Path:
@@ -38,28 +87,112 @@ class ModelSelector:
             )
         return self._db_path
 
+    @property
+    def batch_size(self) -> int:
+        if self._batch_size is None:
+            self._batch_size = self._load_config().get("model_registry_batch_size", 1)
+        return max(1, self._batch_size)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            db_path = self._get_db_path()
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._migrated:
+                    migrate(conn)
+                    self._migrated = True
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
     def select_model(self, serial_code: str) -> str:
         """Return the model for a given serial code."""
-        return select_model_by_serial(serial_code)
+        config = self._load_config()
+        return select_model_by_serial(
+            serial_code,
+            config.get("model_rules_path"),
+            config.get("model_rules_cache_size", 4096),
+        )
 
     def register_model(self, serial_code: str, model: str) -> None:
         """Store the selected model along with a timestamp."""
-        db_path = self._get_db_path()
-        db_path.parent.mkdir(parents=True, exist_ok=True)
         ts = datetime.now().isoformat(timespec="seconds")
-        with sqlite3.connect(db_path) as conn:
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS selections ("
-                "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-                " serial TEXT,"
-                " model TEXT,"
-                " timestamp TEXT"
-                ")"
-            )
-            conn.execute(
+        with self._lock:
+            self._pending.append((serial_code, model, ts))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def register_models(self, selections: Iterable[tuple[str, str]]) -> None:
+        """Store several ``(serial, model)`` selections in one transaction."""
+        ts = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._pending.extend((serial, model, ts) for serial, model in selections)
+        self.flush()
+
+    def flush(self) -> None:
+        """Write buffered selections in a single transaction."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany(
                 "INSERT INTO selections (serial, model, timestamp) VALUES (?, ?, ?)",
-                (serial_code, model, ts),
+                rows,
             )
 
+    def latest_model(self, serial_code: str) -> str | None:
+        """Return the model most recently registered for ``serial_code``."""
+        self.flush()
+        row = self._connection().execute(
+            "SELECT model FROM selections WHERE serial = ?"
+            " ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (serial_code,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def selections_between(
+        self, start: str, end: str, serial_code: str | None = None
+    ) -> list[dict[str, str]]:
+        """Return selections with ``start <= timestamp <= end``, oldest first."""
+        self.flush()
+        query = "SELECT serial, model, timestamp FROM selections WHERE"
+        params: list[Any] = []
+        if serial_code is not None:
+            query += " serial = ? AND"
+            params.append(serial_code)
+        query += " timestamp BETWEEN ? AND ? ORDER BY timestamp, id"
+        params += [start, end]
+        rows = self._connection().execute(query, params).fetchall()
+        return [dict(zip(("serial", "model", "timestamp"), row)) for row in rows]
+
+    def model_counts(
+        self, start: str | None = None, end: str | None = None
+    ) -> dict[str, int]:
+        """Return how often each model was selected, optionally within a time range."""
+        self.flush()
+        query = "SELECT model, COUNT(*) FROM selections"
+        params: list[Any] = []
+        if start is not None or end is not None:
+            query += " WHERE timestamp BETWEEN ? AND ?"
+            params += [start or "", end or "\uffff"]
+        query += " GROUP BY model"
+        return dict(self._connection().execute(query, params).fetchall())
+
+    def close(self) -> None:
+        """Flush buffered selections and close every thread's connection."""
+        self.flush()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
 
-__all__ = ["ModelSelector"]
+__all__ = ["MIGRATIONS", "ModelSelector", "migrate"]
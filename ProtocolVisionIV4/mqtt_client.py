@@ -0,0 +1,215 @@
+"""Long-lived MQTT publisher with an in-flight window and offline queue."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from .utils import optional_import
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+
+class MqttPublisher:
+    """Publish to one broker over a single persistent connection.
+
+    The paho network loop runs on its own thread and reconnects on its own
+    with a delay of up to ``reconnect_max`` seconds. :meth:`publish` never
+    blocks: while connected and fewer than ``max_inflight`` messages await
+    their acknowledgement the message is handed to paho straight away,
+    otherwise it waits in an offline queue of at most ``max_queue`` messages
+    (the oldest is dropped when it overflows). The queue drains as
+    acknowledgements arrive and after every reconnect.
+    """
+
+    def __init__(
+        self,
+        broker: str,
+        port: int = 1883,
+        *,
+        qos: int = 1,
+        max_inflight: int = 20,
+        max_queue: int = 1000,
+        keepalive: int = 60,
+        reconnect_max: float = 30.0,
+        client_id: str = "",
+    ) -> None:
+        mqtt = optional_import("paho.mqtt.client")
+        if mqtt is None:
+            raise ImportError("paho-mqtt is required for MQTT publishing")
+        if qos not in (0, 1, 2):
+            raise ValueError(f"Unsupported MQTT QoS: {qos}")
+        self.broker = broker
+        self.port = port
+        self.qos = qos
+        self._mqtt = mqtt
+        self.max_inflight = max(1, max_inflight)
+        self._queue: deque[tuple[str, str, float]] = deque()
+        self._max_queue = max(1, max_queue)
+        self._inflight: dict[int, float] = {}
+        self._acked: set[int] = set()
+        self._reserved = 0
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.connected = False
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self.connects = 0
+
+        try:
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        except AttributeError:  # paho-mqtt < 2.0
+            self.client = mqtt.Client(client_id=client_id)
+        self.client.max_inflight_messages_set(self.max_inflight)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=int(max(1, reconnect_max)))
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.connect_async(broker, port, keepalive)
+        self.client.loop_start()
+
+    def publish(self, topic: str, payload: str) -> None:
+        """Queue ``payload`` for ``topic``; the call does not wait for the broker."""
+        with self._lock:
+            self._queue.append((topic, payload, time.perf_counter()))
+            if len(self._queue) > self._max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+                LOGGER.error("MQTT offline queue full, dropped oldest message")
+        self._drain()
+
+    def _drain(self) -> None:
+        """Hand queued messages to paho while connected and the window allows."""
+        while True:
+            with self._lock:
+                if (
+                    not self.connected
+                    or not self._queue
+                    or len(self._inflight) + self._reserved >= self.max_inflight
+                ):
+                    return
+                topic, payload, queued_at = self._queue.popleft()
+                self._reserved += 1
+            # paho may invoke on_publish from its own thread before publish()
+            # returns, so the lock is not held across the call.
+            try:
+                info = self.client.publish(topic, payload, qos=self.qos)
+                ok = info.rc == self._mqtt.MQTT_ERR_SUCCESS
+            except Exception as exc:  # pragma: no cover - network issues
+                LOGGER.error("MQTT publish failed: %s", exc)
+                ok = False
+            with self._lock:
+                self._reserved -= 1
+                if not ok:
+                    # Not accepted (e.g. the connection just dropped): retry later.
+                    self._queue.appendleft((topic, payload, queued_at))
+                    return
+                if info.mid in self._acked:
+                    self._acked.discard(info.mid)
+                    self._record(queued_at)
+                else:
+                    self._inflight[info.mid] = queued_at
+
+    def _record(self, queued_at: float) -> None:
+        self.published += 1
+        self._latencies.append(time.perf_counter() - queued_at)
+        self._idle.notify_all()
+
+    def _on_connect(self, client: Any, userdata: Any, flags: Any, rc: Any, *args: Any) -> None:
+        if getattr(rc, "is_failure", rc != 0) is True:
+            LOGGER.error("MQTT connection to %s refused: %s", self.broker, rc)
+            return
+        with self._lock:
+            self.connected = True
+            self.connects += 1
+        LOGGER.info("MQTT connected to %s:%s", self.broker, self.port)
+        self._drain()
+
+    def _on_disconnect(self, client: Any, userdata: Any, *args: Any) -> None:
+        with self._lock:
+            self.connected = False
+        LOGGER.warning("MQTT disconnected from %s", self.broker)
+
+    def _on_publish(self, client: Any, userdata: Any, mid: int, *args: Any) -> None:
+        with self._lock:
+            queued_at = self._inflight.pop(mid, None)
+            if queued_at is None:
+                self._acked.add(mid)
+            else:
+                self._record(queued_at)
+        self._drain()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every message has been acknowledged; ``False`` on timeout."""
+        with self._lock:
+            return self._idle.wait_for(
+                lambda: not self._queue and not self._inflight and not self._reserved,
+                timeout,
+            )
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Flush for up to ``timeout`` seconds, then disconnect."""
+        if not self.flush(timeout):
+            with self._lock:
+                self.failed += len(self._queue) + len(self._inflight)
+            LOGGER.warning("Closing MQTT publisher with %s unsent", self.stats())
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def stats(self) -> dict[str, Any]:
+        """Return connection state, queue counters and publish latency in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats: dict[str, Any] = {
+                "connected": self.connected,
+                "connects": self.connects,
+                "queued": len(self._queue),
+                "inflight": len(self._inflight),
+                "published": self.published,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+        if latencies:
+            stats["latency_mean"] = round(sum(latencies) / len(latencies), 4)
+            stats["latency_p95"] = round(latencies[int(0.95 * (len(latencies) - 1))], 4)
+            stats["latency_max"] = round(latencies[-1], 4)
+        return stats
+
+
+_PUBLISHERS: dict[tuple[str, int], MqttPublisher] = {}
+_PUBLISHERS_LOCK = threading.Lock()
+
+
+def get_publisher(broker: str, port: int = 1883, **options: Any) -> MqttPublisher:
+    """Return the shared publisher for ``broker:port``, creating it on first use.
+
+    ``options`` are passed to :class:`MqttPublisher` and only take effect
+    when the publisher is created.
+    """
+    key = (broker, port)
+    with _PUBLISHERS_LOCK:
+        publisher = _PUBLISHERS.get(key)
+        if publisher is None:
+            if not _PUBLISHERS:
+                atexit.register(close_publishers)
+            publisher = MqttPublisher(broker, port, **options)
+            _PUBLISHERS[key] = publisher
+        return publisher
+
+
+def close_publishers(timeout: float | None = 5.0) -> None:
+    """Flush and disconnect every shared publisher."""
+    with _PUBLISHERS_LOCK:
+        publishers = list(_PUBLISHERS.values())
+        _PUBLISHERS.clear()
+    for publisher in publishers:
+        publisher.close(timeout)
+
+
+__all__ = ["MqttPublisher", "close_publishers", "get_publisher"]
@@ -0,0 +1,185 @@
+"""CPU object detection with ONNX Runtime and NumPy pre/post-processing."""
+
+from __future__ import annotations
+
+import logging
+import time
+from pathlib import Path
+from typing import Any, Sequence
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+try:
+    import onnxruntime as ort  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    ort = None
+
+try:
+    import cv2  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    cv2 = None
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+DEFAULT_INPUT_SIZE = 640
+PAD_VALUE = 114
+
+
+def nms(boxes: Any, scores: Any, iou_threshold: float) -> Any:
+    """Return indices of ``boxes`` (``x1, y1, x2, y2``) kept by greedy NMS."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def _resize(frame: Any, width: int, height: int) -> Any:
+    if cv2 is not None:
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+    ys = (np.arange(height) * (frame.shape[0] / height)).astype(np.intp)
+    xs = (np.arange(width) * (frame.shape[1] / width)).astype(np.intp)
+    return frame[ys[:, None], xs]
+
+
+class OnnxDetector:
+    """YOLO-style detector running on the ONNX Runtime CPU provider.
+
+    One :class:`onnxruntime.InferenceSession` is created per model and reused
+    for every call. Frames are letterboxed to the model input size in NumPy,
+    and outputs in either the YOLOv5 (``N x boxes x 5+classes``) or YOLOv8
+    (``N x 4+classes x boxes``) layout are decoded and filtered with NumPy NMS.
+    """
+
+    def __init__(
+        self,
+        model_path: str | Path,
+        *,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        conf_threshold: float = 0.25,
+        iou_threshold: float = 0.45,
+        warmup: bool = True,
+    ) -> None:
+        if ort is None or np is None:
+            raise ImportError("onnxruntime and numpy are required for the ONNX backend")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.model_path = str(model_path)
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = list(model_input.shape)
+        self.dynamic_batch = not isinstance(shape[0], int)
+        self.input_height = shape[2] if isinstance(shape[2], int) else DEFAULT_INPUT_SIZE
+        self.input_width = shape[3] if isinstance(shape[3], int) else DEFAULT_INPUT_SIZE
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        if warmup:
+            self.warmup()
+
+    def warmup(self, runs: int = 1) -> float:
+        """Run dummy inferences so the first real part is not slow.
+
+        Returns the duration of the last warmup run in seconds.
+        """
+        dummy = np.zeros((self.input_height, self.input_width, 3), dtype=np.uint8)
+        elapsed = 0.0
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            self.predict([dummy])
+            elapsed = time.perf_counter() - start
+        LOGGER.info("ONNX model %s warmed up in %.3fs", self.model_path, elapsed)
+        return elapsed
+
+    def preprocess(self, frames: Sequence[Any]) -> tuple[Any, list[tuple[float, int, int]]]:
+        """Letterbox ``frames`` into an ``N x 3 x H x W`` float32 blob.
+
+        Frames are BGR ``uint8`` (or single-channel) images, or float images
+        already scaled to ``0..1``. Returns the blob and, per frame, the scale
+        and padding needed to map boxes back to frame coordinates.
+        """
+        blob = np.full(
+            (len(frames), 3, self.input_height, self.input_width),
+            PAD_VALUE / 255.0,
+            dtype=np.float32,
+        )
+        transforms = []
+        for i, frame in enumerate(frames):
+            if frame.ndim == 2:
+                frame = frame[:, :, None].repeat(3, axis=2)
+            height, width = frame.shape[:2]
+            scale = min(self.input_height / height, self.input_width / width)
+            new_w, new_h = max(1, round(width * scale)), max(1, round(height * scale))
+            pad_x = (self.input_width - new_w) // 2
+            pad_y = (self.input_height - new_h) // 2
+            resized = _resize(frame, new_w, new_h)
+            # BGR -> RGB and HWC -> CHW in one strided copy.
+            target = blob[i, :, pad_y : pad_y + new_h, pad_x : pad_x + new_w]
+            target[...] = resized[:, :, ::-1].transpose(2, 0, 1)
+            if frame.dtype == np.uint8:
+                target *= 1.0 / 255.0
+            transforms.append((scale, pad_x, pad_y))
+        return blob, transforms
+
+    def _decode(self, output: Any, transform: tuple[float, int, int]) -> Any:
+        if output.shape[0] < output.shape[1]:  # YOLOv8: (4 + classes) x boxes
+            output = output.T
+            boxes, class_scores = output[:, :4], output[:, 4:]
+        else:  # YOLOv5: boxes x (5 + classes)
+            boxes = output[:, :4]
+            class_scores = output[:, 5:] * output[:, 4:5]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        mask = scores >= self.conf_threshold
+        if not mask.any():
+            return np.zeros((0, 6), dtype=np.float32)
+        boxes, scores, class_ids = boxes[mask], scores[mask], class_ids[mask]
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+        # Offset boxes per class so a single NMS pass never merges classes.
+        offset = class_ids[:, None] * float(max(self.input_width, self.input_height))
+        keep = nms(xyxy + offset, scores, self.iou_threshold)
+        scale, pad_x, pad_y = transform
+        xyxy = xyxy[keep]
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad_x) / scale
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad_y) / scale
+        return np.column_stack(
+            [xyxy, scores[keep], class_ids[keep].astype(np.float32)]
+        ).astype(np.float32)
+
+    def predict(self, frames: Sequence[Any]) -> list[Any]:
+        """Return one ``(n, 6)`` array of ``x1, y1, x2, y2, score, class`` per frame."""
+        if not frames:
+            return []
+        blob, transforms = self.preprocess(frames)
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate(
+                [
+                    self.session.run(None, {self.input_name: blob[i : i + 1]})[0]
+                    for i in range(len(frames))
+                ]
+            )
+        return [self._decode(out, t) for out, t in zip(outputs, transforms)]
+
+
+__all__ = ["OnnxDetector", "nms"]
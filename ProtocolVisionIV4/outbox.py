@@ -0,0 +1,259 @@
+"""Durable SQLite outbox that ships result payloads to integration sinks."""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+Sink = Callable[[list[Dict[str, Any]]], None]
+
+
+def webhook_sink(dispatcher: Any) -> Sink:
+    """Deliver through a :class:`~ProtocolVisionIV4.dispatcher.WebhookDispatcher`."""
+    return dispatcher.send
+
+
+def mqtt_sink(publisher: Any, topic: str, timeout: float = 10.0) -> Sink:
+    """Deliver through an :class:`~ProtocolVisionIV4.mqtt_client.MqttPublisher`.
+
+    A batch counts as delivered once the broker has acknowledged every
+    message. While the broker is down nothing is handed to the publisher, so
+    its offline queue does not fill with copies of retried batches. When a
+    batch times out, its messages stay with the publisher; the retry only
+    hands over messages that are not already pending there, unless the
+    publisher has dropped messages in the meantime.
+    """
+    pending: Counter[str] = Counter()
+    dropped = [publisher.dropped]
+
+    def send(batch: list[Dict[str, Any]]) -> None:
+        if not publisher.connected:
+            raise ConnectionError(f"MQTT broker {publisher.broker} is not connected")
+        if publisher.dropped != dropped[0]:
+            # A pending copy may be among the dropped ones; hand everything over again.
+            pending.clear()
+            dropped[0] = publisher.dropped
+        waiting = pending.copy()
+        for payload in batch:
+            message = json.dumps(payload)
+            if waiting[message]:
+                waiting[message] -= 1
+                continue
+            publisher.publish(topic, message)
+            pending[message] += 1
+        if not publisher.flush(timeout):
+            raise TimeoutError(f"MQTT broker {publisher.broker} did not acknowledge")
+        pending.clear()
+
+    return send
+
+
+class Outbox:
+    """Write every result to disk first, then deliver it to each sink in order.
+
+    Payloads are appended to a SQLite database in WAL mode, so an accepted
+    result survives a crash or a network outage. Each entry of ``sinks`` maps
+    a sink name to a callable that delivers a list of payloads and raises on
+    failure. Every sink has its own shipper thread and acknowledgement cursor
+    (the id of the last delivered payload). The thread sends up to
+    ``batch_size`` payloads past the cursor, advances the cursor only after
+    the call succeeds, and retries the same batch with exponential backoff
+    up to ``backoff_max`` seconds until it does. Delivery is therefore
+    in order and at least once. :meth:`replay` moves a cursor back to resend
+    history. Payloads acknowledged by every sink are purged, keeping the
+    newest ``keep`` of them available for replay.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        sinks: dict[str, Sink],
+        *,
+        batch_size: int = 50,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        keep: int = 10000,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.sinks = dict(sinks)
+        self.batch_size = max(1, batch_size)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.keep = max(0, keep)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = {name: threading.Event() for name in self.sinks}
+        self.delivered = {name: 0 for name in self.sinks}
+        self.errors = {name: 0 for name in self.sinks}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs the WAL on every commit; NORMAL may lose the last
+        # accepted results on power loss.
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " created_at TEXT NOT NULL,"
+                " payload TEXT NOT NULL"
+                ")"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cursors ("
+                "sink TEXT PRIMARY KEY,"
+                " position INTEGER NOT NULL"
+                ")"
+            )
+            # New sinks start after whatever is already stored.
+            for name in self.sinks:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO cursors (sink, position)"
+                    " SELECT ?, COALESCE(MAX(id), 0) FROM outbox",
+                    (name,),
+                )
+        self._threads = [
+            threading.Thread(
+                target=self._ship, args=(name,), name=f"outbox-{name}", daemon=True
+            )
+            for name in self.sinks
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        """Store ``payload`` durably and wake the shippers; return its id."""
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (created_at, payload) VALUES (?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), data),
+            )
+        for event in self._wake.values():
+            event.set()
+        return cursor.lastrowid
+
+    def read(self, after: int, limit: int) -> list[tuple[int, Dict[str, Any]]]:
+        """Return up to ``limit`` ``(id, payload)`` pairs stored after id ``after``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM outbox WHERE id > ? ORDER BY id LIMIT ?",
+                (after, limit),
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def cursor(self, sink: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT position FROM cursors WHERE sink = ?", (sink,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _set_cursor(self, sink: str, position: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (sink, position) VALUES (?, ?)",
+                (sink, position),
+            )
+
+    def replay(self, sink: str, from_id: int = 0) -> None:
+        """Redeliver ``sink`` starting at payload id ``from_id``."""
+        if sink not in self.sinks:
+            raise KeyError(f"Unknown outbox sink '{sink}'")
+        self._set_cursor(sink, max(0, from_id - 1))
+        self._wake[sink].set()
+        LOGGER.info("Replaying outbox sink %s from id %d", sink, from_id)
+
+    def _purge(self) -> None:
+        with self._lock, self._conn:
+            marks = ",".join("?" * len(self.sinks))
+            row = self._conn.execute(
+                f"SELECT MIN(position) FROM cursors WHERE sink IN ({marks})",
+                list(self.sinks),
+            ).fetchone()
+            acked = (row[0] or 0) - self.keep
+            if acked > 0:
+                self._conn.execute("DELETE FROM outbox WHERE id <= ?", (acked,))
+
+    def _ship(self, sink: str) -> None:
+        send = self.sinks[sink]
+        wake = self._wake[sink]
+        delay = self.backoff_initial
+        while not self._stop.is_set():
+            wake.clear()
+            position = self.cursor(sink)
+            entries = self.read(position, self.batch_size)
+            if not entries:
+                wake.wait(1.0)
+                continue
+            try:
+                send([payload for _, payload in entries])
+            except Exception as exc:
+                self.errors[sink] += 1
+                LOGGER.error(
+                    "Outbox delivery to %s failed, retrying in %.1fs: %s", sink, delay, exc
+                )
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.backoff_max)
+                continue
+            delay = self.backoff_initial
+            last = entries[-1][0]
+            # A replay() during the send moved the cursor; keep its position.
+            if self.cursor(sink) == position:
+                self._set_cursor(sink, last)
+            self.delivered[sink] += len(entries)
+            self._purge()
+
+    def pending(self) -> dict[str, int]:
+        """Return how many stored payloads each sink has not acknowledged yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.sink, COUNT(o.id) FROM cursors c"
+                " LEFT JOIN outbox o ON o.id > c.position GROUP BY c.sink"
+            ).fetchall()
+        return {sink: count for sink, count in rows if sink in self.sinks}
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every sink has caught up; ``False`` on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(self.pending().values()):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": self.pending(),
+            "delivered": dict(self.delivered),
+            "errors": dict(self.errors),
+            "cursors": {name: self.cursor(name) for name in self.sinks},
+        }
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """Give the shippers up to ``timeout`` seconds to catch up, then stop.
+
+        Anything not delivered stays in the database and is sent on the next
+        start.
+        """
+        if not self.flush(timeout):
+            LOGGER.warning("Closing outbox with undelivered payloads: %s", self.pending())
+        self._stop.set()
+        for event in self._wake.values():
+            event.set()
+        for thread in self._threads:
+            thread.join()
+        with self._lock:
+            self._conn.close()
+
+
+__all__ = ["Outbox", "Sink", "mqtt_sink", "webhook_sink"]
@@ -0,0 +1,250 @@
+"""Staged processing pipeline with bounded queues between stages."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+STAGE_KINDS = {"thread", "process"}
+
+_STOP = object()
+
+
+class Stage:
+    """One pipeline step: ``func(item)`` run by ``workers`` concurrent workers.
+
+    The return value is handed to the next stage; returning ``None`` ends
+    the item's trip early. Up to ``queue_size`` items (default: twice the
+    worker count) wait in front of the stage. With ``kind="process"`` each
+    call runs in a pool of ``workers`` processes, so ``func`` and the items
+    must be picklable; use it for CPU-bound steps that hold the GIL.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        *,
+        workers: int = 1,
+        queue_size: int | None = None,
+        kind: str = "thread",
+    ) -> None:
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unsupported stage kind '{kind}' for stage {name}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size or 2 * self.workers)
+        self.kind = kind
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.blocked_time = 0.0
+
+
+class Pipeline:
+    """Run items through ``stages`` in order, with every stage working in parallel.
+
+    Stages are connected by bounded queues. A worker that finishes an item
+    blocks until the next stage has room, so a slow stage pushes back all
+    the way to :meth:`submit` instead of letting queues grow without limit.
+    While part N is being inspected or saved, part N+1 can already be
+    captured. With more than one worker per stage, items may overtake each
+    other. An exception in a stage is logged and drops that item;
+    :meth:`submit_future` reports it, or the final result, to the caller.
+
+    :meth:`stats` reports per stage the items processed, the fraction of
+    time its workers were busy (the busiest stage is the bottleneck) and the
+    time spent blocked on a full downstream queue, plus the end-to-end
+    latency of completed items.
+    """
+
+    def __init__(self, stages: Iterable[Stage], name: str = "pipeline") -> None:
+        self.stages = list(stages)
+        if not self.stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.name = name
+        self._queues: list[queue.Queue[Any]] = [
+            queue.Queue(stage.queue_size) for stage in self.stages
+        ]
+        self._pools: list[ProcessPoolExecutor | None] = [
+            ProcessPoolExecutor(stage.workers) if stage.kind == "process" else None
+            for stage in self.stages
+        ]
+        self._alive = [stage.workers for stage in self.stages]
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._closed = False
+        self._started = time.monotonic()
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._threads = [
+            threading.Thread(
+                target=self._work,
+                args=(index,),
+                name=f"{name}-{stage.name}-{worker}",
+                daemon=True,
+            )
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item: Any, timeout: float | None = None) -> bool:
+        """Feed ``item`` to the first stage, waiting while its queue is full.
+
+        Returns ``False`` if there was still no room after ``timeout`` seconds.
+        """
+        return self._enter(item, None, timeout)
+
+    def submit_future(self, item: Any, timeout: float | None = None) -> Future:
+        """Like :meth:`submit`, but return a future for the item's trip.
+
+        The future resolves to the last stage's result (``None`` if a stage
+        ended the trip early) or raises the exception that dropped the item,
+        or :class:`TimeoutError` if it found no room within ``timeout``.
+        """
+        future: Future = Future()
+        self._enter(item, future, timeout)
+        return future
+
+    def _enter(self, item: Any, future: Future | None, timeout: float | None) -> bool:
+        if self._closed:
+            raise RuntimeError(f"Pipeline {self.name} is closed")
+        with self._lock:
+            self._in_flight += 1
+            self.submitted += 1
+        try:
+            self._queues[0].put((time.monotonic(), future, item), timeout=timeout)
+        except queue.Full:
+            self._finish(None, future, error=TimeoutError(f"Pipeline {self.name} is full"))
+            return False
+        return True
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every submitted item has left the pipeline."""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Finish the submitted items, then stop every worker."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self.join(timeout):
+            LOGGER.warning("Closing pipeline %s with %d items in flight", self.name, self._in_flight)
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        for pool in self._pools:
+            if pool is not None:
+                pool.shutdown()
+
+    def _finish(
+        self,
+        submitted_at: float | None,
+        future: Future | None,
+        result: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if error is not None:
+                self.failed += 1
+            elif submitted_at is not None:
+                latency = time.monotonic() - submitted_at
+                self.completed += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            if self._in_flight == 0:
+                self._idle.notify_all()
+        if future is not None:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _work(self, index: int) -> None:
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(self.stages) else None
+        pool = self._pools[index]
+        while True:
+            entry = inbox.get()
+            if entry is _STOP:
+                break
+            submitted_at, future, item = entry
+            start = time.perf_counter()
+            try:
+                if pool is not None:
+                    result = pool.submit(stage.func, item).result()
+                else:
+                    result = stage.func(item)
+            except Exception as exc:
+                stage.errors += 1
+                stage.busy_time += time.perf_counter() - start
+                LOGGER.exception("Pipeline stage %s failed: %s", stage.name, exc)
+                self._finish(submitted_at, future, error=exc)
+                continue
+            stage.busy_time += time.perf_counter() - start
+            stage.processed += 1
+            if result is None or outbox is None:
+                self._finish(submitted_at, future, result)
+                continue
+            start = time.perf_counter()
+            outbox.put((submitted_at, future, result))
+            stage.blocked_time += time.perf_counter() - start
+        # The last worker of a stage passes the shutdown on downstream.
+        with self._lock:
+            self._alive[index] -= 1
+            last = self._alive[index] == 0
+        if last and outbox is not None:
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_STOP)
+
+    def stats(self) -> dict[str, Any]:
+        """Return per-stage counters and utilisation plus end-to-end latency."""
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        stages = {}
+        for stage, inbox in zip(self.stages, self._queues):
+            stages[stage.name] = {
+                "kind": stage.kind,
+                "workers": stage.workers,
+                "queued": inbox.qsize(),
+                "processed": stage.processed,
+                "errors": stage.errors,
+                "busy": round(stage.busy_time / (elapsed * stage.workers), 3),
+                "service_mean": (
+                    round(stage.busy_time / stage.processed, 4) if stage.processed else 0.0
+                ),
+                "blocked": round(stage.blocked_time, 3),
+            }
+        with self._lock:
+            stats: dict[str, Any] = {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self._in_flight,
+                "latency_mean": (
+                    round(self._latency_total / self.completed, 4) if self.completed else 0.0
+                ),
+                "latency_max": round(self._latency_max, 4),
+            }
+        stats["bottleneck"] = max(stages, key=lambda name: stages[name]["busy"])
+        stats["stages"] = stages
+        return stats
+
+
+__all__ = ["Pipeline", "STAGE_KINDS", "Stage"]
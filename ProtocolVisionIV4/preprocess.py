@@ -0,0 +1,216 @@
+"""Per-camera frame preprocessing ahead of AI inspection."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Mapping, Sequence
+
+import numpy as np
+
+from .utils import optional_import
+
+# BGR weights of ITU-R BT.601 luma, as used by ``cv2.COLOR_BGR2GRAY``.
+_GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+class Preprocessor:
+    """Cut a camera frame down to what the model needs before inference.
+
+    Each of the ``rois`` (``[x, y, width, height]`` rectangles in frame
+    pixels, clipped to the frame; default: the whole frame) is cropped as a
+    view, resized to ``size`` (``[width, height]``), converted to one
+    channel with ``grayscale`` and scaled to ``float32`` in ``0..1`` with
+    ``normalize``. Every region becomes one model input. Resizing and colour
+    conversion use OpenCV when installed, with NumPy fallbacks otherwise.
+
+    Intermediate steps write into buffers that are allocated on first use
+    and reused for every later frame of the same shape, one set per thread.
+    The results of :meth:`apply` come from a pool of buffers as well and
+    must be handed back with :meth:`release` once the verdict is in. Pass
+    ``out`` to write the results somewhere else, such as shared-memory
+    inference slots. ``save_full_frame`` is for the caller: when it is
+    false, :meth:`crop_for_save` gives the bounding box of the regions to
+    store instead of the full frame.
+    """
+
+    def __init__(
+        self,
+        rois: Sequence[Sequence[int]] | None = None,
+        size: Sequence[int] | None = None,
+        *,
+        grayscale: bool = False,
+        normalize: bool = False,
+        save_full_frame: bool = True,
+    ) -> None:
+        self.rois = [tuple(int(v) for v in roi) for roi in rois or []]
+        self.size = (int(size[0]), int(size[1])) if size else None
+        self.grayscale = grayscale
+        self.normalize = normalize
+        self.save_full_frame = save_full_frame
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._free: dict[tuple[tuple[int, ...], str], list[Any]] = {}
+        self._lent: dict[int, Any] = {}
+        self.frames = 0
+        self.allocations = 0
+
+    @classmethod
+    def from_config(cls, options: Mapping[str, Any]) -> "Preprocessor":
+        """Build a preprocessor from the ``preprocess`` entry of a camera."""
+        return cls(
+            options.get("rois"),
+            options.get("size"),
+            grayscale=options.get("grayscale", False),
+            normalize=options.get("normalize", False),
+            save_full_frame=options.get("save_full_frame", True),
+        )
+
+    def regions(self, frame: Any) -> list[tuple[int, int, int, int]]:
+        """Return the regions of ``frame`` as ``(x0, y0, x1, y1)``, clipped."""
+        height, width = frame.shape[:2]
+        if not self.rois:
+            return [(0, 0, width, height)]
+        regions = []
+        for x, y, w, h in self.rois:
+            x0, y0 = min(max(x, 0), width), min(max(y, 0), height)
+            x1, y1 = min(x0 + w, width), min(y0 + h, height)
+            if x1 <= x0 or y1 <= y0:
+                raise ValueError(
+                    f"ROI {[x, y, w, h]} lies outside the {width}x{height} frame"
+                )
+            regions.append((x0, y0, x1, y1))
+        return regions
+
+    def output_shape(self, frame: Any, region: tuple[int, int, int, int]) -> tuple[int, ...]:
+        """Return the shape :meth:`apply` produces for ``region`` of ``frame``."""
+        x0, y0, x1, y1 = region
+        width, height = self.size or (x1 - x0, y1 - y0)
+        if frame.ndim == 2 or self.grayscale:
+            return (height, width)
+        return (height, width, frame.shape[2])
+
+    def output_dtype(self, frame: Any) -> np.dtype:
+        return np.dtype(np.float32) if self.normalize else frame.dtype
+
+    def apply(
+        self,
+        frame: Any,
+        out: Callable[[tuple[int, ...], np.dtype], Any] | None = None,
+    ) -> list[Any]:
+        """Return one preprocessed array per region of ``frame``.
+
+        With ``out``, each result is written into ``out(shape, dtype)``
+        instead of a pooled buffer.
+        """
+        dtype = self.output_dtype(frame)
+        results = []
+        for index, region in enumerate(self.regions(frame)):
+            shape = self.output_shape(frame, region)
+            target = out(shape, dtype) if out is not None else self._acquire(shape, dtype)
+            self.apply_region(frame, index, region, target)
+            results.append(target)
+        return results
+
+    def apply_region(
+        self, frame: Any, index: int, region: tuple[int, int, int, int], target: Any
+    ) -> None:
+        """Preprocess region ``index`` of :meth:`regions` into ``target``.
+
+        ``target`` must have the :meth:`output_shape` and :meth:`output_dtype`
+        of the region.
+        """
+        if index == 0:
+            self.frames += 1
+        self._run(frame, region, index, target)
+
+    def release(self, arrays: Sequence[Any]) -> None:
+        """Return arrays from :meth:`apply` to the buffer pool."""
+        with self._lock:
+            for array in arrays:
+                if self._lent.pop(id(array), None) is not None:
+                    self._free.setdefault((array.shape, array.dtype.str), []).append(array)
+
+    def crop_for_save(self, frame: Any) -> Any:
+        """Return what to store for ``frame``: itself, or the regions' bounding box."""
+        if self.save_full_frame or not self.rois:
+            return frame
+        regions = self.regions(frame)
+        x0 = min(r[0] for r in regions)
+        y0 = min(r[1] for r in regions)
+        x1 = max(r[2] for r in regions)
+        y1 = max(r[3] for r in regions)
+        return frame[y0:y1, x0:x1]
+
+    def _acquire(self, shape: tuple[int, ...], dtype: np.dtype) -> Any:
+        with self._lock:
+            free = self._free.get((shape, dtype.str))
+            if free:
+                array = free.pop()
+            else:
+                array = np.empty(shape, dtype=dtype)
+                self.allocations += 1
+            self._lent[id(array)] = array
+        return array
+
+    def _scratch(self, key: tuple[Any, ...], shape: tuple[int, ...], dtype: Any) -> Any:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        array = buffers.get(key)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = buffers[key] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return array
+
+    def _run(self, frame: Any, region: tuple[int, int, int, int], index: int, target: Any) -> None:
+        cv2 = optional_import("cv2")
+        x0, y0, x1, y1 = region
+        image = frame[y0:y1, x0:x1]
+        gray = self.grayscale and image.ndim == 3
+        steps = [self.size is not None, gray, self.normalize]
+        if not any(steps):
+            target[...] = image
+            return
+
+        def _dest(step: int, shape: tuple[int, ...], dtype: Any) -> Any:
+            # The last step writes the result, earlier ones use scratch buffers.
+            if not any(steps[step + 1 :]):
+                return target
+            return self._scratch((index, step), shape, dtype)
+
+        if self.size is not None:
+            width, height = self.size
+            dest = _dest(0, (height, width) + image.shape[2:], image.dtype)
+            if cv2 is not None:
+                # INTER_AREA averages the pixels of a downscale instead of skipping them.
+                cv2.resize(image, (width, height), dst=dest, interpolation=cv2.INTER_AREA)
+            else:
+                ys = (np.arange(height) * (image.shape[0] / height)).astype(np.intp)
+                xs = (np.arange(width) * (image.shape[1] / width)).astype(np.intp)
+                np.take(image.take(ys, axis=0), xs, axis=1, out=dest)
+            image = dest
+        if gray:
+            dest = _dest(1, image.shape[:2], image.dtype)
+            if cv2 is not None and image.dtype == np.uint8:
+                cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dest)
+            else:
+                np.einsum("ijk,k->ij", image, _GRAY_WEIGHTS, out=dest, casting="unsafe")
+            image = dest
+        if self.normalize:
+            scale = np.float32(1.0 / 255.0) if image.dtype == np.uint8 else np.float32(1.0)
+            np.multiply(image, scale, out=target, casting="unsafe")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            pooled = sum(len(free) for free in self._free.values())
+            lent = len(self._lent)
+        return {
+            "frames": self.frames,
+            "regions": max(1, len(self.rois)),
+            "allocations": self.allocations,
+            "pooled": pooled,
+            "lent": lent,
+        }
+
+
+__all__ = ["Preprocessor"]
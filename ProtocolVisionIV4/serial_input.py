@@ -2,8 +2,20 @@
 
 from __future__ import annotations
 
-import serial
-from serial import SerialException
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+from .utils import optional_import
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+_TERMINATORS = b"\r\n"
 
 
 class SerialInput:
@@ -13,9 +25,10 @@ class SerialInput:
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        serial = optional_import("serial")
         try:
-            self.ser = serial.Serial(port, baudrate, timeout=timeout)
-        except SerialException:
+            self.ser = serial.Serial(port, baudrate, timeout=timeout) if serial else None
+        except OSError:  # serial.SerialException
             self.ser = None
 
     def read_code(self) -> str:
@@ -25,7 +38,7 @@ class SerialInput:
                 line = self.ser.readline().decode("utf-8").strip()
                 if line:
                     return line
-            except SerialException:
+            except OSError:
                 pass
         # manual fallback
         return input("Enter code manually: ").strip()
@@ -36,4 +49,277 @@ class SerialInput:
             self.ser.close()
 
 
-__all__ = ["SerialInput"]
+class ScannerReader:
+    """Read codes from a barcode scanner on a background thread.
+
+    The thread reads whatever bytes the port has and collects them until a
+    CR or LF, so a code split across several reads is delivered once and
+    whole. A fragment that stays unterminated for ``line_timeout`` seconds
+    (a scan cut off by a cable glitch or a restart) is discarded instead of
+    being glued to the next code. A code equal to the previous one within
+    ``debounce`` seconds is counted as a duplicate and ignored. The window
+    restarts with every repeat, so a label held under a scanner in
+    continuous mode triggers only once.
+
+    Each code is put on a queue of at most ``max_queue`` entries (the oldest
+    is dropped when full; ``0`` disables the queue) for :meth:`get`, and
+    passed to every
+    :meth:`subscribe`\\ d callback on the reader thread, so a scan can start
+    an inspection cycle without polling. Callbacks must return quickly; a
+    Tk or asyncio consumer should hand the code over with ``root.after`` or
+    ``loop.call_soon_threadsafe``. If the port cannot be opened or fails,
+    it is reopened every ``reconnect_delay`` seconds.
+    """
+
+    def __init__(
+        self,
+        port: str,
+        baudrate: int = 9600,
+        *,
+        debounce: float = 1.0,
+        line_timeout: float = 0.5,
+        max_queue: int = 100,
+        reconnect_delay: float = 2.0,
+    ) -> None:
+        self.port = port
+        self.baudrate = baudrate
+        self.debounce = max(0.0, debounce)
+        self.line_timeout = line_timeout
+        self.reconnect_delay = reconnect_delay
+        self._queue: queue.Queue[str] | None = (
+            queue.Queue(max_queue) if max_queue > 0 else None
+        )
+        self._subscribers: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._ser: Any | None = None
+        self._buffer = bytearray()
+        self._last_byte = 0.0
+        self._last_code: str | None = None
+        self._last_seen = 0.0
+        self.connected = False
+        self.connects = 0
+        self.scans = 0
+        self.duplicates = 0
+        self.discarded = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "ScannerReader":
+        if optional_import("serial") is None:
+            raise ImportError("pyserial is required to read the scanner")
+        if not self.alive:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"scanner-{self.port}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close_port()
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        """Call ``callback(code)`` on the reader thread for every new scan."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def get(self, timeout: float | None = None) -> str | None:
+        """Return the next scanned code, or ``None`` after ``timeout`` seconds."""
+        if self._queue is None:
+            raise RuntimeError("ScannerReader was created without a queue")
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def feed(self, data: bytes, now: float | None = None) -> list[str]:
+        """Process raw bytes from the port; return the new codes they complete.
+
+        Called by the reader thread; exposed so other transports (or tests)
+        can drive the same line assembly and debouncing.
+        """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        if not data:
+            return []
+        self._buffer += data
+        self._last_byte = now
+        codes = []
+        while True:
+            end = next(
+                (i for i, byte in enumerate(self._buffer) if byte in _TERMINATORS), -1
+            )
+            if end < 0:
+                break
+            line = bytes(self._buffer[:end])
+            del self._buffer[: end + 1]
+            code = line.decode("utf-8", errors="replace").strip()
+            if code and self._accept(code, now):
+                codes.append(code)
+        for code in codes:
+            self._emit(code)
+        return codes
+
+    def _expire(self, now: float) -> None:
+        if self._buffer and now - self._last_byte > self.line_timeout:
+            LOGGER.warning(
+                "Scanner %s: discarded unterminated fragment %r", self.port, bytes(self._buffer)
+            )
+            self._buffer.clear()
+            self.discarded += 1
+
+    def _accept(self, code: str, now: float) -> bool:
+        duplicate = code == self._last_code and now - self._last_seen < self.debounce
+        self._last_code = code
+        self._last_seen = now
+        if duplicate:
+            self.duplicates += 1
+            return False
+        self.scans += 1
+        return True
+
+    def _emit(self, code: str) -> None:
+        LOGGER.info("Scanner %s read %s", self.port, code)
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(code)
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:  # pragma: no cover - consumer raced us
+                    pass
+                self._queue.put_nowait(code)
+                self.dropped += 1
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(code)
+            except Exception as exc:  # pragma: no cover - subscriber bugs
+                LOGGER.error("Scanner subscriber %r failed: %s", callback, exc)
+
+    def _open_port(self) -> bool:
+        serial = optional_import("serial")
+        try:
+            self._ser = serial.Serial(
+                self.port, self.baudrate, timeout=min(0.1, self.line_timeout)
+            )
+        except OSError as exc:  # serial.SerialException
+            if self.connected or not self.errors:
+                LOGGER.warning("Scanner %s unavailable: %s", self.port, exc)
+            self.connected = False
+            self.errors += 1
+            return False
+        self.connected = True
+        self.connects += 1
+        LOGGER.info("Scanner connected on %s", self.port)
+        return True
+
+    def _close_port(self) -> None:
+        ser, self._ser = self._ser, None
+        self.connected = False
+        if ser is not None:
+            try:
+                ser.close()
+            except OSError:  # pragma: no cover - port already gone
+                pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._ser is None and not self._open_port():
+                self._stop.wait(self.reconnect_delay)
+                continue
+            try:
+                data = self._ser.read(self._ser.in_waiting or 1)
+            except OSError as exc:
+                LOGGER.warning("Scanner %s read failed: %s", self.port, exc)
+                self.errors += 1
+                self._close_port()
+                continue
+            self.feed(data)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "port": self.port,
+            "connected": self.connected,
+            "connects": self.connects,
+            "scans": self.scans,
+            "duplicates": self.duplicates,
+            "discarded": self.discarded,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+class FakeScanner:
+    """Pseudo-terminal standing in for a scanner (POSIX only).
+
+    Open a :class:`ScannerReader` on :attr:`port` and call :meth:`scan` to
+    type a code into it, optionally in several chunks to mimic a slow
+    serial line.
+    """
+
+    def __init__(self, terminator: bytes = b"\r\n") -> None:
+        import pty
+
+        self.terminator = terminator
+        self._master, self._slave = pty.openpty()
+        self.port = os.ttyname(self._slave)
+
+    def scan(self, code: str, chunks: int = 1, gap: float = 0.0) -> None:
+        data = code.encode("utf-8") + self.terminator
+        size = max(1, -(-len(data) // max(1, chunks)))
+        for i in range(0, len(data), size):
+            if i and gap:
+                time.sleep(gap)
+            os.write(self._master, data[i : i + size])
+
+    def close(self) -> None:
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def main() -> None:
+    """Run a fake scanner that sends every line typed on stdin."""
+    parser = argparse.ArgumentParser(description="Fake barcode scanner on a pty")
+    parser.add_argument("--chunks", type=int, default=1, help="Split each code into N writes")
+    parser.add_argument("--gap", type=float, default=0.0, help="Seconds between chunks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    scanner = FakeScanner()
+    LOGGER.info("Fake scanner on %s; type codes, Ctrl-D to quit", scanner.port)
+    try:
+        for line in sys.stdin:
+            if line.strip():
+                scanner.scan(line.strip(), args.chunks, args.gap)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scanner.close()
+
+
+__all__ = ["FakeScanner", "ScannerReader", "SerialInput"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""AI inference in worker processes fed through shared-memory frame slots."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import multiprocessing
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import connection, shared_memory
+from typing import Any, Callable
+
+from .utils import optional_import
+
+LOGGER = logging.getLogger("ProtocolVision")
+
+MAX_DIMS = 4
+
+# job id, ndim, shape[4], dtype, camera, serial, model
+HEADER = struct.Struct(f"<QB{MAX_DIMS}I16s32s64s64s")
+
+_STOP = None
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised for frames whose inference worker died while holding them."""
+
+
+def _text(value: bytes) -> str:
+    return value.rstrip(b"\0").decode("utf-8", errors="replace")
+
+
+def write_header(
+    buf: Any, job: int, shape: tuple[int, ...], dtype: str, camera: str, serial: str, model: str
+) -> None:
+    """Pack a slot header into the start of ``buf``.
+
+    Raises ``ValueError`` rather than cutting a label that does not fit its
+    field, since a shortened model name would select the wrong model.
+    """
+    if len(shape) > MAX_DIMS:
+        raise ValueError(f"Frames may have at most {MAX_DIMS} dimensions, got {len(shape)}")
+    dims = tuple(shape) + (0,) * (MAX_DIMS - len(shape))
+    labels = []
+    for field, value, size in (
+        ("dtype", dtype, 16),
+        ("camera", camera, 32),
+        ("serial", serial, 64),
+        ("model", model, 64),
+    ):
+        encoded = value.encode("utf-8")
+        if len(encoded) > size:
+            raise ValueError(
+                f"Slot header {field} may be at most {size} bytes, got {len(encoded)}: {value!r}"
+            )
+        labels.append(encoded)
+    HEADER.pack_into(buf, 0, job, len(shape), *dims, *labels)
+
+
+def read_header(buf: Any) -> dict[str, Any]:
+    """Unpack the slot header at the start of ``buf``."""
+    job, ndim, *rest = HEADER.unpack_from(buf, 0)
+    dims, (dtype, camera, serial, model) = rest[:MAX_DIMS], rest[MAX_DIMS:]
+    return {
+        "job": job,
+        "shape": tuple(dims[:ndim]),
+        "dtype": _text(dtype),
+        "camera": _text(camera),
+        "serial": _text(serial),
+        "model": _text(model),
+    }
+
+
+def _worker(
+    index: int,
+    slot_names: list[str],
+    tasks: Any,
+    results: connection.Connection,
+    loader: Callable[[str], Any],
+    model_paths: dict[str, str],
+    default_path: str | None,
+    max_models: int,
+) -> None:
+    """Worker process: inspect the frames named by ``tasks`` in place."""
+    import numpy as np
+
+    from .model_cache import ModelCache
+
+    # Children share the parent's resource tracker, so attaching does not
+    # hand ownership of the blocks to this process.
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    cache = ModelCache(
+        loader, model_paths=model_paths, default_path=default_path, max_models=max_models
+    )
+    try:
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            job, slot = task
+            if job == 0:
+                # Preload request: ``slot`` carries model names instead.
+                for name in slot:
+                    try:
+                        cache.get(name)
+                    except Exception as exc:
+                        LOGGER.error("Inference worker %d could not load %s: %s", index, name, exc)
+                continue
+            buf = slots[slot].buf
+            try:
+                header = read_header(buf)
+                frame = np.ndarray(
+                    header["shape"], dtype=header["dtype"], buffer=buf, offset=HEADER.size
+                )
+                verdict = cache.get(header["model"]).process_image(frame)
+                del frame
+                results.send((job, verdict, None))
+            except Exception as exc:
+                results.send((job, None, f"{type(exc).__name__}: {exc}"))
+    finally:
+        cache.close()
+        results.close()
+        for shm in slots:
+            shm.close()
+
+
+class ShmInferencePool:
+    """Run :class:`~ProtocolVisionIV4.ai_processor.AIProcessor` in worker processes.
+
+    Frames travel through ``slots`` preallocated shared-memory blocks of
+    ``slot_bytes`` each. A slot starts with a small header (job id, shape,
+    dtype, camera, serial and model name) followed by the pixel data, so the
+    only thing pickled per frame is a ``(job, slot)`` pair. :meth:`submit`
+    copies the frame into a free slot once and waits while all slots are
+    busy. :meth:`reserve` hands out the slot's array so a producer can write
+    the frame there directly. Each worker keeps its own
+    :class:`~ProtocolVisionIV4.model_cache.ModelCache` built with the
+    picklable ``loader(model_path)``, so frames of different models can be in
+    flight at once.
+
+    Jobs go to the worker with the fewest outstanding frames. Every worker
+    has its own task queue and result pipe, so a worker dying halfway
+    through a write cannot block the others. The collector thread reads all
+    pipes; when one reaches end-of-file the worker is gone, and it is
+    restarted with fresh channels. The frames it held fail with
+    :class:`WorkerCrashed` rather than being retried, because the frame
+    itself may be what crashed it.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        *,
+        model_paths: dict[str, str] | None = None,
+        default_path: str | None = None,
+        workers: int = 2,
+        slots: int | None = None,
+        slot_bytes: int = 8 * 1024 * 1024,
+        max_models: int = 2,
+        start_method: str = "spawn",
+    ) -> None:
+        if optional_import("numpy") is None:
+            raise ImportError("numpy is required for worker-process inference")
+        self.workers = max(1, workers)
+        self.slot_bytes = slot_bytes
+        self._ctx = multiprocessing.get_context(start_method)
+        self._worker_args = (loader, dict(model_paths or {}), default_path, max_models)
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=HEADER.size + slot_bytes)
+            for _ in range(max(1, slots or 2 * self.workers))
+        ]
+        self._free: queue.Queue[int] = queue.Queue()
+        for index in range(len(self._slots)):
+            self._free.put(index)
+        self._lock = threading.Lock()
+        self._jobs: dict[int, tuple[int, int, Future, float]] = {}
+        self._assigned: list[set[int]] = [set() for _ in range(self.workers)]
+        self._ids = itertools.count(1)
+        self._tasks: list[Any] = [None] * self.workers
+        self._results: list[connection.Connection | None] = [None] * self.workers
+        self._procs: list[Any] = [None] * self.workers
+        self._started_at = [0.0] * self.workers
+        self._closed = False
+        self._stop = threading.Event()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self._latency_total = 0.0
+        for index in range(self.workers):
+            self._start_worker(index)
+        self._collector = threading.Thread(
+            target=self._collect, name="shm-inference-results", daemon=True
+        )
+        self._collector.start()
+
+    def _new_tasks(self) -> Any:
+        tasks = self._ctx.Queue()
+        # Never block interpreter exit on tasks a dead worker will not read.
+        tasks.cancel_join_thread()
+        return tasks
+
+    def _start_worker(self, index: int) -> None:
+        with self._lock:
+            tasks = self._tasks[index] or self._new_tasks()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_worker,
+            args=(
+                index,
+                [shm.name for shm in self._slots],
+                tasks,
+                writer,
+                *self._worker_args,
+            ),
+            name=f"inference-{index}",
+            daemon=True,
+        )
+        proc.start()
+        # Only the child may hold the write end, so its exit shows up as EOF.
+        writer.close()
+        with self._lock:
+            self._tasks[index] = tasks
+            self._results[index] = reader
+            self._procs[index] = proc
+        self._started_at[index] = time.monotonic()
+
+    def reserve(
+        self, shape: tuple[int, ...], dtype: Any = "uint8", timeout: float | None = None
+    ) -> tuple[int, Any]:
+        """Return ``(slot, array)`` for a frame of ``shape`` to be written in place.
+
+        Pass the slot to :meth:`submit_slot` once the array is filled.
+        """
+        import numpy as np
+
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.slot_bytes:
+            raise ValueError(
+                f"Frame of {nbytes} bytes does not fit a {self.slot_bytes}-byte slot"
+            )
+        if self._closed:
+            raise RuntimeError("ShmInferencePool is closed")
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No free inference slot") from None
+        array = np.ndarray(shape, dtype=dtype, buffer=self._slots[slot].buf, offset=HEADER.size)
+        return slot, array
+
+    def cancel(self, slot: int) -> None:
+        """Give back a slot from :meth:`reserve` without submitting it."""
+        self._free.put(slot)
+
+    def submit_slot(
+        self,
+        slot: int,
+        shape: tuple[int, ...],
+        dtype: Any = "uint8",
+        *,
+        camera: str = "",
+        serial: str = "",
+        model: str = "",
+    ) -> Future:
+        """Queue the frame already written to ``slot``; return a future verdict."""
+        import numpy as np
+
+        future: Future = Future()
+        job = next(self._ids)
+        write_header(
+            self._slots[slot].buf, job, tuple(shape), np.dtype(dtype).str, camera, serial, model
+        )
+        with self._lock:
+            worker = min(
+                range(self.workers),
+                key=lambda i: (not self._procs[i].is_alive(), len(self._assigned[i])),
+            )
+            self._assigned[worker].add(job)
+            self._jobs[job] = (slot, worker, future, time.perf_counter())
+            self.submitted += 1
+            self._tasks[worker].put((job, slot))
+        return future
+
+    def submit(
+        self,
+        frame: Any,
+        *,
+        camera: str = "",
+        serial: str = "",
+        model: str = "",
+        timeout: float | None = None,
+    ) -> Future:
+        """Copy ``frame`` into a free slot and queue it; return a future verdict."""
+        slot, array = self.reserve(frame.shape, frame.dtype, timeout)
+        try:
+            array[...] = frame
+            return self.submit_slot(
+                slot, frame.shape, frame.dtype, camera=camera, serial=serial, model=model
+            )
+        except Exception:
+            self.cancel(slot)
+            raise
+
+    def preload(self, names: list[str]) -> None:
+        """Have every worker load ``names`` now instead of on their first frame."""
+        with self._lock:
+            for tasks in self._tasks:
+                tasks.put((0, list(names)))
+
+    def _release(self, job: int) -> tuple[Future, float] | None:
+        with self._lock:
+            entry = self._jobs.pop(job, None)
+            if entry is None:
+                return None
+            slot, worker, future, started = entry
+            self._assigned[worker].discard(job)
+        self._free.put(slot)
+        return future, started
+
+    def _handle(self, message: tuple[int, Any, str | None]) -> None:
+        job, verdict, error = message
+        released = self._release(job)
+        if released is None:
+            return
+        future, started = released
+        if error is None:
+            self.completed += 1
+            self._latency_total += time.perf_counter() - started
+            future.set_result(verdict)
+        else:
+            self.failed += 1
+            future.set_exception(RuntimeError(f"Inference failed: {error}"))
+
+    def _lost(self, index: int) -> int:
+        """Fail the frames of dead worker ``index``; return how many there were."""
+        with self._lock:
+            lost = list(self._assigned[index])
+            self._results[index] = None
+            # The dead worker may have held the queue's read lock; frames
+            # queued from now on wait for the restarted worker on a fresh one.
+            tasks, self._tasks[index] = self._tasks[index], self._new_tasks()
+        tasks.close()
+        for job in lost:
+            released = self._release(job)
+            if released is not None:
+                self.failed += 1
+                released[0].set_exception(WorkerCrashed(f"Inference worker {index} crashed"))
+        return len(lost)
+
+    def _collect(self) -> None:
+        backoff = [0.0] * self.workers
+        restart_at: dict[int, float] = {}
+        while not self._stop.is_set():
+            with self._lock:
+                readers = {conn: i for i, conn in enumerate(self._results) if conn is not None}
+            if not readers and self._closed:
+                break
+            for conn in connection.wait(list(readers), timeout=0.2):
+                index = readers[conn]
+                try:
+                    self._handle(conn.recv())
+                    continue
+                except (EOFError, OSError):
+                    # Every result the worker sent has been read by now.
+                    conn.close()
+                proc = self._procs[index]
+                proc.join(1.0)
+                lost = self._lost(index)
+                if self._closed:
+                    continue
+                # Back off while a worker keeps dying right after it starts.
+                quick = time.monotonic() - self._started_at[index] < 10.0
+                backoff[index] = min(backoff[index] * 2 or 0.5, 30.0) if quick else 0.0
+                restart_at[index] = time.monotonic() + backoff[index]
+                LOGGER.error(
+                    "Inference worker %d exited with code %s (%d frames lost);"
+                    " restarting in %.1fs",
+                    index,
+                    proc.exitcode,
+                    lost,
+                    backoff[index],
+                )
+            now = time.monotonic()
+            for index, when in list(restart_at.items()):
+                if now >= when and not self._closed:
+                    del restart_at[index]
+                    self._start_worker(index)
+                    self.restarts += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Let the workers finish queued frames, then stop them and free the slots."""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            tasks = list(self._tasks)
+        for queue_ in tasks:
+            queue_.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for proc in self._procs:
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1.0)
+        # The collector stops once every pipe has reached EOF; never wait longer
+        # than the deadline for it.
+        self._collector.join(max(0.5, deadline - time.monotonic()))
+        self._stop.set()
+        self._collector.join(1.0)
+        with self._lock:
+            pending = list(self._jobs)
+        for job in pending:
+            released = self._release(job)
+            if released is not None:
+                released[0].set_exception(RuntimeError("ShmInferencePool closed"))
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._jobs)
+            assigned = [len(jobs) for jobs in self._assigned]
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for proc in self._procs if proc is not None and proc.is_alive()),
+            "slots": len(self._slots),
+            "free_slots": self._free.qsize(),
+            "in_flight": in_flight,
+            "assigned": assigned,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "latency_mean": (
+                round(self._latency_total / self.completed, 4) if self.completed else 0.0
+            ),
+        }
+
+
+__all__ = [
+    "HEADER",
+    "ShmInferencePool",
+    "WorkerCrashed",
+    "read_header",
+    "write_header",
+]
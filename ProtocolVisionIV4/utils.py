@@ -2,7 +2,14 @@
 
 from __future__ import annotations
 
-from typing import Dict
+import importlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .model_rules import RuleEngine
 
 MODEL_MAP: Dict[str, str] = {
     "IV4-001": "model_abc",
@@ -12,11 +19,69 @@ MODEL_MAP: Dict[str, str] = {
 DEFAULT_MODEL = "default_model"
 
 
-def select_model_by_serial(serial: str) -> str:
-    """Return the model name mapped from a serial number."""
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "config" / "model_rules.json"
+
+_ENGINES: Dict[Path, "RuleEngine"] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def rule_engine(
+    rules_path: str | Path | None = None, cache_size: int = 4096
+) -> "RuleEngine | None":
+    """Return the shared rule engine for ``rules_path``, or ``None`` if it does not exist.
+
+    ``rules_path`` defaults to ``config/model_rules.json``. There is one
+    engine per file for the whole process, so every caller sees the same
+    rules and reloads. ``cache_size`` applies when the engine is created.
+    """
+    path = Path(rules_path or DEFAULT_RULES_PATH)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(path)
+        if engine is None:
+            if not path.exists():
+                return None
+            from .model_rules import RuleEngine
+
+            engine = _ENGINES[path] = RuleEngine(path, DEFAULT_MODEL, cache_size=cache_size)
+    return engine
+
+
+def select_model_by_serial(
+    serial: str, rules_path: str | Path | None = None, cache_size: int = 4096
+) -> str:
+    """Return the model name mapped from a serial number.
+
+    Serials are looked up in the shared :func:`rule_engine` for
+    ``rules_path`` when that file exists, otherwise in the fixed
+    ``MODEL_MAP``.
+    """
+    engine = rule_engine(rules_path, cache_size)
+    if engine is not None:
+        return engine.select(serial)
     if not serial:
         return DEFAULT_MODEL
     return MODEL_MAP.get(serial, DEFAULT_MODEL)
 
 
-__all__ = ["select_model_by_serial", "MODEL_MAP", "DEFAULT_MODEL"]
+@lru_cache(maxsize=None)
+def optional_import(name: str) -> Any | None:
+    """Import the optional dependency ``name`` on first use.
+
+    Returns ``None`` if it is not installed. Heavy packages such as OpenCV are
+    fetched through this at the point of use, so importing the package stays
+    fast on stations that never need them.
+    """
+    try:
+        return importlib.import_module(name)
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+
+
+__all__ = [
+    "select_model_by_serial",
+    "rule_engine",
+    "optional_import",
+    "MODEL_MAP",
+    "DEFAULT_MODEL",
+    "DEFAULT_RULES_PATH",
+]
@@ -2,27 +2,22 @@
 
 from __future__ import annotations
 
-import logging
 from typing import Any, Dict
 
-import requests
-
-
-LOGGER = logging.getLogger("ProtocolVision")
+from .dispatcher import get_dispatcher
 
 
 def send_to_workflow(data: Dict[str, Any], url: str) -> None:
-    """Post JSON ``data`` to ``url`` if provided.
+    """Queue JSON ``data`` to be posted to ``url`` if provided.
 
-    The request is executed with a short timeout, and failures are logged but
-    do not raise exceptions to the caller.
+    The post is made by the shared
+    :class:`~ProtocolVisionIV4.dispatcher.WebhookDispatcher` for ``url`` on a
+    background thread, which retries failures; this call never blocks on the
+    network.
     """
     if not url:
         return
-    try:
-        requests.post(url, json=data, timeout=5)
-    except Exception as exc:  # pragma: no cover - network issues
-        LOGGER.error("Workflow POST failed: %s", exc)
+    get_dispatcher(url).submit(data)
 
 
 __all__ = ["send_to_workflow"]
@@ -0,0 +1,87 @@
+"""Microbenchmark for the serial-to-model rule engine.
+
+Builds a rules file with tens of thousands of exact, prefix and regex rules,
+then times compilation, cold lookups and memoised lookups::
+
+    python benchmarks/bench_model_rules.py --rules 50000 --lookups 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ProtocolVisionIV4.model_rules import RuleEngine, load_rules  # noqa: E402
+
+
+def build_rules(count: int, regex_count: int) -> list[dict]:
+    rules = []
+    for i in range(count):
+        if i % 2:
+            rules.append({"type": "exact", "pattern": f"IV4-{i:06d}", "model": f"m{i % 97}"})
+        else:
+            rules.append(
+                {"type": "prefix", "pattern": f"V{i:05d}-", "model": f"p{i % 89}", "priority": 1}
+            )
+    for i in range(regex_count):
+        rules.append(
+            {"type": "regex", "pattern": rf"^R{i:03d}-\d+$", "model": f"r{i}", "priority": -1}
+        )
+    return rules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=50000)
+    parser.add_argument("--regex", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=2000, help="Distinct serials looked up")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "rules.json"
+        path.write_text(json.dumps({"rules": build_rules(args.rules, args.regex)}))
+
+        start = time.perf_counter()
+        load_rules(path, "default_model")
+        print(f"compile {args.rules + args.regex} rules: {time.perf_counter() - start:.3f}s")
+
+        rng = random.Random(0)
+        serials = []
+        for _ in range(args.distinct):
+            kind = rng.randrange(4)
+            n = rng.randrange(args.rules)
+            if kind == 0:
+                serials.append(f"IV4-{n:06d}")
+            elif kind == 1:
+                serials.append(f"V{n:05d}-{rng.randrange(10**6)}")
+            elif kind == 2:
+                serials.append(f"R{rng.randrange(args.regex):03d}-{rng.randrange(10**6)}")
+            else:
+                serials.append(f"UNKNOWN-{n}")
+        workload = [rng.choice(serials) for _ in range(args.lookups)]
+
+        engine = RuleEngine(path, "default_model", cache_size=0)
+        start = time.perf_counter()
+        for serial in workload:
+            engine.select(serial)
+        uncached = time.perf_counter() - start
+        print(f"uncached: {uncached / args.lookups * 1e6:.2f} us/lookup")
+
+        engine = RuleEngine(path, "default_model", cache_size=4096)
+        start = time.perf_counter()
+        for serial in workload:
+            engine.select(serial)
+        cached = time.perf_counter() - start
+        print(f"memoised: {cached / args.lookups * 1e6:.2f} us/lookup {engine.stats()}")
+
+
+if __name__ == "__main__":
+    main()
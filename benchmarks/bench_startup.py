@@ -0,0 +1,80 @@
+"""Report the import time of every ProtocolVisionIV4 module.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` so the
+numbers are cold-start costs, including everything the module pulls in::
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --top 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import pkgutil
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PACKAGE = "ProtocolVisionIV4"
+
+
+def import_time(module: str) -> tuple[float, list[tuple[float, str]]]:
+    """Return the total import time of ``module`` in ms and its slowest imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, field = line[len("import time:"):].split("|")
+        # The name is indented by two spaces per level of nesting.
+        name = field.strip()
+        depth = (len(field) - len(field.lstrip()) - 1) // 2
+        entries.append((int(cumulative) / 1000.0, name, depth))
+    total = next(ms for ms, name, _ in reversed(entries) if name == module)
+    # Outside dependencies imported directly by package modules, the usual
+    # suspects for slow startup. Entries are listed children first, so a
+    # module's importer is the next entry with a smaller depth.
+    external = []
+    for index, (ms, name, depth) in enumerate(entries):
+        if name.startswith(PACKAGE):
+            continue
+        parent = next((n for _, n, d in entries[index + 1 :] if d < depth), None)
+        if parent is not None and parent.startswith(PACKAGE):
+            external.append((ms, name))
+    return total, sorted(external, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module (median is shown)")
+    parser.add_argument("--top", type=int, default=3, help="Slowest dependencies to list")
+    args = parser.parse_args()
+
+    modules = [PACKAGE] + [
+        f"{PACKAGE}.{info.name}"
+        for info in pkgutil.iter_modules([str(ROOT / PACKAGE)])
+        if info.name != "__main__"
+    ]
+    print(f"{'module':45} {'ms':>8}  slowest dependencies")
+    for module in modules:
+        try:
+            runs = [import_time(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as exc:
+            print(f"{module:45} {'failed':>8}  {exc}")
+            continue
+        total = statistics.median(ms for ms, _ in runs)
+        deps = ", ".join(f"{name} {ms:.0f}" for ms, name in runs[0][1][: args.top])
+        print(f"{module:45} {total:8.1f}  {deps}")
+
+
+if __name__ == "__main__":
+    main()
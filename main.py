@@ -1,7 +1,9 @@
 import argparse
 import logging
 import os
+import time
 from pathlib import Path
+from typing import Any, Callable
 
 
 DEFAULT_CONFIG = Path(__file__).resolve().parent / "ProtocolVisionIV4" / "config" / "config.json"
@@ -18,71 +20,405 @@ def main() -> None:
     parser.add_argument(
         "--config", default=str(CONFIG_PATH), help="Path to configuration file"
     )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Trigger all cameras concurrently instead of one at a time",
+    )
+    parser.add_argument(
+        "--camera-timeout",
+        type=float,
+        default=None,
+        help="Per-camera capture timeout in seconds for parallel mode",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    query = subparsers.add_parser("query", help="Export logged records")
+    query.add_argument("--start", help="Earliest timestamp, e.g. 2024-05-01T08:00")
+    query.add_argument("--end", help="Latest timestamp (inclusive)")
+    query.add_argument("--level", help="Only records at this level")
+    query.add_argument("--serial", help="Only records for this serial number")
+    query.add_argument(
+        "--format", choices=["csv", "jsonl", "json"], default="jsonl", help="Output format"
+    )
+    query.add_argument("--output", help="Output file (default: stdout)")
+    daemon = subparsers.add_parser(
+        "daemon", help="Run a capture cycle for every scan or external trigger"
+    )
+    daemon.add_argument(
+        "--rate", type=float, default=None, help="Target cycles per second (0: unpaced)"
+    )
+    daemon.add_argument(
+        "--trigger-port", type=int, default=None, help="TCP port accepting trigger lines"
+    )
+    daemon.add_argument(
+        "--no-scanner", action="store_true", help="Do not read the barcode scanner"
+    )
     args = parser.parse_args()
 
     CONFIG_PATH = Path(args.config)
     os.environ["CONFIG_PATH"] = str(CONFIG_PATH)
 
+    if args.command == "query":
+        _query(args)
+        return
+
     from ProtocolVisionIV4.camera_manager import CameraManager
-    from ProtocolVisionIV4.config_manager import ConfigManager
-    from ProtocolVisionIV4.image_saver import save_captured_image
+    from ProtocolVisionIV4.config_manager import get_config
+    from ProtocolVisionIV4.dispatcher import close_dispatchers, get_dispatcher
+    from ProtocolVisionIV4.image_saver import shutdown_image_writer, shutdown_inspection
     from ProtocolVisionIV4.model_selector import ModelSelector
     from ProtocolVisionIV4.logger import Logger
-    from ProtocolVisionIV4.workflow import send_to_workflow
+    from ProtocolVisionIV4.mqtt_client import close_publishers, get_publisher
+    from ProtocolVisionIV4.outbox import Outbox, mqtt_sink, webhook_sink
 
     log_level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(level=log_level, format="%(asctime)s - %(levelname)s - %(message)s")
 
     logging.info("Loading configuration from %s", CONFIG_PATH)
-    config = ConfigManager(CONFIG_PATH)
-
-    logger = Logger(
-        config.get("log_path"),
-        webhook_url=config.get("webhook_url"),
-        mqtt_broker=config.get("mqtt_broker"),
-        mqtt_port=config.get("mqtt_port"),
-        mqtt_topic=config.get("mqtt_topic"),
-    )
+    config = get_config(CONFIG_PATH)
+
+    logger = Logger.from_config(config)
     logger.log("info", f"Configuration loaded from {CONFIG_PATH}")
+    sinks = {}
+    if config.get("webhook_url"):
+        dispatcher = get_dispatcher(
+            config.get("webhook_url"),
+            batch_size=config.get("webhook_batch_size", 1),
+            batch_wait=config.get("webhook_batch_wait_ms", 50) / 1000.0,
+            max_retries=config.get("webhook_retries", 3),
+            backoff_max=config.get("webhook_backoff_max", 30.0),
+            max_queue=config.get("webhook_queue_size", 1000),
+        )
+        sinks["webhook"] = webhook_sink(dispatcher)
+    if config.get("mqtt_broker") and config.get("mqtt_topic"):
+        publisher = get_publisher(
+            config.get("mqtt_broker"),
+            config.get("mqtt_port"),
+            qos=config.get("mqtt_qos", 1),
+            max_inflight=config.get("mqtt_max_inflight", 20),
+            max_queue=config.get("mqtt_queue_size", 1000),
+            keepalive=config.get("mqtt_keepalive", 60),
+        )
+        sinks["mqtt"] = mqtt_sink(publisher, config.get("mqtt_topic"))
+    outbox = None
+    if config.get("outbox_path") and sinks:
+        outbox = Outbox(
+            config.get("outbox_path"),
+            sinks,
+            batch_size=config.get("outbox_batch_size", 50),
+            keep=config.get("outbox_keep", 10000),
+        )
+        logger.log("info", f"Outbox pending deliveries: {outbox.pending()}")
 
     cameras_cfg = config.get("cameras")
     logger.log("info", f"Initializing {len(cameras_cfg)} cameras")
-    camera_mgr = CameraManager(cameras_cfg)
+    camera_mgr = CameraManager(
+        cameras_cfg, backoff_max=config.get("camera_backoff_max", 30.0)
+    )
 
-    serial = config.get("serial_number")
-    logger.log("info", f"Selecting model for serial {serial}")
     selector = ModelSelector()
-    model = selector.select_model(serial)
-    config.data["model_name"] = model
-    logger.log("info", f"Selected model: {model}")
-    selector.register_model(serial, model)
-
-    for name in camera_mgr.names():
-        logger.log("info", f"Connecting camera {name}")
-        camera_mgr.connect(name)
-        logger.log("info", f"Capturing image from {name}")
-        image = camera_mgr.capture_image(name)
-        ok = image is not None
-
-        logger.log("info", "Saving image")
-        image_path = save_captured_image(
-            image,
-            config.get("image_output_path"),
-            serial=serial,
-            camera_type=camera_mgr.cameras[name].camera_type,
-            ok=ok,
+    cycle = _Cycle(
+        config,
+        camera_mgr,
+        selector,
+        logger,
+        outbox,
+        parallel=args.parallel or config.get("parallel_capture", False),
+        timeout=(
+            args.camera_timeout
+            if args.camera_timeout is not None
+            else config.get("camera_timeout", 10.0)
+        ),
+    )
+    pipeline = cycle.pipeline(config.get("pipeline_stages", {})) if config.get("pipeline") else None
+    run = cycle.run
+    if pipeline is not None:
+        run = lambda serial: pipeline.submit_future({"serial": serial})  # noqa: E731
+    try:
+        if args.command == "daemon":
+            _serve(args, config, camera_mgr, selector, logger, run)
+        else:
+            run(config.get("serial_number"))
+    except KeyboardInterrupt:
+        logger.log("info", "Interrupted")
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+            logger.log("info", f"Pipeline stopped: {pipeline.stats()}")
+        selector.close()
+        camera_mgr.release_all()
+        logger.log("info", f"Camera sessions released: {camera_mgr.status()}")
+        shutdown_inspection()
+        shutdown_image_writer()
+        if outbox is not None:
+            outbox.close()
+        close_dispatchers()
+        close_publishers()
+        logger.close()
+        if logger.dropped:
+            logging.warning("Log sink dropped %d records", logger.dropped)
+
+
+def _serve(
+    args: argparse.Namespace,
+    config: Any,
+    camera_mgr: Any,
+    selector: Any,
+    logger: Any,
+    run: Callable[[str], Any],
+) -> None:
+    """Keep everything warm and run a cycle per trigger until SIGTERM/SIGINT."""
+    from ProtocolVisionIV4.daemon import InspectionDaemon
+    from ProtocolVisionIV4.image_saver import select_inspection_model, warm_up_inspection
+    from ProtocolVisionIV4.serial_input import ScannerReader
+
+    if config.get("use_ai"):
+        select_inspection_model(selector.select_model(config.get("serial_number")), wait=True)
+        warm_up_inspection()
+    camera_mgr.start_keepalive(config.get("camera_keepalive_interval", 5.0))
+
+    def on_config_change(old: Any, new: Any, changed: set[str]) -> None:
+        logger.apply_config(new)
+        if "cameras" in changed:
+            camera_mgr.reconfigure([dict(cam) for cam in new["cameras"]])
+
+    config.subscribe(on_config_change)
+    config.start_watching(config.get("config_watch_interval", 1.0))
+
+    rate = args.rate if args.rate is not None else config.get("daemon_cycle_rate", 0.0)
+    trigger_port = args.trigger_port or config.get("daemon_trigger_port")
+    # Cycles overwrite serial_number with the part they inspect, so a trigger
+    # without a serial uses the one configured at startup.
+    configured_serial = config.get("serial_number")
+    daemon = InspectionDaemon(
+        run,
+        lambda: configured_serial,
+        cycle_rate=rate,
+        max_queue=config.get("daemon_queue_size", 10),
+        trigger_host=config.get("daemon_trigger_host", "127.0.0.1"),
+        trigger_port=trigger_port,
+        stats_interval=config.get("daemon_stats_interval", 60.0),
+    )
+    reader = None
+    if not args.no_scanner and config.get("scanner_port"):
+        reader = ScannerReader(
+            config.get("scanner_port"),
+            config.get("scanner_baud"),
+            debounce=config.get("scanner_debounce", 1.0),
+            line_timeout=config.get("scanner_line_timeout", 0.5),
+            max_queue=0,
         )
-        logger.log("info", f"Image from {name} saved to {image_path}")
-        result = {
-            "camera": name,
-            "image": image_path,
-            "ok": ok,
+        reader.subscribe(daemon.trigger)
+        try:
+            reader.start()
+        except ImportError as exc:
+            logger.log("warning", f"Scanner disabled: {exc}")
+            reader = None
+    try:
+        daemon.run()
+    finally:
+        if reader is not None:
+            reader.stop()
+            logger.log("info", f"Scanner stopped: {reader.stats()}")
+        config.stop_watching()
+        config.unsubscribe(on_config_change)
+        logger.log("info", f"Daemon stopped: {daemon.stats()}")
+
+
+class _Cycle:
+    """The steps of one inspection cycle: capture, inspect, save and publish.
+
+    Every step takes and returns a part dict that starts as
+    ``{"serial": ...}``. :meth:`run` executes the steps back to back;
+    :meth:`pipeline` turns them into the stages of a
+    :class:`~ProtocolVisionIV4.pipeline.Pipeline` so consecutive parts
+    overlap. Every frame is inspected with its part's model, so parts on
+    both sides of a changeover can be in the inspect step at once.
+    """
+
+    STAGES = ("capture", "inspect", "save", "publish")
+
+    def __init__(
+        self,
+        config: Any,
+        camera_mgr: Any,
+        selector: Any,
+        logger: Any,
+        outbox: Any = None,
+        *,
+        parallel: bool = False,
+        timeout: float = 10.0,
+    ) -> None:
+        self.config = config
+        self.camera_mgr = camera_mgr
+        self.selector = selector
+        self.logger = logger
+        self.outbox = outbox
+        self.parallel = parallel
+        self.timeout = timeout
+
+    def run(self, serial: str) -> None:
+        """Run a complete cycle for ``serial`` on the calling thread."""
+        self.publish(self.save(self.inspect(self.capture({"serial": serial}))))
+
+    def pipeline(self, settings: Any) -> Any:
+        """Return a pipeline of the cycle steps configured by ``settings``.
+
+        ``settings`` maps step names to ``{"workers", "queue"}``. The
+        steps share camera sessions and sinks with this process, so they
+        run on threads; keep ``capture`` at one worker so cameras are
+        triggered one part at a time.
+        """
+        from ProtocolVisionIV4.pipeline import Pipeline, Stage
+
+        stages = []
+        for name in self.STAGES:
+            options = settings.get(name, {})
+            stages.append(
+                Stage(
+                    name,
+                    getattr(self, name),
+                    workers=options.get("workers", 1),
+                    queue_size=options.get("queue"),
+                )
+            )
+        return Pipeline(stages, name="cycle")
+
+    def capture(self, part: dict[str, Any]) -> dict[str, Any]:
+        """Select the model for the part's serial and capture every camera."""
+        logger, serial = self.logger, part["serial"]
+        logger.log("info", f"Selecting model for serial {serial}", serial=serial)
+        model = self.selector.select_model(serial)
+        self.config.set("serial_number", serial)
+        self.config.set("model_name", model)
+        logger.log("info", f"Selected model: {model}", serial=serial)
+        self.selector.register_model(serial, model)
+        part["model"] = model
+
+        part["start"] = time.perf_counter()
+        if self.parallel:
+            names = self.camera_mgr.names()
+            logger.log("info", f"Triggering {len(names)} cameras concurrently")
+            captures = self.camera_mgr.capture_all(timeout=self.timeout)
+            for name, capture in captures.items():
+                if capture["error"]:
+                    logger.log(
+                        "error", f"Capture from {name} failed: {capture['error']}", serial=serial
+                    )
+                logger.log("info", f"Camera {name} capture took {capture['elapsed']:.3f}s")
+        else:
+            captures = {}
+            for name in self.camera_mgr.names():
+                logger.log("info", f"Capturing image from {name}")
+                start = time.perf_counter()
+                image = self.camera_mgr.capture_image(name)
+                captures[name] = {
+                    "image": image,
+                    "elapsed": time.perf_counter() - start,
+                    "error": None,
+                }
+        part["captures"] = captures
+        return part
+
+    def inspect(self, part: dict[str, Any]) -> dict[str, Any]:
+        """Run AI inspection on every captured frame of the part."""
+        from ProtocolVisionIV4.image_saver import (
+            select_inspection_model,
+            submit_inspection,
+            warm_up_inspection,
+        )
+
+        if self.config.get("use_ai"):
+            self.logger.log("info", f"Loading AI model {part['model']}")
+            select_inspection_model(part["model"], wait=True)
+            warm_up_inspection()
+        # Queue every frame before waiting so batched inference sees them all.
+        verdicts = {
+            name: submit_inspection(
+                capture["image"], camera=name, serial=part["serial"], model=part["model"]
+            )
+            for name, capture in part["captures"].items()
         }
-        send_to_workflow(result, config.get("webhook_url"))
-        logger.send_webhook(result)
-        logger.publish_mqtt(result)
-        camera_mgr.release(name)
-        logger.log("info", f"Camera {name} released")
+        part["verdicts"] = {name: future.result() for name, future in verdicts.items()}
+        return part
+
+    def save(self, part: dict[str, Any]) -> dict[str, Any]:
+        """Queue every image for writing and build the per-camera results."""
+        from ProtocolVisionIV4.image_saver import queue_captured_image
+
+        serial, results = part["serial"], []
+        for name, capture in part["captures"].items():
+            image, verdict = capture["image"], part["verdicts"][name]
+            ok = image is not None
+            if ok and verdict is not None:
+                ok = verdict
+                self.logger.log(
+                    "info", f"AI verdict for {name}: {'OK' if ok else 'NG'}", serial=serial
+                )
+            self.logger.log("info", "Saving image")
+            handle = queue_captured_image(
+                image,
+                self.config.get("image_output_path"),
+                serial=serial,
+                camera_type=self.camera_mgr.cameras[name].camera_type,
+                ok=ok,
+                camera=name,
+            )
+            image_path = str(handle.path)
+            self.logger.log("info", f"Image from {name} queued for {image_path}", serial=serial)
+            results.append(
+                {
+                    "camera": name,
+                    "image": image_path,
+                    "ok": ok,
+                    "capture_time": round(capture["elapsed"], 3),
+                }
+            )
+        part["results"] = results
+        return part
+
+    def publish(self, part: dict[str, Any]) -> dict[str, Any]:
+        """Publish every result of the part.
+
+        With an outbox the results are stored there and shipped to the
+        webhook and MQTT sinks from disk.
+        """
+        for result in part["results"]:
+            if self.outbox is not None:
+                self.outbox.append(result)
+            else:
+                self.logger.send_webhook(result)
+                self.logger.publish_mqtt(result)
+        serial = part["serial"]
+        self.logger.log(
+            "info",
+            f"Cycle for serial {serial} finished in {time.perf_counter() - part['start']:.3f}s",
+            serial=serial,
+        )
+        return part
+
+
+def _query(args: argparse.Namespace) -> None:
+    """Stream the log records matching ``args`` to a file or stdout."""
+    import sys
+
+    from ProtocolVisionIV4.config_manager import get_config
+    from ProtocolVisionIV4.log_query import export_logs, query_logs
+
+    config = get_config(CONFIG_PATH)
+    records = query_logs(
+        Path(config.get("log_path")).parent,
+        start=args.start,
+        end=args.end,
+        level=args.level,
+        serial=args.serial,
+    )
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            count = export_logs(records, out, args.format)
+    else:
+        count = export_logs(records, sys.stdout, args.format)
+    logging.info("Exported %d records", count)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""Behaviour of the scanner line assembly and the pty fake scanner."""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+import pytest
+
+from ProtocolVisionIV4.serial_input import FakeScanner, ScannerReader
+
+
+def _wait(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_split_line_is_assembled_once():
+    reader = ScannerReader("fake", debounce=0.0)
+    assert reader.feed(b"AB", now=0.0) == []
+    assert reader.feed(b"C1", now=0.1) == []
+    assert reader.feed(b"23\r\nXY", now=0.2) == ["ABC123"]
+    assert reader.feed(b"Z\n", now=0.3) == ["XYZ"]
+    assert reader.get(timeout=0) == "ABC123"
+    assert reader.get(timeout=0) == "XYZ"
+    assert reader.get(timeout=0) is None
+
+
+def test_crlf_and_blank_lines_yield_no_empty_codes():
+    reader = ScannerReader("fake", debounce=0.0)
+    assert reader.feed(b"A\r\n\r\n\nB\r", now=0.0) == ["A", "B"]
+
+
+def test_repeat_within_debounce_is_dropped():
+    reader = ScannerReader("fake", debounce=1.0)
+    assert reader.feed(b"CODE\r\n", now=0.0) == ["CODE"]
+    assert reader.feed(b"CODE\r\n", now=0.5) == []
+    # The window restarts with every repeat.
+    assert reader.feed(b"CODE\r\n", now=1.2) == []
+    assert reader.feed(b"OTHER\r\n", now=1.3) == ["OTHER"]
+    assert reader.feed(b"CODE\r\n", now=1.4) == ["CODE"]
+    assert reader.feed(b"CODE\r\n", now=3.0) == ["CODE"]
+    assert (reader.scans, reader.duplicates) == (4, 2)
+
+
+def test_stale_fragment_is_discarded():
+    reader = ScannerReader("fake", line_timeout=0.5, debounce=0.0)
+    assert reader.feed(b"BROK", now=0.0) == []
+    assert reader.feed(b"GOOD\r\n", now=2.0) == ["GOOD"]
+    assert reader.discarded == 1
+
+
+def test_subscribers_and_full_queue():
+    reader = ScannerReader("fake", debounce=0.0, max_queue=2)
+    seen: list[str] = []
+    reader.subscribe(seen.append)
+    reader.feed(b"A\nB\nC\n", now=0.0)
+    assert seen == ["A", "B", "C"]
+    assert reader.dropped == 1
+    assert [reader.get(timeout=0), reader.get(timeout=0)] == ["B", "C"]
+    reader.unsubscribe(seen.append)
+    reader.feed(b"D\n", now=1.0)
+    assert seen == ["A", "B", "C"]
+
+
+@pytest.fixture
+def pty_reader():
+    pytest.importorskip("serial")
+    if sys.platform == "win32":
+        pytest.skip("FakeScanner needs a pty")
+    readers: list[ScannerReader] = []
+    scanners: list[FakeScanner] = []
+
+    def make(port: str | None = None, **options):
+        scanner = FakeScanner()
+        scanners.append(scanner)
+        options.setdefault("debounce", 0.0)
+        reader = ScannerReader(port or scanner.port, **options)
+        readers.append(reader)
+        return scanner, reader
+
+    yield make
+    for reader in readers:
+        reader.stop()
+    for scanner in scanners:
+        scanner.close()
+
+
+def test_fake_scanner_delivers_chunked_codes(pty_reader):
+    scanner, reader = pty_reader()
+    reader.start()
+    assert _wait(lambda: reader.connected)
+    scanner.scan("SN-0001", chunks=4, gap=0.02)
+    scanner.scan("SN-0002")
+    assert reader.get(timeout=5) == "SN-0001"
+    assert reader.get(timeout=5) == "SN-0002"
+    assert reader.stats()["scans"] == 2
+    reader.stop()
+    assert not reader.alive and not reader.connected
+
+
+def test_reader_reconnects_after_port_loss(pty_reader, tmp_path):
+    link = tmp_path / "scanner"
+    first, _ = pty_reader()
+    os.symlink(first.port, link)
+    _, reader = pty_reader(str(link), reconnect_delay=0.05)
+    reader.start()
+    assert _wait(lambda: reader.connected)
+    first.scan("BEFORE")
+    assert reader.get(timeout=5) == "BEFORE"
+
+    # Unplug: the pty goes away, reads fail and reopening keeps failing.
+    first.close()
+    assert _wait(lambda: reader.errors > 0 and not reader.connected)
+
+    # Plug a new device in under the same name.
+    second, _ = pty_reader()
+    os.remove(link)
+    os.symlink(second.port, link)
+    assert _wait(lambda: reader.connected and reader.connects == 2)
+    second.scan("AFTER")
+    assert reader.get(timeout=5) == "AFTER"
@@ -0,0 +1,141 @@
+"""Behaviour of the worker-process inference pool, including worker crashes."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ProtocolVisionIV4.shm_inference import (  # noqa: E402
+    HEADER,
+    ShmInferencePool,
+    WorkerCrashed,
+    read_header,
+    write_header,
+)
+
+
+class _FakeModel:
+    """Stand-in for an AIProcessor; the model path picks its behaviour."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def process_image(self, frame):
+        if self.path == "crash.onnx":
+            os._exit(3)
+        if self.path == "late-crash.onnx":
+            # Die while the verdict, too big for one write, is being sent
+            # back; the first pixel sets the delay in milliseconds.
+            threading.Timer(frame.flat[0] / 1000.0, os._exit, (5,)).start()
+            return b"x" * (16 * 1024 * 1024)
+        if self.path == "bad.onnx":
+            raise ValueError("bad model")
+        return int(frame.sum())
+
+
+def load(path: str) -> _FakeModel:
+    return _FakeModel(path)
+
+
+MODELS = {name: f"{name}.onnx" for name in ("crash", "late-crash", "bad")}
+
+
+@pytest.fixture
+def make_pool():
+    pools: list[ShmInferencePool] = []
+
+    def make(**options) -> ShmInferencePool:
+        options.setdefault("slot_bytes", 64 * 1024)
+        pool = ShmInferencePool(load, model_paths=MODELS, default_path="ok.onnx", **options)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_header_round_trip():
+    buf = bytearray(HEADER.size)
+    write_header(buf, 7, (480, 640, 3), "|u1", "Cam1", "SN-1", "model-a")
+    assert read_header(buf) == {
+        "job": 7,
+        "shape": (480, 640, 3),
+        "dtype": "|u1",
+        "camera": "Cam1",
+        "serial": "SN-1",
+        "model": "model-a",
+    }
+    with pytest.raises(ValueError):
+        write_header(buf, 1, (1, 1, 1, 1, 1), "|u1", "", "", "")
+    with pytest.raises(ValueError, match="model"):
+        write_header(buf, 1, (1,), "|u1", "", "", "m" * 65)
+    with pytest.raises(ValueError, match="serial"):
+        # 22 three-byte characters do not fit 64 bytes.
+        write_header(buf, 1, (1,), "|u1", "", "\u0e01" * 22, "")
+
+
+def test_verdicts_and_errors(make_pool):
+    pool = make_pool(workers=2, slots=3)
+    frames = [np.full((16, 16), i, np.uint8) for i in range(10)]
+    futures = [pool.submit(frame, timeout=5) for frame in frames]
+    assert [f.result(timeout=20) for f in futures] == [256 * i for i in range(10)]
+
+    slot, array = pool.reserve((4, 4), "uint16", timeout=5)
+    array[...] = 2
+    assert pool.submit_slot(slot, (4, 4), "uint16").result(timeout=20) == 32
+
+    with pytest.raises(RuntimeError, match="bad model"):
+        pool.submit(frames[1], model="bad").result(timeout=20)
+    with pytest.raises(ValueError):
+        pool.reserve((1024, 1024), "uint8")
+    with pytest.raises(ValueError):
+        pool.submit(frames[1], model="m" * 65)
+
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"]) == (11, 1)
+    assert stats["free_slots"] == 3 and stats["in_flight"] == 0
+
+
+def test_crashed_worker_fails_its_frame_and_restarts(make_pool):
+    pool = make_pool(workers=1, slots=2)
+    frame = np.ones((8, 8), np.uint8)
+    with pytest.raises(WorkerCrashed):
+        pool.submit(frame, model="crash").result(timeout=20)
+    # Frames submitted while the worker is down wait for its replacement.
+    assert pool.submit(frame, timeout=5).result(timeout=20) == 64
+    stats = pool.stats()
+    assert stats["restarts"] == 1 and stats["alive"] == 1
+    assert stats["free_slots"] == 2
+
+
+def test_crash_while_sending_does_not_wedge_the_pool(make_pool):
+    pool = make_pool(workers=2, slots=4)
+    frame = np.ones((8, 8), np.uint8)
+    for delay_ms in (10, 20, 30, 40):
+        doomed = np.full((8, 8), delay_ms, np.uint8)
+        futures = [pool.submit(doomed, model="late-crash", timeout=5)]
+        futures += [pool.submit(frame, timeout=5) for _ in range(3)]
+        for future in futures:
+            try:
+                future.result(timeout=20)
+            except WorkerCrashed:
+                pass
+    assert [pool.submit(frame, timeout=5).result(timeout=20) for _ in range(4)] == [64] * 4
+    assert pool.stats()["restarts"] >= 1
+
+    started = time.monotonic()
+    pool.close()
+    assert time.monotonic() - started < 5.0
+
+
+def test_closed_pool_rejects_new_frames(make_pool):
+    pool = make_pool(workers=1, slots=1)
+    pool.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        pool.submit(np.zeros((2, 2), np.uint8))